@@ -0,0 +1,134 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.tempo_stub import TempoStub
+from benchmarks.workbook_generator import WorkbookGenerator
+
+
+@dataclass
+class FleetResult:
+    mode: str
+    team_size: int
+    requests: int = 0
+    changes: int = 0
+    errors: int = 0
+    wall_seconds: float = 0.0
+
+
+class FleetBenchmark:
+    """
+    Checks a generated team (one workbook per employee) with --batch twice
+    against a local TempoStub: every employee fetching with their own token,
+    and one fleet fetch for the whole team. Reports the Tempo requests of
+    both, which grow with the team in the first mode only.
+    All employees share one workbook, the stub gives every employee their
+    own worklogs in both modes, so both find the same changes.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        months: int = 12,
+        worklogs_per_day: int = 4,
+        latency_ms: float = 0,
+        workers: int = 4,
+    ):
+        self.work_dir = work_dir
+        self.workers = workers
+        self.excel_file = os.path.join(work_dir, f"dsl_{months}m.xlsx")
+        if not os.path.isfile(self.excel_file):
+            WorkbookGenerator(months, worklogs_per_day=worklogs_per_day).save(
+                self.excel_file
+            )
+        self.stub = TempoStub(worklogs_per_day=worklogs_per_day, latency_ms=latency_ms)
+
+    def run(self, team_sizes: List[int]) -> List[FleetResult]:
+        from modules.booking_checker import BookingChecker
+
+        self.stub.start()
+        BookingChecker.base_url = self.stub.base_url
+        results = []
+        try:
+            for team_size in team_sizes:
+                per_token = self.run_team("per-token", team_size)
+                fleet = self.run_team("fleet", team_size)
+                assert per_token.changes == fleet.changes, (
+                    f"{team_size} employees: {per_token.changes} changes with their "
+                    f"own tokens, {fleet.changes} with the fleet fetch"
+                )
+                results += [per_token, fleet]
+        finally:
+            self.stub.stop()
+        return results
+
+    def run_team(self, mode: str, team_size: int) -> FleetResult:
+        from modules.batch_runner import BatchJob, BatchRunner
+
+        fleet = mode == "fleet"
+        accounts = [f"employee-{number}" for number in range(team_size)]
+        self.stub.accounts = {f"token-{account}": account for account in accounts}
+        jobs = [
+            BatchJob(
+                account,
+                self.excel_file,
+                "" if fleet else f"token-{account}",
+                account if fleet else "",
+            )
+            for account in accounts
+        ]
+        output_dir = os.path.join(self.work_dir, f"{mode}-{team_size}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        self.stub.reset_counters()
+        started = time.perf_counter()
+        checks = BatchRunner(
+            jobs,
+            output_dir=output_dir,
+            workers=self.workers,
+            fleet_token="benchmark" if fleet else "",
+        ).run()
+        return FleetResult(
+            mode=mode,
+            team_size=team_size,
+            requests=self.stub.requests,
+            changes=sum(check.changes for check in checks),
+            errors=sum(check.error is not None for check in checks),
+            wall_seconds=round(time.perf_counter() - started, 3),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare Tempo requests of per-token and fleet batch runs"
+    )
+    parser.add_argument("--team-sizes", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--worklogs-per-day", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = FleetBenchmark(
+            work_dir,
+            months=args.months,
+            worklogs_per_day=args.worklogs_per_day,
+            latency_ms=args.latency_ms,
+            workers=args.workers,
+        ).run(args.team_sizes)
+
+    print(
+        f"{'mode':<10} {'team':>5} {'requests':>9} {'changes':>8} {'errors':>7} {'wall':>8}"
+    )
+    for result in results:
+        print(
+            f"{result.mode:<10} {result.team_size:>5} {result.requests:>9} "
+            f"{result.changes:>8} {result.errors:>7} {result.wall_seconds:>7.2f}s"
+        )
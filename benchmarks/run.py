@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.tempo_stub import TempoStub
+from benchmarks.workbook_generator import WorkbookGenerator
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    months: int
+    sheets: int = 0
+    days: int = 0
+    changes: int = 0
+    requests: int = 0
+    rate_limited: int = 0
+    response_bytes: int = 0
+    wall_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    days_per_second: float = 0.0
+    error: Optional[str] = None
+
+
+class ScenarioRunner:
+    """
+    Runs the full main.py flow (load, fetch, reconcile, save the diff workbook)
+    on generated DSL workbooks against a local TempoStub. Every scenario runs
+    in a fresh process so that its peak RSS and import costs are its own.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        worklogs_per_day: int = 4,
+        latency_ms: float = 0,
+        max_page_size: int = 5000,
+        rate_limit_every: int = 0,
+        page_limit: int = 5000,
+        batch_reconcile: bool = True,
+        cache: bool = False,
+    ):
+        self.work_dir = work_dir
+        self.worklogs_per_day = worklogs_per_day
+        self.page_limit = page_limit
+        self.batch_reconcile = batch_reconcile
+        self.cache = cache
+        self.stub = TempoStub(
+            worklogs_per_day=worklogs_per_day,
+            latency_ms=latency_ms,
+            max_page_size=max_page_size,
+            rate_limit_every=rate_limit_every,
+        )
+
+    def run(self, month_counts: List[int]) -> List[ScenarioResult]:
+        self.stub.start()
+        results = []
+        try:
+            for months in month_counts:
+                excel_file = os.path.join(self.work_dir, f"dsl_{months}m.xlsx")
+                if not os.path.isfile(excel_file):
+                    WorkbookGenerator(
+                        months, worklogs_per_day=self.worklogs_per_day
+                    ).save(excel_file)
+                names = ["cold", "warm"] if self.cache else ["run"]
+                for name in names:
+                    results.append(
+                        self.run_scenario(f"{months}m-{name}", months, excel_file)
+                    )
+        finally:
+            self.stub.stop()
+        return results
+
+    def run_scenario(self, name: str, months: int, excel_file: str) -> ScenarioResult:
+        self.stub.reset_counters()
+        cache_file = (
+            os.path.join(self.work_dir, f"cache_{months}m.sqlite3")
+            if self.cache
+            else ""
+        )
+        if name.endswith("cold") and os.path.isfile(cache_file):
+            os.remove(cache_file)
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1) as pool:
+            result = pool.apply(
+                ScenarioRunner.check_workbook,
+                (
+                    name,
+                    months,
+                    excel_file,
+                    self.stub.base_url,
+                    self.page_limit,
+                    self.batch_reconcile,
+                    cache_file,
+                    self.work_dir,
+                ),
+            )
+        result.requests = self.stub.requests
+        result.rate_limited = self.stub.rate_limited
+        result.response_bytes = self.stub.response_bytes
+        return result
+
+    @staticmethod
+    def check_workbook(
+        name: str,
+        months: int,
+        excel_file: str,
+        base_url: str,
+        page_limit: int,
+        batch_reconcile: bool,
+        cache_file: str,
+        output_dir: str,
+    ) -> ScenarioResult:
+        """Runs in the scenario process"""
+        from modules.booking_checker import BookingChecker
+        from modules.workbook_check import WorkbookCheck
+        from modules.worklog_store import WorklogStore
+
+        BookingChecker.base_url = base_url
+        BookingChecker.page_limit = page_limit
+        logger = logging.getLogger("benchmark")
+        logger.disabled = True
+
+        worklog_store = WorklogStore(cache_file) if cache_file else None
+        try:
+            check = WorkbookCheck(
+                excel_file,
+                "benchmark",
+                logger,
+                worklog_store=worklog_store,
+                batch_reconcile=batch_reconcile,
+                output_dir=output_dir,
+            ).run()
+        finally:
+            if worklog_store is not None:
+                worklog_store.close()
+
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss /= 1024 * 1024 if sys.platform == "darwin" else 1024
+        return ScenarioResult(
+            name=name,
+            months=months,
+            sheets=check.sheets,
+            days=check.days,
+            changes=check.changes,
+            wall_seconds=round(check.wall_seconds, 3),
+            peak_rss_mb=round(peak_rss, 1),
+            days_per_second=(
+                round(check.days / check.wall_seconds, 1) if check.wall_seconds else 0.0
+            ),
+            error=check.error,
+        )
+
+    @staticmethod
+    def format_table(results: List[ScenarioResult]) -> str:
+        columns = [
+            "name",
+            "sheets",
+            "days",
+            "changes",
+            "requests",
+            "rate_limited",
+            "response_bytes",
+            "wall_seconds",
+            "peak_rss_mb",
+            "days_per_second",
+        ]
+        rows = [columns] + [[str(getattr(r, c)) for c in columns] for r in results]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+        return "\n".join(
+            "  ".join(value.rjust(width) for value, width in zip(row, widths))
+            for row in rows
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the DSL check against a local Tempo stand-in"
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        nargs="+",
+        default=[1, 12, 120],
+        help="workbook sizes in months (default: 1 12 120)",
+    )
+    parser.add_argument("--worklogs-per-day", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--max-page-size", type=int, default=5000)
+    parser.add_argument("--page-limit", type=int, default=5000)
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=0,
+        help="answer every n-th request with 429",
+    )
+    parser.add_argument(
+        "--per-line", action="store_true", help="use check_line per day"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="cold and warm worklog cache runs"
+    )
+    parser.add_argument("--work-dir", help="keep workbooks and outputs here")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        results = ScenarioRunner(
+            work_dir,
+            worklogs_per_day=args.worklogs_per_day,
+            latency_ms=args.latency_ms,
+            max_page_size=args.max_page_size,
+            rate_limit_every=args.rate_limit_every,
+            page_limit=args.page_limit,
+            batch_reconcile=not args.per_line,
+            cache=args.cache,
+        ).run(args.months)
+
+    print(ScenarioRunner.format_table(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.tempo_stub import TempoStub
+from benchmarks.workbook_generator import WorkbookGenerator
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: import what the mode needs, then check the workbook
+CHECK_SCRIPT = """
+import json, logging, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {repo_dir!r})
+from modules.booking_checker import BookingChecker
+from modules.workbook_check import WorkbookCheck
+if {batch_reconcile!r}:
+    from modules.reconciliation import Reconciler
+imported = time.perf_counter()
+BookingChecker.base_url = {base_url!r}
+logger = logging.getLogger("startup")
+logger.disabled = True
+WorkbookCheck({excel_file!r}, "benchmark", logger, batch_reconcile={batch_reconcile!r},
+              output_dir={output_dir!r}).run()
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "total_seconds": time.perf_counter() - started,
+    "pandas": "pandas" in sys.modules,
+}}))
+"""
+
+
+class StartupBenchmark:
+    """
+    Cold start of a small check in fresh interpreters: the default mode
+    (batch reconciliation, loads pandas) against --light (check_line day by
+    day, no pandas). Reports the median import and total time of each mode.
+    """
+
+    def __init__(self, work_dir: str, repeat: int = 5, months: int = 1):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.excel_file = os.path.join(work_dir, f"dsl_{months}m.xlsx")
+        if not os.path.isfile(self.excel_file):
+            WorkbookGenerator(months).save(self.excel_file)
+
+    def run(self) -> Dict[str, Dict[str, float]]:
+        stub = TempoStub()
+        stub.start()
+        try:
+            return {
+                "full": self.measure(stub.base_url, batch_reconcile=True),
+                "light": self.measure(stub.base_url, batch_reconcile=False),
+            }
+        finally:
+            stub.stop()
+
+    def measure(self, base_url: str, batch_reconcile: bool) -> Dict[str, float]:
+        script = CHECK_SCRIPT.format(
+            repo_dir=REPO_DIR,
+            base_url=base_url,
+            excel_file=self.excel_file,
+            output_dir=self.work_dir,
+            batch_reconcile=batch_reconcile,
+        )
+        runs: List[dict] = []
+        for _ in range(self.repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", script],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+        return {
+            "import_seconds": statistics.median(r["import_seconds"] for r in runs),
+            "total_seconds": statistics.median(r["total_seconds"] for r in runs),
+            "pandas": runs[0]["pandas"],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the cold start of the default and the --light check"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--months", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = StartupBenchmark(work_dir, args.repeat, args.months).run()
+
+    for mode, result in results.items():
+        print(
+            f"{mode:<6} imports {result['import_seconds'] * 1000:6.0f} ms  "
+            f"total {result['total_seconds'] * 1000:6.0f} ms  "
+            f"pandas {'loaded' if result['pandas'] else 'not loaded'}"
+        )
+    full, light = results["full"], results["light"]
+    print(
+        f"--light saves {(full['import_seconds'] - light['import_seconds']) * 1000:.0f} ms"
+        f" of imports, {(full['total_seconds'] - light['total_seconds']) * 1000:.0f} ms in total"
+    )
@@ -0,0 +1,222 @@
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+NLZ_ISSUE_ID = 16804
+JIRA_ISSUE_URL = "https://meteoserve.atlassian.net/rest/api/2/issue/{}"
+
+
+def synthetic_worklogs(
+    day: date,
+    worklogs_per_day: int,
+    seed: int = 0,
+    author: str = "benchmark-user",
+    author_number: int = 0,
+) -> List[dict]:
+    """
+    Deterministic Tempo worklogs of one day (none on weekends), shaped like the
+    /4/worklogs/search results including the fields the checker never reads.
+    Every author_number gets its own worklogs and ids (see TempoStub.author_number).
+    """
+    if day.weekday() >= 5 or worklogs_per_day <= 0:
+        return []
+    rnd = random.Random(day.toordinal() * 1000 + seed + author_number * 7919)
+    start = 7 * 3600 + rnd.randrange(0, 2 * 3600, 60)
+    worklogs = []
+    for i in range(worklogs_per_day):
+        worklog_id = day.toordinal() * 100 + i + author_number * 10**8
+        seconds = rnd.choice([900, 1800, 2700, 3600, 5400])
+        issue_id = NLZ_ISSUE_ID if rnd.random() < 0.1 else 10000 + rnd.randrange(500)
+        worklogs.append(
+            {
+                "self": f"https://api.tempo.io/4/worklogs/{worklog_id}",
+                "tempoWorklogId": worklog_id,
+                "issue": {"self": JIRA_ISSUE_URL.format(issue_id), "id": issue_id},
+                "timeSpentSeconds": seconds,
+                "billableSeconds": seconds,
+                "startDate": day.isoformat(),
+                "startTime": f"{start // 3600:02}:{start % 3600 // 60:02}:00",
+                "description": "Synthetic worklog " + "x" * rnd.randrange(10, 80),
+                "createdAt": f"{day.isoformat()}T18:00:00Z",
+                "updatedAt": f"{day.isoformat()}T18:00:00Z",
+                "author": {
+                    "self": "https://meteoserve.atlassian.net/rest/api/2/user",
+                    "accountId": author,
+                },
+                "attributes": {
+                    "self": "https://api.tempo.io/4/worklogs/attributes",
+                    "values": [
+                        {
+                            "key": "_TestBox_",
+                            "value": "JA" if rnd.random() < 0.3 else "NEIN",
+                        }
+                    ],
+                },
+            }
+        )
+        start += seconds
+    return worklogs
+
+
+class TempoStub:
+    """
+    Local stand-in for Tempo's POST /4/worklogs/search with configurable
+    latency, page size cap and rate limiting (every n-th request gets a 429).
+    Counts requests and response bytes.
+    An account gets the same worklogs whether they are searched with its
+    own token (the token's account comes from `accounts`, default
+    benchmark-user) or by authorIds together with other accounts.
+    """
+
+    default_author = "benchmark-user"
+
+    def __init__(
+        self,
+        worklogs_per_day: int = 4,
+        latency_ms: float = 0,
+        max_page_size: int = 5000,
+        rate_limit_every: int = 0,
+        retry_after: float = 1,
+        seed: int = 0,
+        accounts: Optional[Dict[str, str]] = None,
+    ):
+        self.worklogs_per_day = worklogs_per_day
+        self.latency_ms = latency_ms
+        self.max_page_size = max_page_size
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.seed = seed
+        self.accounts = accounts or {}  # bearer token -> account id
+        self.updated_at = ""  # updatedAt of every worklog once edited
+        self.deleted_per_day = 0  # worklogs deleted in Tempo, first ones of every day
+        self.requests = 0
+        self.rate_limited = 0
+        self.response_bytes = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "TempoStub":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                stub._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def edit_worklogs(self, seed: int) -> None:
+        """Change every worklog as if edited in Tempo just now"""
+        self.seed = seed
+        self.updated_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def delete_worklogs(self, per_day: int = 1) -> None:
+        """Delete the first worklogs of every day, as a user would in Tempo"""
+        self.deleted_per_day = per_day
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = self.rate_limited = self.response_bytes = 0
+
+    @classmethod
+    def author_number(cls, author: str) -> int:
+        """Stable per account, not per position in a request's authorIds"""
+        if author == cls.default_author:
+            return 0
+        return zlib.crc32(author.encode()) % 9973 + 1
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+            rate_limited = (
+                self.rate_limit_every > 0 and self.requests % self.rate_limit_every == 0
+            )
+            if rate_limited:
+                self.rate_limited += 1
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        if rate_limited:
+            body = b'{"errors":[{"message":"Rate limit exceeded"}]}'
+            handler.send_response(429)
+            handler.send_header("Retry-After", str(self.retry_after))
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+
+        body = json.loads(handler.rfile.read(int(handler.headers["Content-Length"])))
+        query = parse_qs(urlparse(handler.path).query)
+        offset = int(query.get("offset", [body.get("offset", 0)])[0])
+        limit = min(
+            int(query.get("limit", [body.get("limit", 50)])[0]), self.max_page_size
+        )
+
+        # Without authorIds the token's own worklogs, as for a personal token
+        token = handler.headers.get("Authorization", "").removeprefix("Bearer ")
+        authors = body.get("authorIds") or [
+            self.accounts.get(token, self.default_author)
+        ]
+        worklogs = []
+        day = date.fromisoformat(body["from"])
+        while day <= date.fromisoformat(body["to"]):
+            for author in authors:
+                worklogs.extend(
+                    synthetic_worklogs(
+                        day,
+                        self.worklogs_per_day,
+                        self.seed,
+                        author,
+                        self.author_number(author),
+                    )[self.deleted_per_day :]
+                )
+            day += timedelta(days=1)
+        if self.updated_at:
+            for worklog in worklogs:
+                worklog["updatedAt"] = self.updated_at
+        if body.get("updatedFrom"):
+            worklogs = [w for w in worklogs if w["updatedAt"] >= body["updatedFrom"]]
+
+        metadata = {"count": len(worklogs[offset : offset + limit]), "offset": offset}
+        metadata["limit"] = limit
+        if offset + limit < len(worklogs):
+            metadata["next"] = (
+                f"{self.base_url}/4/worklogs/search?offset={offset + limit}&limit={limit}"
+            )
+        payload = json.dumps(
+            {"metadata": metadata, "results": worklogs[offset : offset + limit]}
+        ).encode()
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        if "gzip" in handler.headers.get("Accept-Encoding", ""):
+            payload = gzip.compress(payload, compresslevel=1)
+            handler.send_header("Content-Encoding", "gzip")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+        with self._lock:
+            self.response_bytes += len(payload)
@@ -0,0 +1,113 @@
+import calendar
+import random
+from datetime import date, datetime, timedelta
+from typing import List
+from openpyxl import Workbook
+from benchmarks.tempo_stub import NLZ_ISSUE_ID, synthetic_worklogs
+
+DURATION_FORMAT = "[h]:mm:ss"
+
+
+class WorkbookGenerator:
+    """
+    Builds DSL workbooks laid out like the ones main.py reads: a first sheet
+    with common values, then one sheet per month with the month in K1, the
+    header in rows 5-7 and one row per day in rows 8-38 (day in B, required
+    hours in G, booked time in H, NLZ in L).
+
+    Booked times match the worklogs of TempoStub (same seed and worklogs per
+    day), except for a share of days (mismatch_rate) that are booked wrong or
+    left as "Pause?".
+    """
+
+    def __init__(
+        self,
+        months: int = 12,
+        end_month: date = None,
+        worklogs_per_day: int = 4,
+        mismatch_rate: float = 0.1,
+        seed: int = 0,
+    ):
+        """months: number of month sheets, ending with end_month (default: current month)"""
+        self.months = months
+        self.end_month = (end_month or date.today()).replace(day=1)
+        self.worklogs_per_day = worklogs_per_day
+        self.mismatch_rate = mismatch_rate
+        self.seed = seed
+
+    def month_starts(self) -> List[date]:
+        year, month = self.end_month.year, self.end_month.month
+        starts = []
+        for _ in range(self.months):
+            starts.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        return starts[::-1]
+
+    def save(self, path: str) -> str:
+        workbook = Workbook()
+        common = workbook.active
+        common.title = "Stammdaten"
+        common["A1"] = "Name"
+        common["B1"] = "Benchmark"
+
+        rnd = random.Random(self.seed)
+        for month_start in self.month_starts():
+            sheet = workbook.create_sheet(month_start.strftime("%b %Y"))
+            self._fill_month(sheet, month_start, rnd)
+        workbook.save(path)
+        return path
+
+    def _fill_month(self, sheet, month_start: date, rnd: random.Random) -> None:
+        sheet["K1"] = datetime(month_start.year, month_start.month, 1)
+        sheet["A5"] = "Dienststundenliste"
+        for column, title in zip(
+            "ABCDEFGHIL",
+            [
+                "Tag",
+                "Datum",
+                "Beginn",
+                "Ende",
+                "Beginn",
+                "Ende",
+                "Soll",
+                "Ist",
+                "HO",
+                "NLZ",
+            ],
+        ):
+            sheet[f"{column}6"] = title
+        sheet["A7"] = month_start.strftime("%B %Y")
+
+        days_in_month = calendar.monthrange(month_start.year, month_start.month)[1]
+        for day_number in range(1, days_in_month + 1):
+            day = month_start.replace(day=day_number)
+            row = 7 + day_number
+            sheet.cell(row, 1, day.strftime("%a"))
+            sheet.cell(row, 2, day_number)
+
+            worklogs = synthetic_worklogs(day, self.worklogs_per_day, self.seed)
+            if not worklogs:
+                sheet.cell(row, 7, timedelta(0)).number_format = DURATION_FORMAT
+                continue
+            nlz_seconds = sum(
+                w["timeSpentSeconds"]
+                for w in worklogs
+                if w["issue"]["id"] == NLZ_ISSUE_ID
+            )
+            task_seconds = sum(w["timeSpentSeconds"] for w in worklogs) - nlz_seconds
+
+            sheet.cell(row, 7, timedelta(hours=8)).number_format = DURATION_FORMAT
+            if rnd.random() < self.mismatch_rate:
+                if rnd.random() < 0.5:
+                    sheet.cell(row, 8, "Pause?")
+                else:
+                    booked = timedelta(seconds=task_seconds + rnd.choice([-1800, 900]))
+                    sheet.cell(row, 8, booked).number_format = DURATION_FORMAT
+            else:
+                booked = timedelta(seconds=task_seconds)
+                sheet.cell(row, 8, booked).number_format = DURATION_FORMAT
+            if nlz_seconds:
+                nlz = timedelta(seconds=nlz_seconds)
+                sheet.cell(row, 12, nlz).number_format = DURATION_FORMAT
+
+        sheet.cell(8 + 31 + 1, 1, "Summe")
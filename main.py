@@ -1,11 +1,18 @@
-import pandas as pd
+import argparse
 import logging
+import sys
+import time
 from modules.booking_checker import BookingChecker
-from modules.excel_changes import ExcelChangesTracker
-from modules.util import Util
-import datetime as dt
+from modules.fingerprint_store import FingerprintStore
+from modules.sheet_layout import LayoutCache
+from modules.workbook_check import TOKEN_HELP, WorkbookCheck
+from modules.worklog_rules import WorklogRules
+from modules.worklog_store import WorklogStore
 import os
 
+# The batch runner, service and watcher are imported when used, pandas only
+# by the batch reconciliation (see --light)
+
 # FILL IN BELLOW
 #
 #
@@ -14,6 +21,36 @@ import os
 BookingChecker.bearer_token = ""
 # EXCEL FILE
 excel_file: str = ""
+# OPTIONAL: LOCAL WORKLOG CACHE, LATER RUNS ONLY FETCH CHANGED WORKLOGS ("" DISABLES IT)
+worklog_cache_file: str = "worklog_cache.sqlite3"
+# OPTIONAL: ONLY USE THE LOCAL WORKLOG CACHE, NEVER CONTACT TEMPO
+offline: bool = False
+# OPTIONAL: DROP CACHED WORKLOGS OLDER THAN THIS MANY DAYS (None KEEPS THEM)
+worklog_cache_max_age_days: int = 800
+# OPTIONAL: KEEP AT MOST THIS MANY CACHED WORKLOGS, THE OLDEST DAYS GO FIRST (None KEEPS ALL)
+worklog_cache_max_rows: int = 200000
+# OPTIONAL: FETCH CACHED WORKLOGS IN FULL AGAIN AFTER THIS MANY MINUTES, SO WORKLOGS DELETED IN TEMPO DISAPPEAR (None NEVER)
+worklog_cache_full_sync_minutes: float = 10
+# OPTIONAL: RECONCILE ALL DAYS AT ONCE (False CHECKS DAY BY DAY, BOTH GIVE THE SAME RESULT)
+batch_reconcile: bool = True
+# OPTIONAL: REMEMBER RESULTS PER DAY, LATER RUNS ONLY RE-CHECK CHANGED DAYS ("" DISABLES IT)
+fingerprint_file: str = "dsl_fingerprints.json"
+# OPTIONAL: WRITE PHASE TIMINGS, HTTP LATENCIES AND COUNTERS AS JSON AND .prom ("" DISABLES IT)
+metrics_file: str = "dsl_metrics.json"
+# OPTIONAL: ALSO EXPORT ALL CONFLICTS AS .csv OR .parquet (NEEDS pyarrow) FOR ANALYTICS ("" DISABLES IT)
+changes_file: str = ""
+# OPTIONAL: WRITE EVERY CONFLICT AS SOON AS IT IS FOUND, .jsonl OR .csv ("-" PRINTS JSON LINES, "" DISABLES IT)
+stream_file: str = "dsl_conflicts.jsonl"
+# OPTIONAL: REMEMBER WHERE EACH SHEET KEEPS MONTH, HEADER AND DAY ROWS, PER WORKBOOK ("" DISABLES IT)
+layout_cache_file: str = "dsl_layouts.json"
+# OPTIONAL: KEEP THE PARSED WORKBOOK IN <excel_file>.dslcache, UNCHANGED WORKBOOKS LOAD WITHOUT PARSING
+workbook_sidecar: bool = True
+# OPTIONAL: NON-PRODUCTIVE WORKLOGS COUNTED AS NLZ, PER CATEGORY BY "issues" (IDS), "attributes", "accounts" OR "projects"
+worklog_categories: dict = {"nlz": {"issues": [16804]}}
+# OPTIONAL: WORK ATTRIBUTES THAT MARK A WORKLOG AS HOME OFFICE
+homeoffice_attributes: dict = {"_TestBox_": "JA"}
+# OPTIONAL: TEMPO TOKEN THAT MAY READ THE WHOLE TEAM'S WORKLOGS, --batch THEN FETCHES ONCE FOR ALL ACCOUNT IDS
+fleet_token: str = ""
 
 #
 #
@@ -21,7 +58,64 @@ excel_file: str = ""
 
 
 if __name__ == "__main__":
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Check DSL workbooks against Tempo")
+    parser.add_argument(
+        "--batch",
+        metavar="DIR_OR_MANIFEST",
+        help="check many workbooks: a directory of *.xlsx with <name>.token files or a JSON manifest",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="parallel processes for --batch (default: CPUs)"
+    )
+    parser.add_argument(
+        "--output-dir", default="batch_output", help="output directory for --batch"
+    )
+    parser.add_argument(
+        "--changes-format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="format of the combined conflicts of --batch (parquet needs pyarrow)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        metavar="STREAM_FILE",
+        help="build the diff workbook from a conflict stream, e.g. of an interrupted run",
+    )
+    parser.add_argument(
+        "--stream-only",
+        action="store_true",
+        help="only write the conflicts to stream_file, without keeping them in memory (build the diff workbook with --rebuild)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and re-check the workbook every time it is saved",
+    )
+    parser.add_argument(
+        "--refresh-minutes",
+        type=float,
+        default=10,
+        help="with --watch or --serve, fetch all worklogs again this often (0 never)",
+    )
+    parser.add_argument(
+        "--light",
+        action="store_true",
+        help="quick check without pandas: reconcile day by day (same result, faster start)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run a local HTTP service checking uploaded workbooks for the team",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765, help="port for --serve (default: 8765)"
+    )
+    args = parser.parse_args()
+    WorklogRules.use(WorklogRules(worklog_categories, homeoffice_attributes))
+
     logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
     for h in logger.handlers:
         logger.removeHandler(h)  # clear all default handlers
 
@@ -33,6 +127,39 @@ if __name__ == "__main__":
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+    if args.batch:
+        from modules.batch_runner import BatchRunner
+
+        runner = BatchRunner(
+            BatchRunner.load_jobs(args.batch),
+            output_dir=args.output_dir,
+            workers=args.workers,
+            batch_reconcile=batch_reconcile,
+            changes_format=args.changes_format,
+            fleet_token=fleet_token,
+            cache_max_age_days=worklog_cache_max_age_days,
+            cache_max_rows=worklog_cache_max_rows,
+            cache_full_sync_minutes=worklog_cache_full_sync_minutes,
+        )
+        for job, result in zip(runner.jobs, runner.run()):
+            status = result.error or f"{result.changes} changes"
+            print(f"{job.name:<30} {status:<30} {result.wall_seconds:6.1f}s")
+        print(f"Summary written to {os.path.join(args.output_dir, 'summary.csv')}")
+        exit()
+
+    if args.serve:
+        from modules.check_service import CheckService
+
+        CheckService(
+            logger,
+            port=args.port,
+            cache_dir="service_cache" if worklog_cache_file else "",
+            cache_max_age_days=worklog_cache_max_age_days,
+            cache_max_rows=worklog_cache_max_rows,
+            full_sync_minutes=args.refresh_minutes,
+        ).serve_forever()
+        exit()
+
     if not os.path.isfile(excel_file):
         if not excel_file:
             logger.error("Specify a file in 'main.py'!")
@@ -40,79 +167,70 @@ if __name__ == "__main__":
             logger.error(f"Cannot find file '{excel_file}', add it to the current dir!")
         exit()
 
-    if not BookingChecker.bearer_token:
-        logger.error(
-            "Need API token from Jira Tempo: 'https://meteoserve.atlassian.net/plugins/servlet/ac/io.tempo.jira/tempo-app#!/configuration/api-integration'!"
+    if args.rebuild:
+        from modules.excel_changes import ExcelChangesTracker
+
+        tracker = ExcelChangesTracker.from_stream(
+            args.rebuild, excel_file, LayoutCache(layout_cache_file)
         )
+        if tracker.has_changes():
+            output_file = tracker.save_to_excel()
+            logger.info(f"{tracker.change_count()} changes saved to {output_file}")
+        else:
+            logger.info(f"No changes in '{args.rebuild}'")
         exit()
 
-    # Load the Excel file
-    excel_data = pd.ExcelFile(excel_file)
-
-    # Initialize Excel changes tracker
-    excel_changes_tracker = ExcelChangesTracker(excel_file)
-    checker = BookingChecker(excel_changes_tracker)
+    if args.stream_only and not stream_file:
+        logger.error("--stream-only needs a 'stream_file' in 'main.py'!")
+        exit()
 
-    if not checker.check_request():
-        logger.error(
-            "Incorrect API token, get it from from Jira Tempo: 'https://meteoserve.atlassian.net/plugins/servlet/ac/io.tempo.jira/tempo-app#!/configuration/api-integration'!"
+    worklog_store = None
+    if worklog_cache_file:
+        # Tied to the token, another token starts with an empty cache
+        worklog_store = WorklogStore(
+            worklog_cache_file,
+            offline=offline,
+            max_age_days=worklog_cache_max_age_days,
+            max_rows=worklog_cache_max_rows,
+            full_sync_minutes=worklog_cache_full_sync_minutes,
+            identity=(
+                WorklogStore.identity_for(BookingChecker.bearer_token)
+                if BookingChecker.bearer_token
+                else ""
+            ),
         )
+    elif offline:
+        logger.error("Offline mode needs a 'worklog_cache_file' in 'main.py'!")
+        exit()
+
+    if not BookingChecker.bearer_token and not offline:
+        logger.error(f"Need API token from Jira Tempo: '{TOKEN_HELP}'!")
         exit()
-    # Iterate over all sheets except the first
-    for sheet_name in excel_data.sheet_names[1:]:
-        df = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
-        df.columns = [chr(i) for i in range(ord("A"), ord("A") + len(df.columns))]
-        month_year: dt.datetime = Util.get_date_for_sheet(
-            df
-        )  # K1 corresponds to row 0 and column K
-
-        if month_year > dt.datetime.now():
-            print(f"Skipping {month_year.strftime('%b')}, not yet reached!")
-            break
-        # Loop through cells "N8" to "N38" (which is column N, rows 7 to 37 in zero-based indexing)
-        for index in range(7, 38):  # N8 corresponds to row 7 (zero-based)
-            try:
-                booked_time = Util.get_booked_time_for_index(df, index)
-                booked_time.total_seconds()
-            except Exception:
-                booked_time = dt.timedelta(0)
-
-            day = Util.get_day_for_index(df, index)
-            if not pd.to_numeric(day, errors="coerce") or pd.isna(day):
-                break
-
-            try:
-                required_hours = Util.get_required_hours_for_index(df, index)
-                required_hours.total_seconds()
-            except Exception:
-                required_hours = dt.timedelta(0)
-
-            try:
-                holiday_amount = Util.get_holiday_amount_for_index(df, index)
-                holiday_amount.total_seconds()
-            except Exception:
-                holiday_amount = dt.timedelta(0)
-
-            if pd.isna(required_hours):
-                break
-
-            if pd.isna(holiday_amount):
-                holiday_amount = None
-
-            checker.check_line(
-                day=day,
-                month_year=month_year,
-                required_hours=required_hours,
-                holiday_amount=holiday_amount,
-                booked_time_dsl=booked_time,
-                sheet_name=sheet_name,
-                logger=logger,
-                index=index,
-            )
-
-    # Save changes to Excel if any were found
-    if excel_changes_tracker.has_changes():
-        excel_file = excel_changes_tracker.save_to_excel()
-        logger.info(f"Changes have been saved to {excel_file}")
+
+    check = WorkbookCheck(
+        excel_file,
+        BookingChecker.bearer_token,
+        logger,
+        worklog_store=worklog_store,
+        batch_reconcile=batch_reconcile and not args.light,
+        fingerprint_store=(
+            FingerprintStore(fingerprint_file) if fingerprint_file else None
+        ),
+        metrics_file=metrics_file,
+        changes_file=changes_file,
+        stream_file=stream_file,
+        layout_cache=LayoutCache(layout_cache_file),
+        sidecar=workbook_sidecar,
+        stream_only=args.stream_only,
+    )
+    if args.watch:
+        from modules.workbook_watcher import WorkbookWatcher
+
+        WorkbookWatcher(check, logger, refresh_minutes=args.refresh_minutes).watch()
     else:
-        logger.info("No changes were found in the timesheet")
+        check.run()
+    if args.light:
+        logger.info(
+            f"Lightweight check took {time.perf_counter() - started:.2f}s, pandas "
+            f"{'was loaded' if 'pandas' in sys.modules else 'not loaded'}"
+        )
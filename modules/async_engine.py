@@ -0,0 +1,94 @@
+import asyncio
+from datetime import date
+from typing import Callable, Iterable, List, Optional
+from modules.query_planner import DateRange
+from modules.tempo_client import TempoClient
+from modules.worklog_batch import WorklogBatch
+
+
+class AsyncTempoEngine:
+    """
+    Fetches worklogs for many dates or ranges at once.
+
+    Each range is paged sequentially, but up to `concurrency` ranges are in
+    flight at the same time. The blocking TempoClient calls run in worker
+    threads so they share its pooled session (keep the pool at least as large
+    as the concurrency). Results always come back in the order of the input,
+    regardless of which request finishes first.
+    """
+
+    def __init__(
+        self, client: TempoClient, concurrency: int = 8, page_limit: int = 5000
+    ):
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+        self.client = client
+        self.concurrency = concurrency
+        self.page_limit = page_limit
+
+    async def _fetch_range(
+        self,
+        semaphore: asyncio.Semaphore,
+        date_range: DateRange,
+        updated_from: Optional[str],
+        search: Callable,
+    ):
+        async with semaphore:
+            return await asyncio.to_thread(
+                search,
+                date_range.from_str,
+                date_range.to_str,
+                self.page_limit,
+                updated_from,
+            )
+
+    async def fetch_ranges_async(
+        self,
+        ranges: Iterable[DateRange],
+        updated_from: Optional[List[Optional[str]]] = None,
+        search: Optional[Callable] = None,
+    ) -> List[List[dict]]:
+        """
+        Worklogs of every range, in the order the ranges were given.
+        updated_from optionally holds one updatedFrom value per range (delta syncs),
+        search defaults to TempoClient.search_worklogs.
+        """
+        search = search or self.client.search_worklogs
+        ranges = list(ranges)
+        if updated_from is None:
+            updated_from = [None] * len(ranges)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(
+            *(
+                self._fetch_range(semaphore, date_range, since, search)
+                for date_range, since in zip(ranges, updated_from)
+            )
+        )
+
+    async def fetch_days_async(self, days: Iterable[date]) -> List[List[dict]]:
+        """Worklogs of every single day, in the order the days were given"""
+        return await self.fetch_ranges_async(DateRange(day, day) for day in days)
+
+    async def fetch_batches_async(
+        self, ranges: Iterable[DateRange]
+    ) -> List[WorklogBatch]:
+        """Like fetch_ranges_async, but every range comes back as a WorklogBatch"""
+        return await self.fetch_ranges_async(
+            ranges, search=self.client.search_worklog_batch
+        )
+
+    def fetch_batches(self, ranges: Iterable[DateRange]) -> List[WorklogBatch]:
+        """Blocking wrapper around fetch_batches_async for sync callers"""
+        return asyncio.run(self.fetch_batches_async(ranges))
+
+    def fetch_ranges(
+        self,
+        ranges: Iterable[DateRange],
+        updated_from: Optional[List[Optional[str]]] = None,
+    ) -> List[List[dict]]:
+        """Blocking wrapper around fetch_ranges_async for sync callers"""
+        return asyncio.run(self.fetch_ranges_async(ranges, updated_from))
+
+    def fetch_days(self, days: Iterable[date]) -> List[List[dict]]:
+        """Blocking wrapper around fetch_days_async for sync callers"""
+        return asyncio.run(self.fetch_days_async(days))
@@ -0,0 +1,335 @@
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from datetime import date
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Set, Tuple
+from modules.booking_checker import BookingChecker
+from modules.change_log import ChangeLog
+from modules.day_table import DayTable
+from modules.fingerprint_store import FingerprintStore
+from modules.fleet_fetch import FleetFetcher, FleetWorklogs
+from modules.rate_governor import RateGovernor
+from modules.sheet_layout import LayoutCache
+from modules.tempo_client import TempoClient
+from modules.workbook_check import CheckResult, WorkbookCheck
+from modules.workbook_loader import WorkbookLoader
+from modules.worklog_rules import WorklogRules
+from modules.worklog_store import WorklogStore
+
+
+@dataclass
+class BatchJob:
+    name: str
+    excel_file: str
+    bearer_token: str
+    account_id: str = ""  # Atlassian account id, for the fleet fetch
+
+
+class BatchRunner:
+    """
+    Checks the DSL workbooks of a whole team in parallel, one process per
+    workbook. Every workbook gets its own output directory with its diff
+    workbook, conflict stream, log file, worklog cache, fingerprints and
+    metrics; a combined summary is written at the end.
+
+    Jobs come from either
+    - a directory: every *.xlsx with its Tempo token in "<name>.token" next to it
+      (and optionally its account id in "<name>.account")
+    - a JSON manifest: [{"excel_file": "...", "bearer_token": "...", "name": "...",
+      "account_id": "..."}] (name, account_id and bearer_token are optional,
+      relative paths are relative to the manifest)
+
+    With a fleet_token (a token that may read the worklogs of the whole
+    team), the worklogs of all jobs with an account id are fetched once
+    before the checks, with one request per date range for all of them, and
+    handed to the workers in shared memory. Those jobs need no token of
+    their own; jobs without an account id fetch with their own token.
+    """
+
+    def __init__(
+        self,
+        jobs: List[BatchJob],
+        output_dir: str = "batch_output",
+        workers: Optional[int] = None,
+        batch_reconcile: bool = True,
+        changes_format: str = "csv",
+        fleet_token: str = "",
+        cache_max_age_days: Optional[int] = None,
+        cache_max_rows: Optional[int] = None,
+        cache_full_sync_minutes: Optional[float] = None,
+    ):
+        """
+        changes_format: "csv" or "parquet" (needs pyarrow) for the conflicts of all jobs
+        cache_max_age_days / cache_max_rows: eviction policy of the worklog caches
+        cache_full_sync_minutes: age of a cached range's last full fetch that
+        triggers a full fetch again (None never)
+        """
+        self.jobs = jobs
+        self.output_dir = output_dir
+        self.workers = workers
+        self.batch_reconcile = batch_reconcile
+        self.changes_format = changes_format
+        self.fleet_token = fleet_token
+        self.cache_limits = (
+            cache_max_age_days,
+            cache_max_rows,
+            cache_full_sync_minutes,
+        )
+        if changes_format == "parquet":
+            ChangeLog.pyarrow()  # fail before checking, not after
+
+    @staticmethod
+    def load_jobs(source: str) -> List[BatchJob]:
+        if os.path.isdir(source):
+            return BatchRunner._jobs_from_directory(source)
+        return BatchRunner._jobs_from_manifest(source)
+
+    @staticmethod
+    def _jobs_from_directory(directory: str) -> List[BatchJob]:
+        jobs = []
+        for file_name in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(file_name)
+            # Skip Excel lock files of workbooks that are open
+            if extension.lower() != ".xlsx" or file_name.startswith("~$"):
+                continue
+            bearer_token = BatchRunner._read_file(
+                os.path.join(directory, f"{name}.token")
+            )
+            account_id = BatchRunner._read_file(
+                os.path.join(directory, f"{name}.account")
+            )
+            jobs.append(
+                BatchJob(
+                    name, os.path.join(directory, file_name), bearer_token, account_id
+                )
+            )
+        return jobs
+
+    @staticmethod
+    def _read_file(path: str) -> str:
+        """The stripped content of a small text file, empty if it does not exist"""
+        if not os.path.isfile(path):
+            return ""
+        with open(path) as f:
+            return f.read().strip()
+
+    @staticmethod
+    def _jobs_from_manifest(manifest_file: str) -> List[BatchJob]:
+        base_dir = os.path.dirname(os.path.abspath(manifest_file))
+        with open(manifest_file) as f:
+            entries = json.load(f)
+        jobs = []
+        for entry in entries:
+            excel_file = os.path.join(base_dir, entry["excel_file"])
+            name = (
+                entry.get("name") or os.path.splitext(os.path.basename(excel_file))[0]
+            )
+            jobs.append(
+                BatchJob(
+                    name,
+                    excel_file,
+                    entry.get("bearer_token", ""),
+                    entry.get("account_id", ""),
+                )
+            )
+        return jobs
+
+    def run(self) -> List[CheckResult]:
+        """Check all workbooks, results come back in job order"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        # All workers pace their Tempo requests together and classify worklogs alike
+        governor = RateGovernor(processes=True)
+        fleet, block = None, None
+        if self.fleet_token:
+            # The fleet block is created after the workers start, they must
+            # share the tracker of this process or theirs unlink it on exit
+            resource_tracker.ensure_running()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=BatchRunner.init_worker,
+                initargs=(governor, WorklogRules.active()),
+            ) as executor:
+                if self.fleet_token:
+                    fleet, block = self.fetch_fleet(governor, executor)
+                results = list(
+                    executor.map(
+                        BatchRunner.run_job,
+                        self.jobs,
+                        [self.output_dir] * len(self.jobs),
+                        [self.batch_reconcile] * len(self.jobs),
+                        [self.changes_format] * len(self.jobs),
+                        [fleet] * len(self.jobs),
+                        [self.cache_limits] * len(self.jobs),
+                    )
+                )
+        finally:
+            if block is not None:
+                FleetWorklogs.release(block)
+        self.write_summary(results)
+        self.write_changes(results)
+        return results
+
+    def fetch_fleet(
+        self, governor: RateGovernor, executor: ProcessPoolExecutor
+    ) -> Tuple[Optional[FleetWorklogs], Optional[shared_memory.SharedMemory]]:
+        """
+        Fetch the worklogs of every job with an account id for all days of
+        their workbooks at once, returns the handle for the workers and the
+        shared memory block (both None if no job has an account id).
+        The workers read the days of the workbooks in parallel.
+        """
+        jobs = [
+            job
+            for job in self.jobs
+            if job.account_id and os.path.isfile(job.excel_file)
+        ]
+        if not jobs:
+            return None, None
+        days: Set[date] = set()
+        for workbook_days in executor.map(
+            BatchRunner.workbook_days, [job.excel_file for job in jobs]
+        ):
+            days.update(workbook_days)
+        client = TempoClient(
+            self.fleet_token, base_url=BookingChecker.base_url, governor=governor
+        )
+        try:
+            shards, ranges = FleetFetcher(
+                client,
+                BookingChecker.concurrency,
+                BookingChecker.page_limit,
+                BookingChecker.fetch_granularity,
+            ).fetch(days, sorted({job.account_id for job in jobs}))
+        finally:
+            client.close()
+        return FleetWorklogs.share(shards, ranges)
+
+    @staticmethod
+    def workbook_days(excel_file: str) -> List[date]:
+        """The days of a workbook up to the current month, runs inside a worker process"""
+        return [
+            day
+            for sheet in WorkbookLoader(excel_file).load().sheets
+            for day in DayTable.from_sheet(sheet).dates()
+        ]
+
+    @staticmethod
+    def init_worker(governor: RateGovernor, rules: WorklogRules) -> None:
+        """Share the rate governor and the worklog rules of the batch with a worker"""
+        RateGovernor.install(governor)
+        WorklogRules.use(rules)
+
+    @staticmethod
+    def run_job(
+        job: BatchJob,
+        output_dir: str,
+        batch_reconcile: bool,
+        changes_format: str,
+        fleet: Optional[FleetWorklogs] = None,
+        cache_limits: Tuple[Optional[int], Optional[int], Optional[float]] = (
+            None,
+            None,
+            None,
+        ),
+    ) -> CheckResult:
+        """Check one workbook, runs inside a worker process"""
+        job_dir = os.path.join(output_dir, job.name)
+        os.makedirs(job_dir, exist_ok=True)
+
+        logger = logging.getLogger(f"dsl.batch.{job.name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.FileHandler(os.path.join(job_dir, "check.log"))
+        handler.setFormatter(
+            logging.Formatter(
+                fmt="%(asctime)s %(levelname)s - %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S",
+            )
+        )
+        logger.addHandler(handler)
+
+        worklog_store = None
+        try:
+            if not os.path.isfile(job.excel_file):
+                logger.error(f"Cannot find file '{job.excel_file}'!")
+                return CheckResult(job.excel_file, error="File not found")
+            worklogs = fleet.batch(job.account_id) if fleet is not None else None
+            if worklogs is None and not job.bearer_token:
+                logger.error(f"No API token for '{job.excel_file}'!")
+                return CheckResult(job.excel_file, error="Missing API token")
+
+            if worklogs is None:
+                # Worklogs belong to the token's user, so every job caches separately
+                max_age_days, max_rows, full_sync_minutes = cache_limits
+                worklog_store = WorklogStore(
+                    os.path.join(job_dir, "worklog_cache.sqlite3"),
+                    max_age_days=max_age_days,
+                    max_rows=max_rows,
+                    identity=WorklogStore.identity_for(job.bearer_token),
+                    full_sync_minutes=full_sync_minutes,
+                )
+            return WorkbookCheck(
+                job.excel_file,
+                job.bearer_token,
+                logger,
+                worklog_store=worklog_store,
+                batch_reconcile=batch_reconcile,
+                output_dir=job_dir,
+                fingerprint_store=FingerprintStore(
+                    os.path.join(job_dir, "dsl_fingerprints.json")
+                ),
+                metrics_file=os.path.join(job_dir, "metrics.json"),
+                changes_file=os.path.join(job_dir, f"changes.{changes_format}"),
+                changes_labels={"employee": job.name},
+                stream_file=os.path.join(job_dir, "conflicts.jsonl"),
+                layout_cache=LayoutCache(os.path.join(job_dir, "dsl_layouts.json")),
+                worklogs=worklogs,
+                worklog_days=fleet.days() if worklogs is not None else (),
+            ).run()
+        except Exception as e:
+            logger.exception(f"Checking '{job.excel_file}' failed")
+            return CheckResult(job.excel_file, error=repr(e))
+        finally:
+            if worklog_store is not None:
+                worklog_store.close()
+            logger.removeHandler(handler)
+            handler.close()
+
+    def write_summary(self, results: List[CheckResult]) -> str:
+        """Write the combined summary as CSV, returns its path"""
+        summary_file = os.path.join(self.output_dir, "summary.csv")
+        with open(summary_file, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=["name", *(field.name for field in fields(CheckResult))]
+            )
+            writer.writeheader()
+            for job, result in zip(self.jobs, results):
+                writer.writerow({"name": job.name, **asdict(result)})
+        return summary_file
+
+    def write_changes(self, results: List[CheckResult]) -> str:
+        """Combine the conflicts of all jobs into one file, returns its path"""
+        changes_file = os.path.join(self.output_dir, f"changes.{self.changes_format}")
+        job_files = [result.changes_file for result in results if result.changes_file]
+        if self.changes_format == "parquet":
+            pa = ChangeLog.pyarrow()
+            import pyarrow.parquet as pq
+
+            tables = [pq.read_table(job_file) for job_file in job_files]
+            if tables:
+                pq.write_table(pa.concat_tables(tables), changes_file)
+            return changes_file
+
+        with open(changes_file, "w", newline="") as combined:
+            for position, job_file in enumerate(job_files):
+                with open(job_file, newline="") as f:
+                    header = f.readline()
+                    if position == 0:
+                        combined.write(header)
+                    combined.writelines(f)
+        return changes_file
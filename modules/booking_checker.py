@@ -1,37 +1,165 @@
 import logging
-from datetime import datetime, timedelta
-import pandas
-import requests
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+import numpy as np
+from requests.adapters import HTTPAdapter
+from modules.async_engine import AsyncTempoEngine
+from modules.day_summary import DaySummaries, DaySummary
+from modules.metrics import Metrics
+from modules.query_planner import QueryPlanner
+from modules.seconds import Seconds
+from modules.tempo_client import TempoClient
 from modules.util import Util
+from modules.worklog_batch import WorklogBatch
+from modules.worklog_store import WorklogStore
 
 
 class BookingChecker:
     # Read the first sheet for common values
     bearer_token: str = None
 
-    # Initialize API URL and headers
-    url = "https://api.tempo.io/4/worklogs/search"
-
-    def __init__(self, excel_changes_tracker):
+    # Tempo API base URL, can point at a local stand-in
+    base_url: str = "https://api.tempo.io"
+
+    # Tempo's maximum page size, pages are followed via metadata.next
+    page_limit: int = 5000
+    # How far a single prefetch range may reach: "day", "month" or "year"
+    fetch_granularity: str = "month"
+    # Number of prefetch ranges requested at the same time
+    concurrency: int = 8
+    # Optional on-disk cache read before Tempo, only deltas are fetched then
+    worklog_store: Optional[WorklogStore] = None
+    # Optional connection pool shared by all checkers of a process (service mode)
+    http_adapter: Optional[HTTPAdapter] = None
+
+    def __init__(
+        self,
+        excel_changes_tracker,
+        bearer_token: Optional[str] = None,
+        worklog_store: Optional[WorklogStore] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.excel_changes_tracker = excel_changes_tracker  # For Excel output
+        # Per instance values (batch runs), falling back to the class wide ones
+        self.bearer_token = bearer_token or self.bearer_token
+        self.worklog_store = worklog_store or self.worklog_store
+        self.metrics = metrics
+        self.client = TempoClient(
+            self.bearer_token,
+            base_url=self.base_url,
+            pool_maxsize=max(16, self.concurrency),
+            metrics=metrics,
+            adapter=self.http_adapter,
+        )
+        # All fetched worklogs as compact columns and the days they cover
+        self.worklogs = WorklogBatch.empty()
+        self.prefetched_days: Set[date] = set()
+        self._summaries: Optional[DaySummaries] = None
 
-    def check_request(self) -> bool:
+    def check_request(self) -> int:
+        """
+        The HTTP status of a minimal search: 200 for a valid token, 401/403
+        for a rejected one, 429/503 while Tempo still throttles after the retries
+        """
         data = {
             "from": datetime.now().strftime("%Y-%m-%d"),
             "to": datetime.now().strftime("%Y-%m-%d"),
             "limit": 1,
         }
-        response = requests.post(
-            self.url,
-            headers={
-                "Authorization": f"Bearer {self.bearer_token}",
-                "Content-Type": "application/json",
-            },
-            json=data,
-        )
-        if response.status_code != 200:
-            return False
-        return True
+        response = self.client.search(data)
+        response.close()
+        return response.status_code
+
+    def fetch_worklogs(self, date_from: str, date_to: str) -> List[dict]:
+        """Fetch all worklogs between date_from and date_to ("YYYY-MM-DD", inclusive)"""
+        return self.client.search_worklogs(date_from, date_to, self.page_limit)
+
+    def prefetch(
+        self, days: Iterable[date], refresh: bool = False, revalidate: bool = False
+    ) -> int:
+        """
+        Fetch the worklogs of all given days in as few ranges as possible
+        and keep them in memory for check_line. Returns the number of ranges.
+        With refresh the ranges are fetched in full (also past the worklog
+        store) and replace the worklogs held for them, so worklogs deleted in
+        Tempo disappear as well. revalidate replaces them too, but through
+        the store's delta sync, which only drops deleted worklogs once a range
+        is due for a full sync (WorklogStore.full_sync_minutes).
+        """
+        ranges = QueryPlanner(self.fetch_granularity).plan(days)
+        if self.worklog_store is not None and self.worklog_store.offline:
+            # A range never synced is unknown, not empty: its days stay unfetched
+            ranges = self.worklog_store.cached_ranges(ranges)
+        if not ranges:
+            return 0
+        if refresh or revalidate:
+            keep = np.ones(len(self.worklogs), dtype=bool)
+            for date_range in ranges:
+                keep &= (self.worklogs.date < np.datetime64(date_range.start)) | (
+                    self.worklogs.date > np.datetime64(date_range.end)
+                )
+            self.worklogs = self.worklogs[keep]
+        engine = AsyncTempoEngine(self.client, self.concurrency, self.page_limit)
+        if self.worklog_store is None:
+            batches = engine.fetch_batches(ranges)
+        else:
+            batches = [
+                WorklogBatch.from_worklogs(worklogs)
+                for worklogs in self.sync_store(engine, ranges, full=refresh)
+            ]
+
+        self.worklogs = WorklogBatch.concat([self.worklogs, *batches])
+        self._summaries = None
+        for date_range in ranges:
+            self.prefetched_days.update(date_range.days())
+        return len(ranges)
+
+    def sync_store(
+        self, engine: AsyncTempoEngine, ranges: list, full: bool = False
+    ) -> List[List[dict]]:
+        """
+        Bring the worklog store up to date for the ranges (full fetch for new
+        ranges, those due for a full sync or all with full, updatedFrom delta
+        for the others) and read them back from it.
+        """
+        store = self.worklog_store
+        if not store.offline:
+            updated_from = [
+                None if full else store.updated_from(date_range)
+                for date_range in ranges
+            ]
+            if self.metrics is not None:
+                misses = updated_from.count(None)
+                self.metrics.increment("cache_hits", len(ranges) - misses)
+                self.metrics.increment("cache_misses", misses)
+            synced_at = datetime.now(timezone.utc)
+            fetched = engine.fetch_ranges(ranges, updated_from)
+            for date_range, since, worklogs in zip(ranges, updated_from, fetched):
+                store.merge(date_range, worklogs, synced_at, full=since is None)
+        elif self.metrics is not None:
+            self.metrics.increment("cache_hits", len(ranges))
+        return [store.load(date_range) for date_range in ranges]
+
+    def get_worklogs_for_date(self, formatted_date: str) -> WorklogBatch:
+        """Worklogs of one day, from memory if prefetched, otherwise fetched"""
+        day = datetime.strptime(formatted_date, "%Y-%m-%d").date()
+        if day not in self.prefetched_days:
+            self.prefetch([day])
+        return self.worklogs.for_date(day)
+
+    @property
+    def summaries(self) -> DaySummaries:
+        """Per-day summaries of all fetched worklogs, rebuilt after a prefetch"""
+        if self._summaries is None:
+            self._summaries = DaySummaries.aggregate(self.worklogs)
+        return self._summaries
+
+    def get_day_summary(self, formatted_date: str) -> DaySummary:
+        """Worklog summary of one day, fetched first if not prefetched"""
+        day = datetime.strptime(formatted_date, "%Y-%m-%d").date()
+        if day not in self.prefetched_days:
+            self.prefetch([day])
+        return self.summaries.get(day)
 
     def check_line(
         self,
@@ -46,61 +174,16 @@ class BookingChecker:
     ) -> bool:
         formatted_date = Util.generate_parsed_date_as_format_str(int(day), month_year)
 
-        data = {"from": formatted_date, "to": formatted_date, "limit": 50}
-        if holiday_amount is None:
-            holiday_amount = timedelta(seconds=0)
-
-        # Send the POST request
-        response = requests.post(
-            self.url,
-            headers={
-                "Authorization": f"Bearer {self.bearer_token}",
-                "Content-Type": "application/json",
-            },
-            json=data,
+        # Everything below is integer seconds, strings are only made for the log
+        holiday_seconds = self.dsl_seconds(holiday_amount)
+        booked_seconds = (
+            0 if booked_time_dsl == "Pause?" else self.dsl_seconds(booked_time_dsl)
         )
-        response_json = response.json()
 
-        # Extract and sum the worklog times
-        seconds_list = [
-            item["timeSpentSeconds"] for item in response_json.get("results", [])
-        ]
-        total_real_task_seconds = sum(seconds_list)
-
-        grouped_nlz_seconds = sum(
-            [
-                item["timeSpentSeconds"]
-                for item in response_json.get("results", [])
-                if item["issue"]["self"]
-                == "https://meteoserve.atlassian.net/rest/api/2/issue/16804"
-            ]
-            or [0]
-        )
-
-        # Remove not prod time from the total time
-        total_real_task_seconds -= grouped_nlz_seconds
-
-        # Format the total hours as HH:MM:SS
-        (hours_only, minutes, seconds) = Util.get_round_up_time(total_real_task_seconds)
-
-        formatted_time_real_tasks_api = f"{hours_only:02}:{minutes:02}:{seconds:02}"
-
-        (hours_only, minutes, seconds) = Util.get_round_up_time(grouped_nlz_seconds)
-        formatted_time_nlz_api = f"{hours_only:02}:{minutes:02}:{seconds:02}"
-
-        formatted_time_real_tasks_api_str = datetime.strptime(
-            formatted_time_real_tasks_api, "%H:%M:%S"
-        ).strftime("%H:%M:%S")
-
-        formatted_nlz_time_api_str = datetime.strptime(
-            formatted_time_nlz_api, "%H:%M:%S"
-        ).strftime("%H:%M:%S")
-
-        formatted_holiday_dsl = (
-            datetime.strptime(holiday_amount, "%H:%M:%S").strftime("%H:%M:%S")
-            if type(holiday_amount) is str
-            else Util.strfdelta(holiday_amount, "%H:%M:%S")
-        )
+        # Task time (without the not prod NLZ time), NLZ time, earliest start and home office
+        summary = self.get_day_summary(formatted_date)
+        total_real_task_seconds = summary.task_seconds
+        grouped_nlz_seconds = summary.nlz_seconds
 
         # If the time is in a pause on dsl, it means we have may not booked it -> we need to book time
         # We have to determine if its Holiday first though
@@ -108,108 +191,31 @@ class BookingChecker:
         # If the total time is less than the required hours, we need to book the difference
         if booked_time_dsl == "Pause?":
             # check if it the holiday amount is not None, if it is, we need to book the difference
-            if holiday_amount.total_seconds() == 0:
-                # Check if we actually have a difference in required hours and booked hours in jira
-                if booked_time_dsl.total_seconds() == 0 and total_real_task_seconds > 0:
+            # Check if we actually have a difference in required hours and booked hours in jira
+            if holiday_seconds == 0 and total_real_task_seconds > 0:
+                logger.error(
+                    f"Found unbooked Time in DSL Sheet '{sheet_name}' - {formatted_date}, calculating date"
+                )
+                # the earliest start, json["results"]["startTime"]: "09:00:00"
+                logger.error(
+                    f"Earliest time found: {Seconds.to_time(summary.earliest_start)}"
+                )
+                logger.error(f"Jira Tasks:{Seconds.format(total_real_task_seconds)}")
+
+                blocks = self.propose_blocks(
+                    summary.earliest_start, total_real_task_seconds
+                )
+                logger.error(
+                    f"Need to book {Seconds.to_time(blocks[0])} - {Seconds.to_time(blocks[1])}"
+                )
+                if blocks[2] is not None:
                     logger.error(
-                        f"Found unbooked Time in DSL Sheet '{sheet_name}' - {formatted_date}, calculating date"
-                    )
-                    # find the earliest timedelta
-                    # json["results"]["startTime"]: "09:00:00"
-                    earliest_time = min(
-                        [
-                            datetime.strptime(item["startTime"], "%H:%M:%S").time()
-                            for item in response_json["results"]
-                        ]
+                        f"and then {Seconds.to_time(blocks[2])} - {Seconds.to_time(blocks[3])}"
                     )
-
-                    logger.error("Earliest time found: " + str(earliest_time))
-                    logger.error(f"Jira Tasks:{formatted_time_real_tasks_api_str}")
-
-                    # Check if we need a break (6 hours or more)
-                    needs_break = total_real_task_seconds >= 21600  # 6 hours in seconds
-
-                    if needs_break:
-                        # Calculate time available until 12:00
-                        seconds_to_12 = (
-                            timedelta(hours=12).total_seconds()
-                            - timedelta(
-                                hours=earliest_time.hour,
-                                minutes=earliest_time.minute,
-                                seconds=earliest_time.second,
-                            ).seconds
-                        )
-
-                        # Split the time with a break
-                        start_am = earliest_time
-                        end_am = datetime.strptime("12:00:00", "%H:%M:%S").time()
-                        start_pm = datetime.strptime("12:30:00", "%H:%M:%S").time()
-                        end_pm = self.add_seconds_to_time(
-                            start_pm, total_real_task_seconds - seconds_to_12
-                        )
-                        logger.error(
-                            f"Need to book {start_am.strftime('%H:%M:%S')} - {end_am.strftime('%H:%M:%S')}"
-                        )
-                        logger.error(
-                            f"and then {start_pm.strftime('%H:%M:%S')} - {end_pm.strftime('%H:%M:%S')}"
-                        )
-
-                        # Check if any worklog has homeoffice attribute
-                        is_homeoffice = any(
-                            any(
-                                attr.get("key") == "_TestBox_"
-                                and attr.get("value") == "JA"
-                                for attr in item.get("attributes", {}).get("values", [])
-                            )
-                            for item in response_json.get("results", [])
-                        )
-
-                        # Add to Excel tracker with break
-                        self.excel_changes_tracker.add_change(
-                            sheet_name=sheet_name,
-                            row=index,
-                            proposed_am_start=start_am,
-                            proposed_am_end=end_am,
-                            proposed_pm_start=start_pm,
-                            proposed_pm_end=end_pm,
-                            is_homeoffice=is_homeoffice,
-                            nlz_time=formatted_nlz_time_api_str
-                            if grouped_nlz_seconds > 0
-                            else None,
-                        )
-                    else:
-                        # No break needed - book all time starting from earliest_time
-                        start_am = earliest_time
-                        end_am = self.add_seconds_to_time(
-                            earliest_time, total_real_task_seconds
-                        )
-                        logger.error(
-                            f"Need to book {start_am.strftime('%H:%M:%S')} - {end_am.strftime('%H:%M:%S')}"
-                        )
-
-                        # Check if any worklog has homeoffice attribute
-                        is_homeoffice = any(
-                            any(
-                                attr.get("key") == "_TestBox_"
-                                and attr.get("value") == "JA"
-                                for attr in item.get("attributes", {}).get("values", [])
-                            )
-                            for item in response_json.get("results", [])
-                        )
-
-                        # Add to Excel tracker without break
-                        self.excel_changes_tracker.add_change(
-                            sheet_name=sheet_name,
-                            row=index,
-                            proposed_am_start=start_am,
-                            proposed_am_end=end_am,
-                            is_homeoffice=is_homeoffice,
-                            nlz_time=formatted_nlz_time_api_str
-                            if grouped_nlz_seconds > 0
-                            else None,
-                        )
-
-                    return True
+                self.add_change(
+                    sheet_name, index, blocks, summary, booked_seconds, holiday_seconds
+                )
+                return True
 
             # else:
             #     # Check if the difference is more than 5 seconds, if it is, we need to book the difference
@@ -221,13 +227,7 @@ class BookingChecker:
             #         logger.error(f"Jira NLZ:  {formatted_nlz_time_api_str}")
 
             #         # Check if any worklog has homeoffice attribute
-            #         is_homeoffice = any(
-            #             any(
-            #                 attr.get("key") == "_TestBox_" and attr.get("value") == "JA"
-            #                 for attr in item.get("attributes", {}).get("values", [])
-            #             )
-            #             for item in response_json.get("results", [])
-            #         )
+            #         is_homeoffice = bool(worklogs.homeoffice.any())
 
             #         # Add to Excel tracker
             #         self.excel_changes_tracker.add_change(
@@ -243,87 +243,88 @@ class BookingChecker:
         # check if the booked is the same in both jira and dsl, otherwise advise
         # also check if there is booked nlz, as this is not real time, and we need to check if
         # the booked time is less than the required time
-        else:
-            formatted_task_dsl = (
-                datetime.strptime(booked_time_dsl, "%H:%M:%S").strftime("%H:%M:%S")
-                if type(booked_time_dsl) is str
-                else Util.strfdelta(booked_time_dsl, "%H:%M:%S")
+        # (a pause row left over from above counts as nothing booked)
+        if Seconds.round_up(booked_seconds) != Seconds.round_up(
+            total_real_task_seconds
+        ):
+            logger.error(
+                f"Inconsistent booking found in Sheet '{sheet_name}' - {formatted_date}"
             )
-            if formatted_task_dsl != formatted_time_real_tasks_api_str:
-                logger.error(
-                    f"Inconsistent booking found in Sheet '{sheet_name}' - {formatted_date}"
-                )
-                logger.error(f"DSL Task:  {formatted_task_dsl}")
-                logger.error(f"DSL NLZ:   {formatted_holiday_dsl}")
-                logger.error(f"Jira Tasks:{formatted_time_real_tasks_api_str}")
-                logger.error(f"Jira NLZ:  {formatted_nlz_time_api_str}")
-
-                # Check if any worklog has homeoffice attribute
-                is_homeoffice = any(
-                    any(
-                        attr.get("key") == "_TestBox_" and attr.get("value") == "JA"
-                        for attr in item.get("attributes", {}).get("values", [])
-                    )
-                    for item in response_json.get("results", [])
-                )
-
-                # Calculate proposed times based on Jira entries
-                earliest_time = min(
-                    [
-                        datetime.strptime(item["startTime"], "%H:%M:%S").time()
-                        for item in response_json["results"]
-                    ]
-                )
-
-                # Check if we need a break (6 hours or more)
-                needs_break = total_real_task_seconds >= 21600  # 6 hours in seconds
+            logger.error(f"DSL Task:  {Seconds.format(booked_seconds)}")
+            logger.error(f"DSL NLZ:   {Seconds.format(holiday_seconds)}")
+            logger.error(f"Jira Tasks:{Seconds.format(total_real_task_seconds)}")
+            logger.error(f"Jira NLZ:  {Seconds.format(grouped_nlz_seconds)}")
+
+            # Calculate proposed times based on Jira entries
+            blocks = self.propose_blocks(
+                summary.earliest_start, total_real_task_seconds
+            )
+            self.add_change(
+                sheet_name, index, blocks, summary, booked_seconds, holiday_seconds
+            )
+        return False
 
-                if needs_break:
-                    # Calculate time available until 12:00
-                    seconds_to_12 = (
-                        timedelta(hours=12).total_seconds()
-                        - timedelta(
-                            hours=earliest_time.hour,
-                            minutes=earliest_time.minute,
-                            seconds=earliest_time.second,
-                        ).seconds
-                    )
+    def add_change(
+        self,
+        sheet_name: str,
+        index: int,
+        blocks: tuple,
+        summary: DaySummary,
+        booked_seconds: int,
+        holiday_seconds: int,
+    ) -> None:
+        """Add the proposed blocks (seconds since midnight or None) to the Excel tracker"""
+        am_start, am_end, pm_start, pm_end = (
+            Seconds.to_time(block) if block is not None else None for block in blocks
+        )
+        self.excel_changes_tracker.add_change(
+            sheet_name=sheet_name,
+            row=index,
+            proposed_am_start=am_start,
+            proposed_am_end=am_end,
+            proposed_pm_start=pm_start,
+            proposed_pm_end=pm_end,
+            is_homeoffice=summary.homeoffice,
+            nlz_time=summary.nlz_seconds if summary.nlz_seconds > 0 else None,
+            day=summary.day,
+            dsl_task_seconds=booked_seconds,
+            dsl_nlz_seconds=holiday_seconds,
+            jira_task_seconds=summary.task_seconds,
+            jira_nlz_seconds=summary.nlz_seconds,
+        )
 
-                    # Split the time with a break
-                    proposed_am_start = earliest_time
-                    proposed_am_end = datetime.strptime("12:00:00", "%H:%M:%S").time()
-                    proposed_pm_start = datetime.strptime("12:30:00", "%H:%M:%S").time()
-                    proposed_pm_end = self.add_seconds_to_time(
-                        proposed_pm_start, total_real_task_seconds - seconds_to_12
-                    )
-                else:
-                    # No break needed - book all time starting from earliest_time
-                    proposed_am_start = earliest_time
-                    proposed_am_end = self.add_seconds_to_time(
-                        earliest_time, total_real_task_seconds
-                    )
-                    proposed_pm_start = None
-                    proposed_pm_end = None
+    @staticmethod
+    def propose_blocks(earliest_start: int, task_seconds: int) -> tuple:
+        """
+        AM start/end and PM start/end (None without a break) in seconds since
+        midnight, wrapping past midnight. Nothing is proposed without a start.
+        """
+        if earliest_start < 0:
+            return (None, None, None, None)
+        # Check if we need a break (6 hours or more)
+        if task_seconds >= 21600:
+            # Split the time with a break at 12:00 - 12:30
+            seconds_to_12 = 12 * Seconds.HOUR - earliest_start
+            pm_start = 12 * Seconds.HOUR + 30 * Seconds.MINUTE
+            pm_end = (pm_start + task_seconds - seconds_to_12) % Seconds.DAY
+            return (earliest_start, 12 * Seconds.HOUR, pm_start, pm_end)
+        # No break needed - book all time starting from the earliest start
+        return (
+            earliest_start,
+            (earliest_start + task_seconds) % Seconds.DAY,
+            None,
+            None,
+        )
 
-                # Add to Excel tracker
-                self.excel_changes_tracker.add_change(
-                    sheet_name=sheet_name,
-                    row=index,
-                    proposed_am_start=proposed_am_start,
-                    proposed_am_end=proposed_am_end,
-                    proposed_pm_start=proposed_pm_start,
-                    proposed_pm_end=proposed_pm_end,
-                    is_homeoffice=is_homeoffice,
-                    nlz_time=formatted_nlz_time_api_str
-                    if grouped_nlz_seconds > 0
-                    else None,
-                )
-        return False
+    @staticmethod
+    def dsl_seconds(value: None | str | timedelta) -> int:
+        """A DSL duration ("HH:MM:SS" or a duration cell) as seconds of the day"""
+        if isinstance(value, str):
+            return Seconds.parse(value)
+        return Seconds.from_duration(value) % Seconds.DAY
 
     def add_seconds_to_time(self, time: datetime.time, seconds: float) -> datetime.time:
         """
         Add seconds to a datetime.time object.
         """
-        return (
-            datetime.combine(datetime.today(), time) + timedelta(seconds=seconds)
-        ).time()
+        return Seconds.to_time(Seconds.from_time(time) + int(seconds))
@@ -0,0 +1,334 @@
+import csv
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from modules.seconds import Seconds
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@dataclass
+class ExcelChange:
+    sheet_name: str
+    row: int
+    proposed_am_start: Optional[datetime.time] = None
+    proposed_am_end: Optional[datetime.time] = None
+    proposed_pm_start: Optional[datetime.time] = None
+    proposed_pm_end: Optional[datetime.time] = None
+    is_homeoffice: bool = False
+    nlz_time: Optional[datetime.time] = None  # NLZ time as datetime.time
+
+
+class ChangeLog:
+    """
+    The proposed changes of a check as typed columns (array.array), one entry
+    per sheet and row: adding a row again replaces its entry. Times are
+    seconds since midnight, durations seconds and dates days since 1970,
+    -1 where a value is missing. Sheet names are stored once and referenced
+    by id. Exports in bulk to Arrow/Parquet (pyarrow, optional) and CSV.
+
+    Columns:
+        sheet, row                           sheet id, zero-based row index
+        am_start, am_end, pm_start, pm_end   proposed blocks (C-F)
+        homeoffice, nlz                      proposed home office (I) and NLZ time (L)
+        date                                 the day of the row
+        dsl_task, dsl_nlz                    booked task and NLZ time in the DSL
+        jira_task, jira_nlz                  task and NLZ time of the worklogs
+    """
+
+    TIME_COLUMNS = ("am_start", "am_end", "pm_start", "pm_end", "nlz")
+    DURATION_COLUMNS = ("dsl_task", "dsl_nlz", "jira_task", "jira_nlz")
+    COLUMNS = (
+        "sheet",
+        "row",
+        "am_start",
+        "am_end",
+        "pm_start",
+        "pm_end",
+        "homeoffice",
+        "nlz",
+        "date",
+        "dsl_task",
+        "dsl_nlz",
+        "jira_task",
+        "jira_nlz",
+    )
+
+    # The stored values of a change without any values (see record)
+    MISSING = {column: -1 for column in COLUMNS[2:]} | {"homeoffice": False}
+
+    __slots__ = ("sheet_names", "_sheet_ids", "_positions") + COLUMNS
+
+    def __init__(self):
+        self.sheet_names: List[str] = []
+        self._sheet_ids: Dict[str, int] = {}
+        self._positions: Dict[Tuple[int, int], int] = {}  # (sheet, row) -> position
+        for column in self.COLUMNS:
+            setattr(self, column, array("b" if column == "homeoffice" else "q"))
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        sheet_name, row = key
+        sheet = self._sheet_ids.get(sheet_name)
+        return sheet is not None and (sheet, row) in self._positions
+
+    def add(
+        self,
+        sheet_name: str,
+        row: int,
+        am_start: int = -1,
+        am_end: int = -1,
+        pm_start: int = -1,
+        pm_end: int = -1,
+        homeoffice: bool = False,
+        nlz: int = -1,
+        date: int = -1,
+        dsl_task: int = -1,
+        dsl_nlz: int = -1,
+        jira_task: int = -1,
+        jira_nlz: int = -1,
+    ) -> None:
+        """Add the change of a row, replacing an earlier one of the same row"""
+        sheet = self._sheet_ids.get(sheet_name)
+        if sheet is None:
+            sheet = self._sheet_ids[sheet_name] = len(self.sheet_names)
+            self.sheet_names.append(sheet_name)
+        values = (sheet, row, am_start, am_end, pm_start, pm_end, homeoffice, nlz)
+        values += (date, dsl_task, dsl_nlz, jira_task, jira_nlz)
+
+        position = self._positions.get((sheet, row))
+        if position is None:
+            self._positions[(sheet, row)] = len(self.row)
+            for column, value in zip(self.COLUMNS, values):
+                getattr(self, column).append(int(value))
+        else:
+            for column, value in zip(self.COLUMNS, values):
+                getattr(self, column)[position] = int(value)
+
+    def sheets(self) -> List[str]:
+        """Names of the sheets with changes, in log order"""
+        return [self.sheet_names[sheet] for sheet in dict.fromkeys(self.sheet)]
+
+    def sort(self, sheet_order: List[str]) -> None:
+        """Order by the sheet order of the workbook, then by row"""
+        sheet_rank = np.array(
+            [
+                sheet_order.index(name) if name in sheet_order else len(sheet_order)
+                for name in self.sheet_names
+            ],
+            dtype=np.int64,
+        )
+        if len(self) == 0:
+            return
+        columns = self.columns()
+        order = np.lexsort((columns["row"], sheet_rank[columns["sheet"]]))
+        for column in self.COLUMNS:
+            typecode = getattr(self, column).typecode
+            setattr(self, column, array(typecode, columns[column][order].tobytes()))
+        del columns
+        self._positions = {
+            key: position for position, key in enumerate(zip(self.sheet, self.row))
+        }
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        All columns as NumPy arrays sharing the log's memory, the log cannot
+        grow while they are alive
+        """
+        return {
+            column: np.frombuffer(
+                getattr(self, column),
+                dtype=np.int8 if column == "homeoffice" else np.int64,
+            )
+            for column in self.COLUMNS
+        }
+
+    def record(self, sheet_name: str, row: int) -> Optional[dict]:
+        """The stored values of a row (without sheet and row), None without a change"""
+        sheet = self._sheet_ids.get(sheet_name)
+        position = self._positions.get((sheet, row))
+        if position is None:
+            return None
+        return {column: getattr(self, column)[position] for column in self.COLUMNS[2:]}
+
+    def changes(self, sheet_name: str) -> List[ExcelChange]:
+        """The changes of a sheet in log order, as the diff workbook needs them"""
+        sheet = self._sheet_ids.get(sheet_name)
+        return [
+            self.change(position)
+            for position, entry_sheet in enumerate(self.sheet)
+            if entry_sheet == sheet
+        ]
+
+    def change(self, position: int) -> ExcelChange:
+        def to_time(column: str) -> Optional[datetime.time]:
+            seconds = getattr(self, column)[position]
+            return Seconds.to_time(seconds) if seconds >= 0 else None
+
+        return ExcelChange(
+            sheet_name=self.sheet_names[self.sheet[position]],
+            row=self.row[position],
+            proposed_am_start=to_time("am_start"),
+            proposed_am_end=to_time("am_end"),
+            proposed_pm_start=to_time("pm_start"),
+            proposed_pm_end=to_time("pm_end"),
+            is_homeoffice=bool(self.homeoffice[position]),
+            nlz_time=to_time("nlz"),
+        )
+
+    def export_columns(self, **constant_columns: str) -> Dict[str, list]:
+        """
+        The readable export columns: sheet name, Excel row number, ISO date,
+        "HH:MM:SS" times and seconds, None where a value is missing.
+        constant_columns come first and are repeated on every row.
+        """
+
+        def optional(values: array, convert) -> list:
+            return [convert(value) if value >= 0 else None for value in values]
+
+        exported = {
+            **{name: [value] * len(self) for name, value in constant_columns.items()},
+            "sheet_name": [self.sheet_names[sheet] for sheet in self.sheet],
+            "row": [row + 1 for row in self.row],
+            "date": optional(self.date, ChangeLog.date_string),
+        }
+        for column in self.TIME_COLUMNS:
+            exported[column] = optional(getattr(self, column), ChangeLog.time_string)
+        exported["homeoffice"] = [bool(value) for value in self.homeoffice]
+        for column in self.DURATION_COLUMNS:
+            exported[f"{column}_seconds"] = optional(getattr(self, column), int)
+        return exported
+
+    @staticmethod
+    def export_record(sheet_name: str, row: int, values: dict) -> dict:
+        """One change (stored values, see record) as a row of export_columns"""
+
+        def optional(value: int, convert):
+            return convert(value) if value >= 0 else None
+
+        exported = {
+            "sheet_name": sheet_name,
+            "row": row + 1,
+            "date": optional(values["date"], ChangeLog.date_string),
+        }
+        for column in ChangeLog.TIME_COLUMNS:
+            exported[column] = optional(values[column], ChangeLog.time_string)
+        exported["homeoffice"] = bool(values["homeoffice"])
+        for column in ChangeLog.DURATION_COLUMNS:
+            exported[f"{column}_seconds"] = optional(values[column], int)
+        return exported
+
+    def add_export(self, exported: dict) -> None:
+        """Add a change from its readable dict (JSON values or CSV strings)"""
+
+        def optional(value, parse) -> int:
+            return parse(value) if value not in (None, "") else -1
+
+        self.add(
+            exported["sheet_name"],
+            int(exported["row"]) - 1,
+            homeoffice=exported["homeoffice"] in (True, "True"),
+            date=optional(exported["date"], ChangeLog.day_number),
+            **{
+                column: optional(exported[column], Seconds.parse)
+                for column in ChangeLog.TIME_COLUMNS
+            },
+            **{
+                column: optional(exported[f"{column}_seconds"], int)
+                for column in ChangeLog.DURATION_COLUMNS
+            },
+        )
+
+    def to_dicts(self) -> List[dict]:
+        """One readable dict per change (see export_columns)"""
+        exported = self.export_columns()
+        return [dict(zip(exported, values)) for values in zip(*exported.values())]
+
+    def write(self, path: str, **constant_columns: str) -> str:
+        """Write all changes as Parquet (.parquet) or CSV (any other extension)"""
+        if path.endswith(".parquet"):
+            return self.write_parquet(path, **constant_columns)
+        return self.write_csv(path, **constant_columns)
+
+    def write_csv(self, path: str, **constant_columns: str) -> str:
+        """Write all changes as CSV (see export_columns), missing values stay empty"""
+        exported = self.export_columns(**constant_columns)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(exported)
+            writer.writerows(zip(*exported.values()))
+        return path
+
+    def to_arrow(self, **constant_columns: str):
+        """
+        All changes as a pyarrow Table with typed columns (time32, date32,
+        bool, int64; nulls where missing). constant_columns are added to every
+        row, e.g. employee="..." to combine the logs of several workbooks.
+        """
+        pa = ChangeLog.pyarrow()
+        columns = self.columns()
+        table = {
+            name: pa.array([value] * len(self), pa.string())
+            for name, value in constant_columns.items()
+        }
+        table["sheet_name"] = pa.DictionaryArray.from_arrays(
+            pa.array(columns["sheet"].astype(np.int32)),
+            pa.array(self.sheet_names, pa.string()),
+        )
+        table["row"] = pa.array(columns["row"] + 1)
+        table["date"] = pa.array(
+            columns["date"].astype(np.int32), pa.date32(), mask=columns["date"] < 0
+        )
+        for column in self.TIME_COLUMNS:
+            table[column] = pa.array(
+                columns[column].astype(np.int32),
+                pa.time32("s"),
+                mask=columns[column] < 0,
+            )
+        table["homeoffice"] = pa.array(columns["homeoffice"].astype(bool))
+        for column in self.DURATION_COLUMNS:
+            table[f"{column}_seconds"] = pa.array(
+                columns[column], mask=columns[column] < 0
+            )
+        return pa.table(table)
+
+    def write_parquet(self, path: str, **constant_columns: str) -> str:
+        """Write all changes as Parquet (needs pyarrow, see to_arrow)"""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(**constant_columns), path)
+        return path
+
+    @staticmethod
+    def pyarrow():
+        """The optional pyarrow module, with a hint on how to get it if missing"""
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(
+                "Arrow and Parquet export need pyarrow (pip install pyarrow)"
+            ) from e
+        return pyarrow
+
+    @staticmethod
+    def time_string(seconds: int) -> str:
+        """Seconds since midnight as "HH:MM:SS" (not rounded, unlike Seconds.format)"""
+        return Seconds.to_time(seconds).isoformat()
+
+    @staticmethod
+    def date_string(day_number: int) -> str:
+        """Days since 1970 as an ISO date string"""
+        return date.fromordinal(EPOCH_ORDINAL + day_number).isoformat()
+
+    @staticmethod
+    def day_number(day: date | str | None) -> int:
+        """A date (or "YYYY-MM-DD") as days since 1970, -1 for None"""
+        if day is None:
+            return -1
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        return day.toordinal() - EPOCH_ORDINAL
@@ -0,0 +1,79 @@
+import abc
+import csv
+import json
+import sys
+from typing import Iterator, List, Optional, TextIO
+from modules.change_log import ChangeLog
+
+
+class ChangeSink(abc.ABC):
+    """
+    Receives every change the moment it is found, as the readable dict of
+    ChangeLog.export_record. Writers flush after every change, so a crashed
+    or interrupted run keeps everything found so far; ExcelChangesTracker
+    .from_stream builds the diff workbook from such a stream.
+    """
+
+    @abc.abstractmethod
+    def emit(self, change: dict) -> None:
+        """Write one change"""
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def open(path: str) -> "ChangeSink":
+        """A CSV sink for *.csv, otherwise JSON lines ("-" writes them to stdout)"""
+        if path.endswith(".csv"):
+            return CsvSink(path)
+        return JsonlSink(path)
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """The changes of a stream written by a sink, in emit order"""
+        with open(path, newline="") as f:
+            if path.endswith(".csv"):
+                yield from csv.DictReader(f)
+                return
+            for line in f:
+                # The last line may be cut off by a crash
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    break
+
+
+class JsonlSink(ChangeSink):
+    """One JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file: TextIO = sys.stdout if path == "-" else open(path, "w")
+
+    def emit(self, change: dict) -> None:
+        self.file.write(json.dumps(change) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class CsvSink(ChangeSink):
+    """CSV with the columns of ChangeLog.export_columns"""
+
+    def __init__(self, path: str, fieldnames: Optional[List[str]] = None):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(
+            self.file, fieldnames=fieldnames or list(ChangeLog().export_columns())
+        )
+        self.writer.writeheader()
+        self.file.flush()
+
+    def emit(self, change: dict) -> None:
+        self.writer.writerow(change)
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
@@ -0,0 +1,373 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from modules.booking_checker import BookingChecker
+from modules.fingerprint_store import FingerprintStore
+from modules.rate_governor import RateGovernor
+from modules.workbook_check import CheckResult, WorkbookCheck
+from modules.workbook_loader import WorkbookData, WorkbookLoader
+from modules.worklog_store import WorklogStore
+
+
+class LRUCache:
+    """Thread safe LRU mapping, on_evict is called with every evicted value"""
+
+    def __init__(self, max_entries: int, on_evict: Optional[Callable] = None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_or_create(self, key: Hashable, create: Callable):
+        """The cached value, created outside the lock on a miss"""
+        with self._lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        value = create()
+        evicted = []
+        with self._lock:
+            if key in self.entries:
+                # Created concurrently, keep the first one
+                evicted.append(value)
+                value = self.entries[key]
+            else:
+                self.entries[key] = value
+                while len(self.entries) > self.max_entries:
+                    evicted.append(self.entries.popitem(last=False)[1])
+        if self.on_evict is not None:
+            for old_value in evicted:
+                self.on_evict(old_value)
+        return value
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return None
+
+
+@dataclass
+class UserSession:
+    """Warm state of one Tempo token: checker, worklogs and per-day results"""
+
+    check: WorkbookCheck
+    worklog_store: WorklogStore
+    workbook_key: Optional[str] = None  # last uploaded workbook
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.check.checker is not None:
+                self.check.checker.client.close()
+            if self.worklog_store is not None:
+                self.worklog_store.close()
+
+
+class CheckService:
+    """
+    Local HTTP service around WorkbookCheck for a whole team.
+
+    POST /check   Authorization: Bearer <Tempo token>
+                  body: the DSL workbook (.xlsx), may be empty to re-check the
+                  workbook this token uploaded last
+                  ?from=YYYY-MM-DD&to=YYYY-MM-DD only checks the months in range
+                  ?format=xlsx answers with the diff workbook instead of JSON
+    GET  /health  cache sizes, hit counts and latency percentiles
+
+    Shared between requests: one Tempo connection pool, an LRU of parsed
+    workbooks (by content hash) and an LRU of user sessions (by token) holding
+    the fetched worklogs and per-day results, backed by one worklog cache per
+    user (a file in cache_dir, otherwise in memory). At most max_concurrent
+    checks run at once, further requests wait up to queue_timeout seconds and
+    are then rejected with 503.
+
+    Every check revalidates the worklogs of its days: the cache asks Tempo for
+    the worklogs updated since the last request (updatedFrom) and only the
+    days whose worklogs changed are reconciled again. Deleted worklogs are
+    not reported that way, so a range whose last full fetch is older than
+    full_sync_minutes is fetched in full again.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        max_concurrent: int = 4,
+        max_users: int = 32,
+        max_workbooks: int = 64,
+        cache_dir: str = "",
+        queue_timeout: float = 30,
+        cache_max_age_days: Optional[int] = None,
+        cache_max_rows: Optional[int] = None,
+        full_sync_minutes: float = 10,
+    ):
+        """
+        cache_dir: keep a worklog cache file per user there ("" keeps worklogs in memory only)
+        cache_max_age_days / cache_max_rows: eviction policy of those files
+        full_sync_minutes: fetch the worklogs of a user in full again this often (0 never)
+        """
+        self.logger = logger
+        self.host = host
+        self.port = port
+        self.cache_dir = cache_dir
+        self.cache_max_age_days = cache_max_age_days
+        self.cache_max_rows = cache_max_rows
+        self.full_sync_minutes = full_sync_minutes
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.workbooks = LRUCache(max_workbooks)
+        self.users = LRUCache(max_users, on_evict=UserSession.close)
+        self.latencies: deque = deque(maxlen=1000)
+        self.requests = 0
+        self.rejected = 0
+        self._stats_lock = threading.Lock()
+        BookingChecker.http_adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max(16, max_concurrent * BookingChecker.concurrency),
+        )
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def serve_forever(self) -> None:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                service.logger.debug(format % args)
+
+            def do_GET(self):
+                service.handle(self)
+
+            def do_POST(self):
+                service.handle(self)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.logger.info(f"Serving DSL checks on http://{self.host}:{self.port}")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            self.logger.info("Stopped serving")
+        finally:
+            self.server.server_close()
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        url = urlparse(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if handler.command == "GET" and url.path == "/health":
+            status, content_type, payload = 200, "application/json", self.health()
+        elif handler.command == "POST" and url.path == "/check":
+            length = int(handler.headers.get("Content-Length") or 0)
+            body = handler.rfile.read(length) if length else b""
+            token = handler.headers.get("Authorization", "").removeprefix("Bearer ")
+            status, content_type, payload = self.check(token.strip(), body, query)
+        else:
+            status, content_type, payload = self.error(404, "Not found")
+
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def check(
+        self, token: str, body: bytes, query: Dict[str, str]
+    ) -> Tuple[int, str, bytes]:
+        if not token:
+            return self.error(401, "Missing Tempo token (Authorization: Bearer ...)")
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            return self.error(503, "Too many checks running, try again later")
+
+        started = time.perf_counter()
+        try:
+            user_key = hashlib.sha256(token.encode()).hexdigest()[:16]
+            session = self.users.get_or_create(
+                user_key, lambda: self.create_session(user_key, token)
+            )
+            # One check per user at a time, the warm state is not thread safe
+            with session.lock:
+                if body:
+                    session.workbook_key = self.workbook_key(body)
+                if session.workbook_key is None:
+                    return self.error(400, "Upload a DSL workbook first")
+                workbook = self.workbooks.get_or_create(
+                    session.workbook_key, lambda: self.load_workbook(body)
+                )
+                workbook = self.select_months(
+                    workbook,
+                    self.parse_date(query.get("from")),
+                    self.parse_date(query.get("to")),
+                )
+                result = self.revalidate(session, workbook)
+                if result.error:
+                    return self.error(self.error_status(result), result.error)
+
+                tracker = session.check.excel_changes_tracker
+                if query.get("format") == "xlsx":
+                    output = io.BytesIO()
+                    if tracker.has_changes():
+                        tracker.write_excel(output)
+                    return (
+                        200,
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        output.getvalue(),
+                    )
+                response = {
+                    "sheets": result.sheets,
+                    "days": result.days,
+                    "reused_days": result.reused_days,
+                    "conflicts": tracker.log.to_dicts(),
+                    "wall_seconds": result.wall_seconds,
+                }
+                return 200, "application/json", json.dumps(response).encode()
+        except ValueError as e:
+            return self.error(400, str(e))
+        except requests.HTTPError as e:
+            # A worklog page Tempo still refused after the retries
+            status = e.response.status_code if e.response is not None else 0
+            if status in RateGovernor.THROTTLED:
+                return self.error(429, "Tempo rate limit reached, try again later")
+            self.logger.exception("Check failed")
+            return self.error(502, repr(e))
+        except Exception as e:
+            self.logger.exception("Check failed")
+            return self.error(500, repr(e))
+        finally:
+            self.slots.release()
+            with self._stats_lock:
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - started)
+
+    def revalidate(self, session: UserSession, workbook: WorkbookData) -> CheckResult:
+        """
+        Check the workbook with the worklogs as Tempo has them now: a delta
+        sync on every request, a full fetch of the ranges whose last one is
+        older than full_sync_minutes (see WorklogStore)
+        """
+        return session.check.run(revalidate_worklogs=True, workbook=workbook)
+
+    @staticmethod
+    def error_status(result: CheckResult) -> int:
+        """429 while Tempo throttles, 401 for a rejected token, 502 for other Tempo errors"""
+        if result.tempo_status in RateGovernor.THROTTLED:
+            return 429
+        if result.tempo_status in (0, 401, 403):
+            return 401
+        return 502
+
+    def create_session(self, user_key: str, token: str) -> UserSession:
+        # The cache keeps the sync state for the delta syncs of every request
+        path = ":memory:"
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, f"worklogs_{user_key}.sqlite3")
+        worklog_store = WorklogStore(
+            path,
+            max_age_days=self.cache_max_age_days,
+            max_rows=self.cache_max_rows,
+            identity=WorklogStore.identity_for(token),
+            full_sync_minutes=(
+                self.full_sync_minutes if self.full_sync_minutes > 0 else None
+            ),
+        )
+        check = WorkbookCheck(
+            f"upload-{user_key}.xlsx",
+            token,
+            self.logger,
+            worklog_store=worklog_store,
+            fingerprint_store=FingerprintStore(),  # in memory only
+            save_output=False,
+        )
+        return UserSession(check, worklog_store)
+
+    @staticmethod
+    def workbook_key(body: bytes) -> str:
+        # The current month decides which sheets are loaded, so it is part of the key
+        month = datetime.now().strftime("%Y-%m")
+        return f"{month}:{hashlib.sha256(body).hexdigest()}"
+
+    @staticmethod
+    def load_workbook(body: bytes) -> WorkbookData:
+        if not body:
+            raise ValueError("The uploaded workbook expired, upload it again")
+        return WorkbookLoader(io.BytesIO(body)).load()
+
+    @staticmethod
+    def parse_date(value: Optional[str]) -> Optional[date]:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+    @staticmethod
+    def select_months(
+        workbook: WorkbookData, date_from: Optional[date], date_to: Optional[date]
+    ) -> WorkbookData:
+        """
+        The workbook reduced to the month sheets overlapping the date range,
+        sheets without a month in their month cell are left out
+        """
+        if date_from is None and date_to is None:
+            return workbook
+        sheets = [
+            sheet
+            for sheet in workbook.sheets
+            if isinstance(sheet.month_year, datetime)
+            and (date_to is None or sheet.month_year.date().replace(day=1) <= date_to)
+            and (
+                date_from is None
+                or (sheet.month_year.year, sheet.month_year.month)
+                >= (date_from.year, date_from.month)
+            )
+        ]
+        return WorkbookData(workbook.path, sheets, workbook.skipped_month)
+
+    def health(self) -> bytes:
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            requests, rejected = self.requests, self.rejected
+
+        def percentile(share: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(share * len(latencies)))]
+
+        return json.dumps(
+            {
+                "requests": requests,
+                "rejected": rejected,
+                "latency_p50_seconds": percentile(0.5),
+                "latency_p95_seconds": percentile(0.95),
+                "users": len(self.users),
+                "workbooks": len(self.workbooks),
+                "workbook_cache_hits": self.workbooks.hits,
+                "workbook_cache_misses": self.workbooks.misses,
+                "tempo": RateGovernor.shared().snapshot(),
+            }
+        ).encode()
+
+    @staticmethod
+    def error(status: int, message: str) -> Tuple[int, str, bytes]:
+        return status, "application/json", json.dumps({"error": message}).encode()
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, Union
+import numpy as np
+from modules.worklog_batch import WorklogBatch
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass
+class DaySummary:
+    day: date
+    task_seconds: int  # all worklogs except NLZ
+    nlz_seconds: int
+    earliest_start: int  # seconds since midnight, -1 without worklogs
+    homeoffice: bool  # any worklog has the home office attribute
+    count: int
+
+
+class DaySummaries:
+    """
+    Per-day worklog summaries as NumPy columns, one entry per day that has
+    worklogs, sorted by date. Built in a single pass over a WorklogBatch of
+    any number of days (see aggregate), so whole-workbook fetches and cache
+    reads are grouped in O(n).
+    """
+
+    __slots__ = (
+        "date",
+        "task_seconds",
+        "nlz_seconds",
+        "earliest_start",
+        "homeoffice",
+        "count",
+    )
+
+    def __init__(
+        self,
+        date: np.ndarray,
+        task_seconds: np.ndarray,
+        nlz_seconds: np.ndarray,
+        earliest_start: np.ndarray,
+        homeoffice: np.ndarray,
+        count: np.ndarray,
+    ):
+        self.date = date  # datetime64[D]
+        self.task_seconds = task_seconds  # int64
+        self.nlz_seconds = nlz_seconds  # int64
+        self.earliest_start = earliest_start  # int64
+        self.homeoffice = homeoffice  # bool
+        self.count = count  # int64
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    @staticmethod
+    def aggregate(worklogs: Union[WorklogBatch, Iterable[dict]]) -> "DaySummaries":
+        """Summaries of all days in the worklogs (a batch or Tempo worklog dicts)"""
+        if not isinstance(worklogs, WorklogBatch):
+            worklogs = WorklogBatch.from_worklogs(worklogs)
+        if len(worklogs) == 0:
+            return DaySummaries(
+                np.array([], dtype="datetime64[D]"),
+                *(np.array([], dtype=np.int64) for _ in range(3)),
+                np.array([], dtype=bool),
+                np.array([], dtype=np.int64),
+            )
+
+        # Batches are sorted by date, so every day is one contiguous run
+        dates = worklogs.date
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        nlz_seconds = np.add.reduceat(
+            np.where(worklogs.nlz_mask(), worklogs.seconds, 0), starts
+        )
+        return DaySummaries(
+            date=dates[starts],
+            task_seconds=np.add.reduceat(worklogs.seconds, starts) - nlz_seconds,
+            nlz_seconds=nlz_seconds,
+            earliest_start=np.minimum.reduceat(
+                worklogs.start_second.astype(np.int64), starts
+            ),
+            homeoffice=np.logical_or.reduceat(worklogs.homeoffice, starts),
+            count=np.diff(np.r_[starts, len(dates)]),
+        )
+
+    def get(self, day: date | str) -> DaySummary:
+        """The summary of one day, an empty one if it has no worklogs"""
+        day = np.datetime64(day, "D")
+        position = int(np.searchsorted(self.date, day))
+        if position == len(self) or self.date[position] != day:
+            return DaySummary(day.astype(date), 0, 0, -1, False, 0)
+        return DaySummary(
+            day=day.astype(date),
+            task_seconds=int(self.task_seconds[position]),
+            nlz_seconds=int(self.nlz_seconds[position]),
+            earliest_start=int(self.earliest_start[position]),
+            homeoffice=bool(self.homeoffice[position]),
+            count=int(self.count[position]),
+        )
+
+    def to_frame(self) -> "pd.DataFrame":
+        """The summaries with "YYYY-MM-DD" dates, for joining with day tables"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "date": np.datetime_as_string(self.date, unit="D"),
+                **{column: getattr(self, column) for column in self.__slots__[1:]},
+            }
+        )
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Iterator, List
+import math
+import numpy as np
+from modules.seconds import Seconds
+from modules.workbook_loader import SheetData
+
+
+@dataclass
+class DayRow:
+    index: int  # zero-based row index in the sheet
+    day: int
+    required_seconds: int
+    booked_seconds: int
+    pause: bool  # H holds the "Pause?" marker
+    holiday_seconds: int
+
+
+@dataclass
+class DayTable:
+    """
+    The day rows of one DSL sheet as typed NumPy columns.
+
+    Row termination rules (same as the former per-cell loop in main.py):
+    - the table ends before the first row whose day (B) is empty, not a number or 0
+    - G, H and L count only when they hold a duration, anything else
+      (empty cells, text like "Pause?") counts as 0 seconds
+    - the former "required hours is NaN" stop never triggered, since the
+      missing value had already been replaced by 0, and is not applied
+    """
+
+    PAUSE_MARKER = "Pause?"
+
+    sheet_name: str
+    month_year: datetime
+    index: np.ndarray  # int64
+    day: np.ndarray  # int64
+    required_seconds: np.ndarray  # int64, G
+    booked_seconds: np.ndarray  # int64, H
+    pause: np.ndarray  # bool, H == "Pause?"
+    holiday_seconds: np.ndarray  # int64, L
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    def dates(self) -> List[date]:
+        """Calendar date of every row"""
+        return [
+            date(self.month_year.year, self.month_year.month, int(day))
+            for day in self.day
+        ]
+
+    def rows(self) -> Iterator[DayRow]:
+        for position in range(len(self)):
+            yield DayRow(
+                index=int(self.index[position]),
+                day=int(self.day[position]),
+                required_seconds=int(self.required_seconds[position]),
+                booked_seconds=int(self.booked_seconds[position]),
+                pause=bool(self.pause[position]),
+                holiday_seconds=int(self.holiday_seconds[position]),
+            )
+
+    def take(self, selection: np.ndarray) -> "DayTable":
+        """A table with only the selected rows (boolean mask or positions)"""
+        return DayTable(
+            sheet_name=self.sheet_name,
+            month_year=self.month_year,
+            index=self.index[selection],
+            day=self.day[selection],
+            required_seconds=self.required_seconds[selection],
+            booked_seconds=self.booked_seconds[selection],
+            pause=self.pause[selection],
+            holiday_seconds=self.holiday_seconds[selection],
+        )
+
+    @staticmethod
+    def from_sheet(sheet: SheetData) -> "DayTable":
+        """Build the day table of a loaded sheet in one vectorized step"""
+        if sheet.day_table is not None:
+            return sheet.day_table
+        days = np.array(
+            [DayTable.day_number(value) for value in sheet.day_cells["day"]],
+            dtype=float,
+        )
+        valid = ~np.isnan(days) & (days != 0)
+        # Rows end at the first invalid day, later rows are ignored
+        length = len(days) if valid.all() else int(np.argmin(valid))
+
+        booked_cells = sheet.day_cells["booked"][:length]
+        return DayTable(
+            sheet_name=sheet.sheet_name,
+            month_year=sheet.month_year,
+            index=np.arange(length, dtype=np.int64) + sheet.first_day_index,
+            day=days[:length].astype(np.int64),
+            required_seconds=DayTable.to_seconds(sheet.day_cells["required"][:length]),
+            booked_seconds=DayTable.to_seconds(booked_cells),
+            pause=np.array(
+                [value == DayTable.PAUSE_MARKER for value in booked_cells], dtype=bool
+            ),
+            holiday_seconds=DayTable.to_seconds(sheet.day_cells["holiday"][:length]),
+        )
+
+    @staticmethod
+    def day_number(value: Any) -> float:
+        """A day cell as a number, NaN if it is none (like pd.to_numeric with coerce)"""
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return math.nan
+        return math.nan
+
+    @staticmethod
+    def to_seconds(values: List[Any]) -> np.ndarray:
+        """Whole seconds of duration cells (rounded down), 0 for anything else"""
+        return Seconds.column(values)
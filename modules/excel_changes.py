@@ -1,27 +1,59 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, List, Optional
-import pandas as pd
-
-
-@dataclass
-class ExcelChange:
-    sheet_name: str
-    row: int
-    proposed_am_start: Optional[datetime.time] = None
-    proposed_am_end: Optional[datetime.time] = None
-    proposed_pm_start: Optional[datetime.time] = None
-    proposed_pm_end: Optional[datetime.time] = None
-    is_homeoffice: bool = False
-    nlz_time: Optional[datetime.time] = None  # NLZ time as datetime.time
+from datetime import date, datetime, timedelta
+import os
+from typing import BinaryIO, Dict, List, Optional, Union
+import numpy as np
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from modules.change_log import ChangeLog, ExcelChange
+from modules.change_sink import ChangeSink
+from modules.seconds import Seconds
+from modules.sheet_layout import LayoutCache, LayoutDetector
+from modules.workbook_loader import SheetData, WorkbookData, WorkbookLoader
 
 
 class ExcelChangesTracker:
-    def __init__(self, excel_file_path: str):
-        """Initialize with the path to the original Excel file"""
+    def __init__(
+        self,
+        excel_file_path: str,
+        workbook_data: Optional[WorkbookData] = None,
+        sinks: Optional[List[ChangeSink]] = None,
+        keep_changes: bool = True,
+    ):
+        """
+        Initialize with the path to the original Excel file and, if already
+        loaded, its WorkbookData so the original isn't parsed again on save.
+        Every added change is also passed to the sinks right away; without
+        keep_changes it is only passed on and the log stays empty, so memory
+        does not grow with the changes (nothing to save or export then).
+        """
         self.excel_file_path = excel_file_path
-        self.changes: Dict[str, List[ExcelChange]] = {}  # sheet_name -> list of changes
-        self.excel_data = pd.ExcelFile(excel_file_path)
+        self.log = ChangeLog()  # one entry per sheet and row
+        self.workbook_data = workbook_data
+        self.sinks = sinks or []
+        self.keep_changes = keep_changes
+        self.streamed = 0  # changes passed on without keeping them
+
+    @classmethod
+    def from_stream(
+        cls,
+        stream_file: str,
+        excel_file_path: str,
+        layout_cache: Optional[LayoutCache] = None,
+    ) -> "ExcelChangesTracker":
+        """The changes of a sink's stream (e.g. of an interrupted run), ready to save"""
+        workbook_data = WorkbookLoader(excel_file_path, layout_cache).load()
+        tracker = cls(excel_file_path, workbook_data)
+        for change in ChangeSink.read(stream_file):
+            tracker.log.add_export(change)
+        tracker.sort_changes([sheet.sheet_name for sheet in workbook_data.sheets])
+        return tracker
+
+    @property
+    def changes(self) -> Dict[str, List[ExcelChange]]:
+        """sheet_name -> list of changes, in log order"""
+        return {
+            sheet_name: self.log.changes(sheet_name) for sheet_name in self.log.sheets()
+        }
 
     def add_change(
         self,
@@ -32,100 +64,206 @@ class ExcelChangesTracker:
         proposed_pm_start: Optional[datetime.time] = None,
         proposed_pm_end: Optional[datetime.time] = None,
         is_homeoffice: bool = False,
-        nlz_time: Optional[str] = None,
+        nlz_time: Optional[int | str] = None,
+        day: Optional[date | str] = None,
+        dsl_task_seconds: int = -1,
+        dsl_nlz_seconds: int = -1,
+        jira_task_seconds: int = -1,
+        jira_nlz_seconds: int = -1,
     ) -> None:
-        """Add a change for a specific sheet and row"""
-        if sheet_name not in self.changes:
-            self.changes[sheet_name] = []
-
-        # Parse NLZ time if provided and in correct format
-        parsed_nlz_time = None
-        if nlz_time:
+        """
+        Add a change for a specific sheet and row, replacing an earlier one of
+        the row. day and the seconds only go to the change log for analytics.
+        """
+        # NLZ seconds (rounded up like the log output) or a legacy "HH:MM:SS" string
+        nlz_seconds = -1
+        if isinstance(nlz_time, (int, np.integer)):
+            rounded = Seconds.round_up(int(nlz_time))
+            if 0 < rounded < Seconds.DAY:
+                nlz_seconds = rounded
+        elif nlz_time:
             try:
                 # Check if the string matches HH:MM:SS format
                 if len(nlz_time.split(":")) == 3:
-                    parsed_nlz_time = datetime.strptime(nlz_time, "%H:%M:%S").time()
+                    nlz_seconds = Seconds.from_time(
+                        datetime.strptime(nlz_time, "%H:%M:%S").time()
+                    )
             except ValueError:
                 # If parsing fails, leave it as None
                 pass
 
-        change = ExcelChange(
-            sheet_name=sheet_name,
-            row=row,
-            proposed_am_start=proposed_am_start,
-            proposed_am_end=proposed_am_end,
-            proposed_pm_start=proposed_pm_start,
-            proposed_pm_end=proposed_pm_end,
-            is_homeoffice=is_homeoffice,
-            nlz_time=parsed_nlz_time,
+        def seconds(value: Optional[datetime.time]) -> int:
+            return Seconds.from_time(value) if value is not None else -1
+
+        self.record(
+            sheet_name,
+            row,
+            am_start=seconds(proposed_am_start),
+            am_end=seconds(proposed_am_end),
+            pm_start=seconds(proposed_pm_start),
+            pm_end=seconds(proposed_pm_end),
+            homeoffice=is_homeoffice,
+            nlz=nlz_seconds,
+            date=ChangeLog.day_number(day),
+            dsl_task=dsl_task_seconds,
+            dsl_nlz=dsl_nlz_seconds,
+            jira_task=jira_task_seconds,
+            jira_nlz=jira_nlz_seconds,
         )
-        self.changes[sheet_name].append(change)
+
+    def record(self, sheet_name: str, row: int, **values: int) -> None:
+        """Store a change (values as in ChangeLog.add) and pass it to the sinks"""
+        if self.keep_changes:
+            self.log.add(sheet_name, row, **values)
+            stored = self.log.record(sheet_name, row)
+        else:
+            self.streamed += 1
+            stored = {**ChangeLog.MISSING, **values}
+        if self.sinks:
+            change = ChangeLog.export_record(sheet_name, row, stored)
+            for sink in self.sinks:
+                sink.emit(change)
+
+    def sort_changes(self, sheet_order: List[str]) -> None:
+        """Order sheets as in the workbook and changes by row"""
+        self.log.sort(sheet_order)
 
     def has_changes(self) -> bool:
         """Check if any changes were found"""
-        return bool(self.changes)
+        return self.change_count() > 0
+
+    def change_count(self) -> int:
+        """Number of changed rows over all sheets"""
+        return len(self.log) + self.streamed
 
-    def save_to_excel(self) -> str:
-        """Save changes to a new Excel file if any exist"""
+    def save_to_excel(self, output_dir: str = "", file_name: str = "") -> str:
+        """
+        Save changes to a new Excel file (in output_dir) if any exist, named
+        file_name or timesheet_changes_<timestamp>.xlsx.
+        Streams into a write-only workbook: per changed sheet the header rows
+        5-7, then only the changed rows with columns A and B of the original
+        and the proposed values.
+        """
         if not self.has_changes():
             return ""
 
         # Create filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"timesheet_changes_{timestamp}.xlsx"
-
-        # Create Excel writer
-        with pd.ExcelWriter(output_file) as writer:
-            # Only create sheets that have changes
-            for sheet_name, changes in self.changes.items():
-                # Read original sheet to get the structure
-                orig_df = pd.read_excel(
-                    self.excel_file_path, sheet_name=sheet_name, header=None
+        output_file = os.path.join(
+            output_dir, file_name or f"timesheet_changes_{timestamp}.xlsx"
+        )
+        self.write_excel(output_file)
+        return output_file
+
+    def write_excel(self, target: Union[str, BinaryIO]) -> None:
+        """Write the changes workbook to a path or a binary file object"""
+        workbook = openpyxl.Workbook(write_only=True)
+        # Only create sheets that have changes
+        for sheet_name in self.log.sheets():
+            worksheet = workbook.create_sheet(sheet_name)
+            changes = self.log.changes(sheet_name)
+            rows = self.output_rows(self.source_sheet(sheet_name), changes)
+            next_row = 0
+            for row in sorted(rows):
+                # Write-only sheets are appended row by row, skipped rows stay empty
+                for _ in range(row - next_row):
+                    worksheet.append([])
+                worksheet.append(
+                    [self.output_cell(worksheet, value) for value in rows[row]]
                 )
+                next_row = row + 1
+        workbook.save(target)
 
-                # Create empty dataframe with same structure as original
-                df = pd.DataFrame(index=range(50), columns=range(orig_df.shape[1]))
-
-                # Copy header rows (5, 6, 7 are indices 4, 5, 6 in zero-based indexing)
-                for row in [4, 5, 6]:
-                    df.iloc[row] = orig_df.iloc[row]
-
-                # Apply changes and copy original day information
-                for change in changes:
-                    # Copy columns A and B from original (0 and 1 in zero-based indexing)
-                    df.iloc[change.row, 0] = orig_df.iloc[change.row, 0]  # Column A
-                    df.iloc[change.row, 1] = orig_df.iloc[change.row, 1]  # Column B
-                    date_str_format = "%H:%M"
-                    # Add proposed times
-                    if change.proposed_am_start:
-                        df.iloc[change.row, 2] = change.proposed_am_start.strftime(
-                            date_str_format
-                        )  # Column C
-                    if change.proposed_am_end:
-                        df.iloc[change.row, 3] = change.proposed_am_end.strftime(
-                            date_str_format
-                        )  # Column D
-                    if change.proposed_pm_start:
-                        df.iloc[change.row, 4] = change.proposed_pm_start.strftime(
-                            date_str_format
-                        )  # Column E
-                    if change.proposed_pm_end:
-                        df.iloc[change.row, 5] = change.proposed_pm_end.strftime(
-                            date_str_format
-                        )  # Column F
-                    if change.is_homeoffice:
-                        df.iloc[change.row, 8] = "x"  # Column I
-                    if change.nlz_time:
-                        df.iloc[change.row, 11] = change.nlz_time.strftime(
-                            date_str_format
-                        )  # Column L
-
-                # Write the sheet to the new file
-                df.to_excel(writer, sheet_name=sheet_name, header=False, index=False)
-
-            # If no sheets were written (shouldn't happen due to has_changes check)
-            if not self.changes:
-                # Create an empty sheet to satisfy Excel requirements
-                pd.DataFrame().to_excel(writer, sheet_name="No Changes", index=False)
+    def source_sheet(self, sheet_name: str) -> SheetData:
+        """The loaded sheet, otherwise the original is read for its structure"""
+        sheet = (
+            self.workbook_data.get_sheet(sheet_name)
+            if self.workbook_data is not None
+            else None
+        )
+        if sheet is not None:
+            return sheet
 
-        return output_file
+        import pandas as pd
+
+        orig_df = pd.read_excel(
+            self.excel_file_path, sheet_name=sheet_name, header=None
+        )
+        values = orig_df.astype(object).where(orig_df.notna(), None)
+        rows = [tuple(row) for row in values.itertuples(index=False)]
+        return SheetData.from_rows(sheet_name, rows, LayoutDetector.detect(rows))
+
+    @staticmethod
+    def output_rows(sheet: SheetData, changes: List[ExcelChange]) -> Dict[int, List]:
+        """Zero-based row index -> cell values of every row to write"""
+        layout = sheet.layout
+        # Copy the header rows (5, 6, 7 in the template)
+        rows = {row: list(sheet.header_rows.get(row, ())) for row in layout.header_rows}
+        date_str_format = "%H:%M"
+        for change in changes:
+            cells = rows.setdefault(change.row, [])
+
+            def put(column: int, value) -> None:
+                cells.extend([None] * (column + 1 - len(cells)))
+                cells[column] = value
+
+            # Copy weekday and day (A and B) from the original day row
+            put(layout.weekday_column, sheet.cell(change.row, "weekday"))
+            put(layout.day_column, sheet.cell(change.row, "day"))
+            # Add proposed times (C-F, home office I and NLZ L in the template)
+            if change.proposed_am_start:
+                put(
+                    layout.am_start_column,
+                    change.proposed_am_start.strftime(date_str_format),
+                )
+            if change.proposed_am_end:
+                put(
+                    layout.am_end_column,
+                    change.proposed_am_end.strftime(date_str_format),
+                )
+            if change.proposed_pm_start:
+                put(
+                    layout.pm_start_column,
+                    change.proposed_pm_start.strftime(date_str_format),
+                )
+            if change.proposed_pm_end:
+                put(
+                    layout.pm_end_column,
+                    change.proposed_pm_end.strftime(date_str_format),
+                )
+            if change.is_homeoffice:
+                put(layout.homeoffice_column, "x")
+            if change.nlz_time:
+                put(layout.holiday_column, change.nlz_time.strftime(date_str_format))
+        return rows
+
+    @staticmethod
+    def output_cell(worksheet, value):
+        """
+        A cell value as the former pd.DataFrame.to_excel output wrote it:
+        NaN stays empty, dates keep pandas' default formats and any other
+        object (e.g. a time) is written as text
+        """
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        if isinstance(value, (bool, np.bool_)):
+            return bool(value)
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        if isinstance(value, (float, np.floating)):
+            return float(value)
+        if isinstance(value, str):
+            return value
+
+        number_format = None
+        if isinstance(value, datetime):
+            number_format = "YYYY-MM-DD HH:MM:SS"
+        elif isinstance(value, date):
+            number_format = "YYYY-MM-DD"
+        elif isinstance(value, timedelta):
+            value, number_format = value.total_seconds() / 86400, "0"
+        else:
+            return str(value)
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.number_format = number_format
+        return cell
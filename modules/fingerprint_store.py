@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Set
+import numpy as np
+from modules.day_table import DayTable
+from modules.excel_changes import ExcelChangesTracker
+from modules.worklog_batch import WorklogBatch
+
+# sheet_name -> zero-based row index -> fingerprint
+Fingerprints = Dict[str, Dict[int, str]]
+
+
+class FingerprintStore:
+    """
+    Remembers a fingerprint per sheet and per day (the DSL cells of the row
+    plus a hash of that day's worklogs) together with the change the day
+    produced. A re-run only reconciles the days whose fingerprint changed and
+    reuses the stored change (or "no change") for all others.
+    """
+
+    # Bump when the reconciliation rules or the stored changes change, old results are discarded then
+    VERSION = 2
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.sheets: dict = {}
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if stored.get("version") == self.VERSION:
+                self.sheets = stored.get("sheets", {})
+
+    @staticmethod
+    def fingerprint(day_tables: List[DayTable], worklogs: WorklogBatch) -> Fingerprints:
+        fingerprints: Fingerprints = {}
+        for day_table in day_tables:
+            sheet_fingerprints = fingerprints.setdefault(day_table.sheet_name, {})
+            for row, day in zip(day_table.rows(), day_table.dates()):
+                digest = hashlib.blake2b(digest_size=16)
+                digest.update(
+                    repr(
+                        (
+                            day.isoformat(),
+                            row.day,
+                            row.required_seconds,
+                            row.booked_seconds,
+                            row.pause,
+                            row.holiday_seconds,
+                        )
+                    ).encode()
+                )
+                day_worklogs = worklogs.for_date(day)
+                for column in WorklogBatch.__slots__:
+                    digest.update(
+                        np.ascontiguousarray(getattr(day_worklogs, column)).tobytes()
+                    )
+                sheet_fingerprints[row.index] = digest.hexdigest()
+        return fingerprints
+
+    @staticmethod
+    def sheet_fingerprint(row_fingerprints: Dict[int, str]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for index in sorted(row_fingerprints):
+            digest.update(f"{index}:{row_fingerprints[index]};".encode())
+        return digest.hexdigest()
+
+    def unchanged_rows(
+        self, sheet_name: str, row_fingerprints: Dict[int, str]
+    ) -> Set[int]:
+        """Row indexes of the sheet whose stored fingerprint still matches"""
+        stored_sheet = self.sheets.get(sheet_name, {})
+        stored_rows = stored_sheet.get("rows", {})
+        # Whole sheet unchanged, no need to compare row by row
+        if stored_sheet.get("fingerprint") == self.sheet_fingerprint(row_fingerprints):
+            return set(row_fingerprints)
+        return {
+            index
+            for index, fingerprint in row_fingerprints.items()
+            if stored_rows.get(str(index), {}).get("fingerprint") == fingerprint
+        }
+
+    def changed_tables(
+        self, day_tables: List[DayTable], fingerprints: Fingerprints
+    ) -> List[DayTable]:
+        """The day tables reduced to the rows that need to be reconciled again"""
+        changed = []
+        for day_table in day_tables:
+            unchanged = self.unchanged_rows(
+                day_table.sheet_name, fingerprints[day_table.sheet_name]
+            )
+            mask = np.array(
+                [int(index) not in unchanged for index in day_table.index], dtype=bool
+            )
+            if mask.any():
+                changed.append(day_table.take(mask))
+        return changed
+
+    def reuse(self, fingerprints: Fingerprints, tracker: ExcelChangesTracker) -> int:
+        """Add the stored changes of unchanged days to the tracker, returns the reused day count"""
+        reused = 0
+        for sheet_name, row_fingerprints in fingerprints.items():
+            stored_rows = self.sheets.get(sheet_name, {}).get("rows", {})
+            for index in sorted(self.unchanged_rows(sheet_name, row_fingerprints)):
+                reused += 1
+                stored_change = stored_rows[str(index)]["change"]
+                if stored_change is not None:
+                    tracker.record(sheet_name, index, **stored_change)
+        return reused
+
+    def update(self, fingerprints: Fingerprints, tracker: ExcelChangesTracker) -> None:
+        """Replace the stored state with the fingerprints and results of this run"""
+        self.sheets = {
+            sheet_name: {
+                "fingerprint": self.sheet_fingerprint(row_fingerprints),
+                "rows": {
+                    str(index): {
+                        "fingerprint": fingerprint,
+                        "change": tracker.log.record(sheet_name, index),
+                    }
+                    for index, fingerprint in row_fingerprints.items()
+                },
+            }
+            for sheet_name, row_fingerprints in fingerprints.items()
+        }
+
+    def save(self) -> None:
+        """Write the stored state, a store without path only lives in memory"""
+        if not self.path:
+            return
+        with open(self.path, "w") as f:
+            json.dump({"version": self.VERSION, "sheets": self.sheets}, f)
@@ -0,0 +1,140 @@
+import asyncio
+from datetime import date
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from modules.async_engine import AsyncTempoEngine
+from modules.query_planner import DateRange, QueryPlanner
+from modules.tempo_client import TempoClient
+from modules.worklog_batch import WorklogBatch
+
+
+class FleetFetcher:
+    """
+    Fetches the worklogs of a whole team with one token that may read them
+    all: every date range is requested once for all authors (authorIds)
+    instead of once per employee, then split by author. Request volume
+    grows with the date ranges, not with the team size.
+    """
+
+    def __init__(
+        self,
+        client: TempoClient,
+        concurrency: int = 8,
+        page_limit: int = 5000,
+        granularity: str = "month",
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.page_limit = page_limit
+        self.granularity = granularity
+
+    def fetch(
+        self, days: Iterable[date], author_ids: List[str]
+    ) -> Tuple[Dict[str, WorklogBatch], List[DateRange]]:
+        """The worklogs of every author (empty if none) and the fetched ranges"""
+        ranges = QueryPlanner(self.granularity).plan(days)
+        engine = AsyncTempoEngine(self.client, self.concurrency, self.page_limit)
+
+        def search(date_from, date_to, limit, updated_from):
+            return self.client.search_worklogs(
+                date_from, date_to, limit, updated_from, author_ids=author_ids
+            )
+
+        fetched = asyncio.run(engine.fetch_ranges_async(ranges, search=search))
+        by_author: Dict[str, List[dict]] = {author: [] for author in author_ids}
+        for worklogs in fetched:
+            for item in worklogs:
+                author = item.get("author", {}).get("accountId")
+                if author in by_author:
+                    by_author[author].append(item)
+        shards = {
+            author: WorklogBatch.from_worklogs(items)
+            for author, items in by_author.items()
+        }
+        return shards, ranges
+
+
+class FleetWorklogs:
+    """
+    The worklogs of all authors in one shared memory block: the WorklogBatch
+    columns back to back, author after author. Only this small handle is
+    pickled to the workers; each worker process maps the block once and
+    reads its author's worklogs as views, without copies.
+    """
+
+    # Mapped blocks of this process by name, kept open for later jobs
+    _attached: Dict[str, shared_memory.SharedMemory] = {}
+
+    def __init__(
+        self,
+        name: str,
+        rows: int,
+        columns: Dict[str, Tuple[str, int]],
+        authors: Dict[str, Tuple[int, int]],
+        ranges: List[DateRange],
+    ):
+        self.name = name
+        self.rows = rows
+        self.columns = columns  # column -> (dtype, byte offset)
+        self.authors = authors  # author -> (first row, end row)
+        self.ranges = ranges
+
+    @staticmethod
+    def share(
+        shards: Dict[str, WorklogBatch], ranges: List[DateRange]
+    ) -> Tuple["FleetWorklogs", shared_memory.SharedMemory]:
+        """
+        Copy the shards into a new shared memory block. The caller owns the
+        block and unlinks it (see release) once the workers are done.
+        """
+        empty = WorklogBatch.empty()
+        authors: Dict[str, Tuple[int, int]] = {}
+        start = 0
+        for author, batch in shards.items():
+            authors[author] = (start, start + len(batch))
+            start += len(batch)
+        batches = list(shards.values())
+        columns: Dict[str, Tuple[str, int]] = {}
+        offset = 0
+        for column in WorklogBatch.__slots__:
+            dtype = getattr(empty, column).dtype
+            columns[column] = (dtype.str, offset)
+            # 8-byte alignment for every column
+            offset += (start * dtype.itemsize + 7) // 8 * 8
+
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for column, (dtype, column_offset) in columns.items():
+            target = np.ndarray(start, dtype, buffer=block.buf, offset=column_offset)
+            position = 0
+            for batch in batches:
+                values = getattr(batch, column)
+                target[position : position + len(values)] = values
+                position += len(values)
+            del target
+        return FleetWorklogs(block.name, start, columns, authors, ranges), block
+
+    @staticmethod
+    def release(block: shared_memory.SharedMemory) -> None:
+        block.close()
+        block.unlink()
+
+    def batch(self, author: str) -> Optional[WorklogBatch]:
+        """The worklogs of one author as read-only views, None if not fetched"""
+        if author not in self.authors:
+            return None
+        block = self._attached.get(self.name)
+        if block is None:
+            block = self._attached[self.name] = shared_memory.SharedMemory(self.name)
+        start, end = self.authors[author]
+        views = []
+        for dtype, offset in self.columns.values():
+            view = np.ndarray(self.rows, dtype, buffer=block.buf, offset=offset)
+            view = view[start:end]
+            view.flags.writeable = False
+            views.append(view)
+        return WorklogBatch(*views)
+
+    def days(self) -> Set[date]:
+        """The days covered by the fetch, worklogs of other days are not included"""
+        return {day for date_range in self.ranges for day in date_range.days()}
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# Upper bounds of the histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+class Histogram:
+    """Cumulative Prometheus style histogram with fixed buckets"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def to_dict(self) -> dict:
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(bounds, self.cumulative_counts())),
+        }
+
+
+class Metrics:
+    """
+    Runtime metrics of one check run: phase timers, counters and histograms
+    (HTTP latency and response sizes). Thread safe, the Tempo requests of a
+    prefetch run in worker threads. Written as JSON and Prometheus text format.
+    """
+
+    prefix = "dsl_check"
+
+    # Always reported, even when nothing was counted
+    default_counters = (
+        "sheets",
+        "days",
+        "rows_reconciled",
+        "rows_reused",
+        "changes",
+        "worklogs",
+        "http_requests",
+        "http_errors",
+        "pages",
+        "cache_hits",
+        "cache_misses",
+        "retries",
+    )
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, float] = dict.fromkeys(self.default_counters, 0)
+        self.histograms: Dict[str, Histogram] = {
+            "http_request_seconds": Histogram(LATENCY_BUCKETS),
+            "http_response_bytes": Histogram(BYTES_BUCKETS),
+        }
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the run, repeated phases add up"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases_seconds": dict(self.phases),
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.to_dict()
+        lines = [
+            f"# HELP {self.prefix}_phase_seconds Wall time per phase of the check",
+            f"# TYPE {self.prefix}_phase_seconds gauge",
+        ]
+        for phase, seconds in snapshot["phases_seconds"].items():
+            lines.append(f'{self.prefix}_phase_seconds{{phase="{phase}"}} {seconds}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            lines.append(f"{self.prefix}_{name}_total {value}")
+        for name, histogram in snapshot["histograms"].items():
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum {histogram['sum']}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_file: str, prometheus_file: Optional[str] = None) -> None:
+        """Write the JSON file and the Prometheus file (default: same name, .prom)"""
+        prometheus_file = prometheus_file or os.path.splitext(json_file)[0] + ".prom"
+        with open(json_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        with open(prometheus_file, "w") as f:
+            f.write(self.to_prometheus())
@@ -0,0 +1,80 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+
+@dataclass(frozen=True)
+class DateRange:
+    start: date
+    end: date
+
+    @property
+    def from_str(self) -> str:
+        """Start of the range as "YYYY-MM-DD" (Tempo's "from")"""
+        return self.start.strftime("%Y-%m-%d")
+
+    @property
+    def to_str(self) -> str:
+        """End of the range as "YYYY-MM-DD" (Tempo's "to")"""
+        return self.end.strftime("%Y-%m-%d")
+
+    def days(self) -> Iterator[date]:
+        """Iterate over every day in the range, both ends included"""
+        current = self.start
+        while current <= self.end:
+            yield current
+            current += timedelta(days=1)
+
+
+class QueryPlanner:
+    """
+    Merges the days a run needs into as few contiguous from/to ranges as possible.
+
+    The granularity decides how far a single range may reach:
+    "day" never merges, "month" merges up to one range per month (sheet),
+    "year" merges up to one range per year.
+    """
+
+    GRANULARITIES = ("day", "month", "year")
+
+    def __init__(self, granularity: str = "month"):
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(
+                f"Unknown granularity '{granularity}', use one of {self.GRANULARITIES}"
+            )
+        self.granularity = granularity
+
+    def _group_key(self, day: date) -> tuple:
+        if self.granularity == "year":
+            return (day.year,)
+        if self.granularity == "month":
+            return (day.year, day.month)
+        return (day.year, day.month, day.day)
+
+    def plan(self, days: Iterable[date]) -> List[DateRange]:
+        """Plan the ranges covering all given days, sorted by start date"""
+        groups: Dict[tuple, List[date]] = {}
+        for day in sorted(set(QueryPlanner.to_date(d) for d in days)):
+            groups.setdefault(self._group_key(day), []).append(day)
+
+        # Within one group a single min..max range costs one (paged) request,
+        # gaps between the days are cheaper to over-fetch than to split
+        return [DateRange(group[0], group[-1]) for group in groups.values()]
+
+    @staticmethod
+    def to_date(value: date | datetime) -> date:
+        """Normalize datetime/Timestamp values to plain dates"""
+        if isinstance(value, datetime):
+            return value.date()
+        return value
+
+    @staticmethod
+    def days_in_month(month_year: date | datetime) -> List[date]:
+        """All calendar days of the month a DSL sheet covers"""
+        month_year = QueryPlanner.to_date(month_year)
+        last_day = calendar.monthrange(month_year.year, month_year.month)[1]
+        return [
+            date(month_year.year, month_year.month, day)
+            for day in range(1, last_day + 1)
+        ]
@@ -0,0 +1,141 @@
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import requests
+
+# Positions in the shared state array
+TOKENS, REFILLED, RATE, LIMIT, IN_FLIGHT, PAUSED_UNTIL, DECREASED = range(7)
+
+
+class RateGovernor:
+    """
+    Paces all Tempo requests of a process and, when handed to worker
+    processes (see install), of a whole batch run: a token bucket limits the
+    request rate and an AIMD limit the requests in flight. Every success
+    raises both a little (about one request per second, per second), a 429
+    or 503 halves them and pauses everyone for the Retry-After time.
+    The state lives in shared memory behind one lock, so threads (and with
+    processes=True worker processes) draw from the same budget.
+    """
+
+    # Status codes that mean "slow down", the request is retried
+    THROTTLED = (429, 503)
+    # Throttled responses within this many seconds count as one decrease
+    decrease_interval = 1.0
+
+    _shared: Optional["RateGovernor"] = None
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        max_rate: float = 25.0,
+        min_rate: float = 0.5,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        processes: bool = False,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.state = multiprocessing.RawArray(
+            "d", [burst, time.monotonic(), rate, max_concurrency, 0, 0, 0]
+        )
+        # A process lock costs a system semaphore, threads make do without
+        self.lock = multiprocessing.Lock() if processes else threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "RateGovernor":
+        """The governor of this process, created on first use"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def install(cls, governor: "RateGovernor") -> None:
+        """Make governor the one of this process (ProcessPoolExecutor initializer)"""
+        cls._shared = governor
+
+    def acquire(self) -> None:
+        """Block until the pause is over, a slot is free and a token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                state = self.state
+                wait = state[PAUSED_UNTIL] - now
+                if wait <= 0:
+                    if state[IN_FLIGHT] >= max(1, int(state[LIMIT])):
+                        wait = 0.01
+                    elif state[TOKENS] < 1:
+                        wait = (1 - state[TOKENS]) / state[RATE]
+                    else:
+                        state[TOKENS] -= 1
+                        state[IN_FLIGHT] += 1
+                        return
+            # Others may take the token first, so check again soon
+            time.sleep(min(wait, 0.25))
+
+    def release(
+        self, status_code: Optional[int] = None, retry_after: Optional[float] = None
+    ) -> None:
+        """
+        Free the slot of a finished request. status_code None (e.g. a
+        connection error) leaves rate and limit as they are.
+        """
+        with self.lock:
+            state = self.state
+            state[IN_FLIGHT] = max(0, state[IN_FLIGHT] - 1)
+            if status_code in self.THROTTLED:
+                now = time.monotonic()
+                # Multiplicative decrease, once for requests throttled together
+                if now - state[DECREASED] >= self.decrease_interval:
+                    state[DECREASED] = now
+                    state[LIMIT] = max(1.0, state[LIMIT] / 2)
+                    state[RATE] = max(self.min_rate, state[RATE] / 2)
+                state[TOKENS] = min(state[TOKENS], 0)
+                if retry_after:
+                    state[PAUSED_UNTIL] = max(state[PAUSED_UNTIL], now + retry_after)
+            elif status_code is not None:
+                # Additive increase
+                state[LIMIT] = min(
+                    self.max_concurrency, state[LIMIT] + 1 / state[LIMIT]
+                )
+                state[RATE] = min(self.max_rate, state[RATE] + 1 / state[RATE])
+
+    def _refill(self, now: float) -> None:
+        state = self.state
+        state[TOKENS] = min(
+            self.burst, state[TOKENS] + (now - state[REFILLED]) * state[RATE]
+        )
+        state[REFILLED] = now
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current rate (requests per second), concurrency limit and requests in flight"""
+        with self.lock:
+            return {
+                "rate": round(self.state[RATE], 2),
+                "limit": int(self.state[LIMIT]),
+                "in_flight": int(self.state[IN_FLIGHT]),
+            }
+
+    @staticmethod
+    def retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds of the Retry-After header (delay or HTTP date), None if absent"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,161 @@
+import logging
+from datetime import time
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from modules.day_summary import DaySummaries
+from modules.day_table import DayTable
+from modules.seconds import Seconds
+from modules.worklog_batch import WorklogBatch
+
+
+class Reconciler:
+    """
+    Batch counterpart of BookingChecker.check_line: joins all DSL day tables
+    with the per-day worklog summaries in one merge and computes every mismatch and
+    proposed AM/PM block at once. check_line stays the reference engine, both
+    produce the same changes.
+    """
+
+    BREAK_THRESHOLD_SECONDS = 6 * 3600  # 6 hours or more need a break
+    AM_END_SECONDS = 12 * 3600  # 12:00
+    PM_START_SECONDS = 12 * 3600 + 30 * 60  # 12:30
+    DAY_SECONDS = 24 * 3600
+
+    def __init__(self, excel_changes_tracker):
+        self.excel_changes_tracker = excel_changes_tracker
+
+    @staticmethod
+    def day_frame(day_tables: List[DayTable]) -> pd.DataFrame:
+        """All day rows of all sheets in sheet and row order"""
+        frames = [
+            pd.DataFrame(
+                {
+                    "sheet_name": day_table.sheet_name,
+                    "index": day_table.index,
+                    "date": [day.strftime("%Y-%m-%d") for day in day_table.dates()],
+                    "booked_seconds": day_table.booked_seconds,
+                    "pause": day_table.pause,
+                    "holiday_seconds": day_table.holiday_seconds,
+                }
+            )
+            for day_table in day_tables
+        ]
+        if not frames:
+            return pd.DataFrame(
+                columns=[
+                    "sheet_name",
+                    "index",
+                    "date",
+                    "booked_seconds",
+                    "pause",
+                    "holiday_seconds",
+                ]
+            )
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def round_up(seconds: np.ndarray) -> np.ndarray:
+        """Vectorized 59-second round-up"""
+        return Seconds.round_up(seconds)
+
+    @classmethod
+    def reconcile(
+        cls, day_tables: List[DayTable], worklogs: WorklogBatch
+    ) -> pd.DataFrame:
+        """
+        All conflicting days, in sheet and row order, with the proposed blocks
+        as seconds since midnight (-1 where a block is not proposed)
+        """
+        days = cls.day_frame(day_tables).merge(
+            DaySummaries.aggregate(worklogs).to_frame(),
+            on="date",
+            how="left",
+            sort=False,
+        )
+        task = days["task_seconds"].fillna(0).to_numpy(dtype=np.int64)
+        nlz = days["nlz_seconds"].fillna(0).to_numpy(dtype=np.int64)
+        booked = days["booked_seconds"].to_numpy(dtype=np.int64) % cls.DAY_SECONDS
+
+        days["task_seconds"] = task
+        days["nlz_seconds"] = nlz
+        days["homeoffice"] = days["homeoffice"].fillna(False).astype(bool)
+        days["unbooked"] = (
+            days["pause"].to_numpy()
+            & (days["holiday_seconds"].to_numpy() == 0)
+            & (booked == 0)
+            & (task > 0)
+        )
+
+        conflicts = days[cls.round_up(booked) != cls.round_up(task)].copy()
+
+        earliest = conflicts["earliest_start"].fillna(-1).to_numpy(dtype=np.int64)
+        task = conflicts["task_seconds"].to_numpy(dtype=np.int64)
+        has_start = earliest >= 0
+        needs_break = has_start & (task >= cls.BREAK_THRESHOLD_SECONDS)
+        seconds_to_12 = cls.AM_END_SECONDS - earliest
+
+        conflicts["am_start"] = np.where(has_start, earliest, -1)
+        conflicts["am_end"] = np.where(
+            needs_break,
+            cls.AM_END_SECONDS,
+            np.where(has_start, (earliest + task) % cls.DAY_SECONDS, -1),
+        )
+        conflicts["pm_start"] = np.where(needs_break, cls.PM_START_SECONDS, -1)
+        conflicts["pm_end"] = np.where(
+            needs_break,
+            (cls.PM_START_SECONDS + task - seconds_to_12) % cls.DAY_SECONDS,
+            -1,
+        )
+        return conflicts.reset_index(drop=True)
+
+    def apply(self, conflicts: pd.DataFrame, logger: logging.Logger) -> int:
+        """Log the conflicts and add them to the Excel tracker, returns the count"""
+        for conflict in conflicts.itertuples(index=False):
+            formatted_task_jira = Reconciler.format_seconds(conflict.task_seconds)
+            formatted_nlz_jira = Reconciler.format_seconds(conflict.nlz_seconds)
+            if conflict.unbooked:
+                logger.error(
+                    f"Found unbooked Time in DSL Sheet '{conflict.sheet_name}' - {conflict.date}"
+                )
+            else:
+                logger.error(
+                    f"Inconsistent booking found in Sheet '{conflict.sheet_name}' - {conflict.date}"
+                )
+                logger.error(
+                    f"DSL Task:  {Reconciler.format_seconds(conflict.booked_seconds % Reconciler.DAY_SECONDS)}"
+                )
+                logger.error(
+                    f"DSL NLZ:   {Reconciler.format_seconds(conflict.holiday_seconds % Reconciler.DAY_SECONDS)}"
+                )
+            logger.error(f"Jira Tasks:{formatted_task_jira}")
+            logger.error(f"Jira NLZ:  {formatted_nlz_jira}")
+
+            self.excel_changes_tracker.add_change(
+                sheet_name=conflict.sheet_name,
+                row=int(conflict.index),
+                proposed_am_start=Reconciler.to_time(conflict.am_start),
+                proposed_am_end=Reconciler.to_time(conflict.am_end),
+                proposed_pm_start=Reconciler.to_time(conflict.pm_start),
+                proposed_pm_end=Reconciler.to_time(conflict.pm_end),
+                is_homeoffice=bool(conflict.homeoffice),
+                nlz_time=(
+                    int(conflict.nlz_seconds) if conflict.nlz_seconds > 0 else None
+                ),
+                day=conflict.date,
+                dsl_task_seconds=int(conflict.booked_seconds % Reconciler.DAY_SECONDS),
+                dsl_nlz_seconds=int(conflict.holiday_seconds % Reconciler.DAY_SECONDS),
+                jira_task_seconds=int(conflict.task_seconds),
+                jira_nlz_seconds=int(conflict.nlz_seconds),
+            )
+        return len(conflicts)
+
+    @staticmethod
+    def format_seconds(seconds: int) -> str:
+        return Seconds.format(int(seconds))
+
+    @staticmethod
+    def to_time(seconds: int) -> Optional[time]:
+        if seconds < 0:
+            return None
+        return Seconds.to_time(int(seconds))
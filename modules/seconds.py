@@ -0,0 +1,72 @@
+import datetime as dt
+from functools import lru_cache
+from typing import Any, Optional
+import numpy as np
+
+
+class Seconds:
+    """
+    The one time representation of the checks: plain integer seconds, either
+    a duration or seconds since midnight (NumPy int64 arrays for columns).
+    Values come in once (Excel cells, Tempo startTime strings) and only turn
+    into strings or time objects when written to the log or the output.
+    """
+
+    MINUTE = 60
+    HOUR = 3600
+    DAY = 86400
+
+    @staticmethod
+    def round_up(seconds):
+        """
+        The 59-second round-up rule: a value ending in :59 counts as the next
+        full minute. Works on ints and on NumPy arrays.
+        """
+        return seconds + (seconds % Seconds.MINUTE == 59)
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def format(seconds: int) -> str:
+        """Rounded up "HH:MM:SS" for logs and output, hours may exceed 24"""
+        hours, rest = divmod(Seconds.round_up(int(seconds)), Seconds.HOUR)
+        minutes, seconds = divmod(rest, Seconds.MINUTE)
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse(text: Optional[str]) -> int:
+        """
+        "HH:MM:SS" (or "HH:MM") as seconds, 0 for an empty value. Cached since
+        Tempo startTime values repeat across thousands of worklogs.
+        """
+        if not text:
+            return 0
+        parts = text.split(":")
+        seconds = int(parts[0]) * Seconds.HOUR + int(parts[1]) * Seconds.MINUTE
+        return seconds + (int(parts[2]) if len(parts) > 2 else 0)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def to_time(seconds: int) -> dt.time:
+        """Seconds since midnight as a time of day, wrapping past midnight"""
+        hours, rest = divmod(int(seconds) % Seconds.DAY, Seconds.HOUR)
+        minutes, seconds = divmod(rest, Seconds.MINUTE)
+        return dt.time(hours, minutes, seconds)
+
+    @staticmethod
+    def from_time(value: dt.time) -> int:
+        return value.hour * Seconds.HOUR + value.minute * Seconds.MINUTE + value.second
+
+    @staticmethod
+    def from_duration(value: Any) -> int:
+        """Whole seconds (rounded down) of a duration cell, 0 for anything else"""
+        if isinstance(value, dt.timedelta):
+            return value // dt.timedelta(seconds=1)
+        return 0
+
+    @staticmethod
+    def column(values) -> np.ndarray:
+        """from_duration over a column of cells as an int64 array"""
+        return np.fromiter(
+            (Seconds.from_duration(value) for value in values), dtype=np.int64
+        )
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """
+    Where a month sheet keeps its values, zero-based rows and columns.
+    The defaults are the DSL template: month in K1, header rows 5-7, day rows
+    8-38 with the weekday in A, the day in B, the blocks in C-F, required
+    hours in G, booked time in H, home office in I and NLZ in L.
+    """
+
+    month_row: int = 0
+    month_column: int = 10
+    first_day_row: int = 7
+    day_count: int = 31
+    weekday_column: int = 0
+    day_column: int = 1
+    am_start_column: int = 2
+    am_end_column: int = 3
+    pm_start_column: int = 4
+    pm_end_column: int = 5
+    required_column: int = 6
+    booked_column: int = 7
+    homeoffice_column: int = 8
+    holiday_column: int = 11
+
+    # Columns read per day row, by role
+    READ_ROLES = ("weekday", "day", "required", "booked", "holiday")
+
+    @property
+    def header_rows(self) -> range:
+        """The three rows above the first day row, copied into the diff workbook"""
+        return range(self.first_day_row - 3, self.first_day_row)
+
+    @property
+    def last_row(self) -> int:
+        """Number of rows to read (up to the last day row)"""
+        return self.first_day_row + self.day_count
+
+    def column(self, role: str) -> int:
+        return getattr(self, f"{role}_column")
+
+    def shifted(self, rows: int, columns: int) -> "SheetLayout":
+        """The layout moved by whole rows and columns (e.g. an inserted title row)"""
+        changes = {
+            field.name: getattr(self, field.name) + columns
+            for field in fields(self)
+            if field.name.endswith("_column")
+        }
+        changes["month_row"] = self.month_row + rows
+        changes["first_day_row"] = self.first_day_row + rows
+        return replace(self, **changes)
+
+
+DEFAULT_LAYOUT = SheetLayout()
+
+
+class LayoutDetector:
+    """
+    Finds the layout of a month sheet from its first rows: the day rows are
+    the run of day numbers 1, 2, 3, ... in one column, the month is the first
+    date above them. The other columns keep their template distance to the
+    day column unless a header label names them, and the required hours must
+    be durations. Sheets without such a run use the template layout.
+    """
+
+    # Rows read to detect a layout
+    scan_rows = 60
+
+    # Lower case header labels naming a column
+    labels = {
+        "required": ("soll", "sollzeit", "required"),
+        "booked": ("ist", "istzeit", "booked"),
+        "holiday": ("nlz",),
+        "homeoffice": ("ho", "homeoffice", "home office"),
+    }
+
+    @staticmethod
+    def detect(rows: Sequence[Sequence[Any]]) -> SheetLayout:
+        found = LayoutDetector.find_days(rows)
+        if found is None:
+            return DEFAULT_LAYOUT
+        first_day_row, day_column, day_count = found
+        layout = replace(
+            DEFAULT_LAYOUT.shifted(
+                first_day_row - DEFAULT_LAYOUT.first_day_row,
+                day_column - DEFAULT_LAYOUT.day_column,
+            ),
+            day_count=day_count,
+        )
+
+        # The month: the first date above the day rows
+        for row_index, row in enumerate(rows[:first_day_row]):
+            column = next(
+                (i for i, value in enumerate(row) if isinstance(value, datetime)),
+                None,
+            )
+            if column is not None:
+                layout = replace(layout, month_row=row_index, month_column=column)
+                break
+
+        # Labelled columns win over the template distances
+        for row in rows[max(0, first_day_row - 3) : first_day_row]:
+            for column, value in enumerate(row):
+                if not isinstance(value, str):
+                    continue
+                for role, names in LayoutDetector.labels.items():
+                    if value.strip().lower() in names:
+                        layout = replace(layout, **{f"{role}_column": column})
+
+        day_rows = rows[first_day_row : first_day_row + day_count]
+        if not LayoutDetector.is_duration_column(day_rows, layout.required_column):
+            # Required hours moved: the first duration column after the day
+            width = max(len(row) for row in day_rows)
+            for column in range(day_column + 1, width):
+                if LayoutDetector.is_duration_column(day_rows, column):
+                    layout = replace(
+                        layout, required_column=column, booked_column=column + 1
+                    )
+                    break
+        return layout
+
+    @staticmethod
+    def find_days(rows: Sequence[Sequence[Any]]) -> Optional[tuple]:
+        """(first day row, day column, day count) of the longest 1, 2, 3 ... run"""
+        best = None
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                if LayoutDetector.day_value(value) != 1:
+                    continue
+                count = 1
+                while (
+                    row_index + count < len(rows)
+                    and column < len(rows[row_index + count])
+                    and LayoutDetector.day_value(rows[row_index + count][column])
+                    == count + 1
+                ):
+                    count += 1
+                if count >= 28 and (best is None or count > best[2]):
+                    best = (row_index, column, count)
+            if best is not None:
+                return best
+        return None
+
+    @staticmethod
+    def day_value(value: Any) -> Optional[int]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)) and float(value).is_integer():
+            return int(value)
+        return None
+
+    @staticmethod
+    def is_duration_column(day_rows: Sequence[Sequence[Any]], column: int) -> bool:
+        """Most of the day rows hold a duration in the column"""
+        durations = sum(
+            1
+            for row in day_rows
+            if column < len(row) and isinstance(row[column], timedelta)
+        )
+        return durations * 2 > len(day_rows)
+
+
+class LayoutCache:
+    """
+    Detected layouts by sheet name, so later runs read the known cells
+    directly. A layout is kept with a signature of the sheet's header rows and
+    only used while the sheet still fits it: same header rows and the day
+    rows still counting 1, 2, 3, ... in the day column. Saving the workbook
+    with new bookings keeps the layouts, moving or relabelling the table
+    detects them again. Keeps the last max_sheets layouts, a cache without
+    path only lives in memory.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: str = "", max_sheets: int = 1024):
+        self.path = path
+        self.max_sheets = max_sheets
+        self.sheets: Dict[str, dict] = {}
+        self.changed = False
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if stored.get("version") == self.VERSION:
+                self.sheets = stored.get("sheets", {})
+
+    @staticmethod
+    def signature(rows: Sequence[Sequence[Any]], layout: SheetLayout) -> str:
+        """Hash of the header rows and the kind of the month cell"""
+        month_row = rows[layout.month_row] if layout.month_row < len(rows) else ()
+        month = (
+            month_row[layout.month_column]
+            if layout.month_column < len(month_row)
+            else None
+        )
+        # Without trailing empty cells, which only depend on the sheet's width
+        headers = [
+            LayoutCache.trimmed(rows[row]) if row < len(rows) else None
+            for row in layout.header_rows
+        ]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([headers, type(month).__name__], default=str).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def trimmed(row: Sequence[Any]) -> List[Any]:
+        values = list(row)
+        while values and values[-1] is None:
+            values.pop()
+        return values
+
+    @staticmethod
+    def has_day_rows(rows: Sequence[Sequence[Any]], layout: SheetLayout) -> bool:
+        """The day column counts exactly 1 to day_count in the day rows, not on in the next row"""
+
+        def day(row: int) -> Optional[int]:
+            if row >= len(rows) or layout.day_column >= len(rows[row]):
+                return None
+            return LayoutDetector.day_value(rows[row][layout.day_column])
+
+        return (
+            all(
+                day(layout.first_day_row + offset) == offset + 1
+                for offset in range(layout.day_count)
+            )
+            and day(layout.last_row) != layout.day_count + 1
+        )
+
+    def get(self, sheet_name: str) -> Optional[SheetLayout]:
+        stored = self.sheets.get(sheet_name)
+        return SheetLayout(**stored["layout"]) if stored is not None else None
+
+    def fits(
+        self, sheet_name: str, rows: Sequence[Sequence[Any]], layout: SheetLayout
+    ) -> bool:
+        """Whether the rows of the sheet still match its cached layout"""
+        stored = self.sheets.get(sheet_name)
+        return (
+            stored is not None
+            and stored["signature"] == self.signature(rows, layout)
+            and self.has_day_rows(rows, layout)
+        )
+
+    def put(
+        self, sheet_name: str, rows: Sequence[Sequence[Any]], layout: SheetLayout
+    ) -> None:
+        self.sheets.pop(sheet_name, None)
+        # Most recently detected layout last
+        self.sheets[sheet_name] = {
+            "signature": self.signature(rows, layout),
+            "layout": asdict(layout),
+        }
+        while len(self.sheets) > self.max_sheets:
+            del self.sheets[next(iter(self.sheets))]
+        self.changed = True
+
+    def save(self) -> None:
+        if not self.path or not self.changed:
+            return
+        with open(self.path, "w") as f:
+            json.dump({"version": self.VERSION, "sheets": self.sheets}, f)
+        self.changed = False
@@ -0,0 +1,225 @@
+import json
+import time
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from modules.metrics import Metrics
+from modules.rate_governor import RateGovernor
+from modules.worklog_batch import WorklogBatch, WorklogRecord, WorklogStreamParser
+
+try:
+    import orjson  # Optional, noticeably faster on large worklog pages
+except ImportError:
+    orjson = None
+
+
+class TempoClient:
+    """
+    Thin Tempo API client keeping one pooled keep-alive session,
+    so requests reuse TCP/TLS connections and prebuilt headers.
+    Every request waits for the RateGovernor, throttled ones are retried.
+    """
+
+    search_path = "/4/worklogs/search"
+
+    # Retries of a throttled request (429, 503) before its response is returned
+    max_retries = 5
+    # First backoff without Retry-After, doubled on every further retry
+    backoff_seconds = 0.5
+
+    # The only worklog fields read by BookingChecker, everything else is dropped
+    worklog_fields = (
+        "tempoWorklogId",
+        "issue",
+        "timeSpentSeconds",
+        "startDate",
+        "startTime",
+        "attributes",
+        "author",
+    )
+
+    def __init__(
+        self,
+        bearer_token: str,
+        base_url: str = "https://api.tempo.io",
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        metrics: Optional[Metrics] = None,
+        adapter: Optional[HTTPAdapter] = None,
+        governor: Optional[RateGovernor] = None,
+    ):
+        """
+        adapter: a connection pool shared with other clients (other tokens)
+        governor: paces the requests, defaults to the one of the process
+        """
+        self.base_url = base_url.rstrip("/")
+        self.metrics = metrics
+        self.governor = governor or RateGovernor.shared()
+        self.session = requests.Session()
+        self.shared_adapter = adapter is not None
+        adapter = adapter or HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {bearer_token}",
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.base_url}{self.search_path}"
+
+    def search(
+        self, data: dict, url: Optional[str] = None, stream: bool = False
+    ) -> requests.Response:
+        """
+        POST a worklog search, url defaults to the search endpoint (or a next page).
+        Throttled requests are retried up to max_retries times, after the
+        Retry-After pause or a growing backoff.
+        """
+        body = self.dumps(data)
+        for attempt in range(self.max_retries + 1):
+            self.governor.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.post(
+                    url or self.search_url, data=body, stream=stream
+                )
+            except requests.RequestException:
+                self.governor.release()
+                raise
+            retry_after = RateGovernor.retry_after(response)
+            self.governor.release(response.status_code, retry_after)
+            if self.metrics is not None:
+                self.record(response, time.perf_counter() - started, stream)
+            if (
+                response.status_code not in RateGovernor.THROTTLED
+                or attempt == self.max_retries
+            ):
+                return response
+            response.close()
+            if self.metrics is not None:
+                self.metrics.increment("retries")
+            if retry_after is None:
+                # With Retry-After the governor pauses every request instead
+                time.sleep(self.backoff_seconds * 2**attempt)
+        return response
+
+    def record(self, response: requests.Response, seconds: float, stream: bool) -> None:
+        """
+        Count the request and observe its latency (up to the headers for
+        streamed responses) and size (Content-Length, or the decoded body
+        when it is read anyway)
+        """
+        self.metrics.increment("http_requests")
+        self.metrics.observe("http_request_seconds", seconds)
+        if response.status_code != 200:
+            self.metrics.increment("http_errors")
+        size = response.headers.get("Content-Length")
+        if size is None and not stream:
+            size = len(response.content)
+        if size is not None:
+            self.metrics.observe("http_response_bytes", int(size))
+
+    def search_worklogs(
+        self,
+        date_from: str,
+        date_to: str,
+        limit: int,
+        updated_from: Optional[str] = None,
+        author_ids: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """
+        Fetch all worklogs between date_from and date_to ("YYYY-MM-DD", inclusive),
+        optionally only those updated since updated_from or of the given
+        authors (Atlassian account ids, needs a token that may see them).
+        Follows metadata.next until every page is read and drops duplicates
+        (offset paging can repeat entries when worklogs change in between).
+        """
+        data = {"from": date_from, "to": date_to, "limit": limit}
+        if updated_from:
+            data["updatedFrom"] = updated_from
+        if author_ids:
+            data["authorIds"] = author_ids
+        url = self.search_url
+        unique_worklogs: Dict[int, dict] = {}
+        while url:
+            response = self.search(data, url)
+            # Never take an error body for an empty page
+            response.raise_for_status()
+            response_json = self.loads(response)
+            self.count_page()
+            for item in response_json.get("results", []):
+                item = self.slim_worklog(item)
+                unique_worklogs[item.get("tempoWorklogId", id(item))] = item
+            url = response_json.get("metadata", {}).get("next")
+        return list(unique_worklogs.values())
+
+    def search_worklog_batch(
+        self,
+        date_from: str,
+        date_to: str,
+        limit: int,
+        updated_from: Optional[str] = None,
+    ) -> WorklogBatch:
+        """
+        Same as search_worklogs, but every page is parsed straight into compact
+        records and the result is a columnar WorklogBatch (deduplicated by id)
+        """
+        data = {"from": date_from, "to": date_to, "limit": limit}
+        if updated_from:
+            data["updatedFrom"] = updated_from
+        url = self.search_url
+        records: List[WorklogRecord] = []
+        while url:
+            with self.search(
+                data, url, stream=WorklogStreamParser.streaming
+            ) as response:
+                response.raise_for_status()
+                page_records, url = WorklogStreamParser.parse(response)
+            self.count_page()
+            records.extend(page_records)
+        return WorklogBatch.from_records(records)
+
+    def count_page(self) -> None:
+        if self.metrics is not None:
+            self.metrics.increment("pages")
+
+    def close(self) -> None:
+        if self.shared_adapter:
+            self.session.adapters.clear()  # the pool stays open for the others
+        self.session.close()
+
+    @classmethod
+    def slim_worklog(cls, item: dict) -> dict:
+        """Keep only the worklog fields the checker reads"""
+        slim = {key: item[key] for key in cls.worklog_fields if key in item}
+        if "issue" in slim:
+            slim["issue"] = {
+                key: slim["issue"][key]
+                for key in ("self", "id", "key")
+                if key in slim["issue"]
+            }
+        if "attributes" in slim:
+            slim["attributes"] = {"values": slim["attributes"].get("values", [])}
+        if "author" in slim:
+            slim["author"] = {"accountId": slim["author"].get("accountId")}
+        return slim
+
+    @staticmethod
+    def dumps(data: dict) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data).encode()
+
+    @staticmethod
+    def loads(response: requests.Response) -> dict:
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return response.json()
@@ -1,12 +1,16 @@
 from string import Template
-import pandas as pd
+from typing import TYPE_CHECKING
 import datetime as dt
+from modules.seconds import Seconds
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Util:
     @staticmethod
     def write_am_start_timedelta_str(
-        df: pd.DataFrame, index: int, value: dt.datetime
+        df: "pd.DataFrame", index: int, value: dt.datetime
     ) -> None:
         """Writes to the Start Time Before Pause"""
         # df.loc[index, "C"] = value
@@ -14,7 +18,7 @@ class Util:
 
     @staticmethod
     def write_am_end_timedelta_str(
-        df: pd.DataFrame, index: int, value: dt.datetime
+        df: "pd.DataFrame", index: int, value: dt.datetime
     ) -> None:
         """Writes to the End Time Before Pause"""
         # df.loc[index, "D"] = value
@@ -22,7 +26,7 @@ class Util:
 
     @staticmethod
     def write_pm_start_timedelta_str(
-        df: pd.DataFrame, index: int, value: dt.datetime
+        df: "pd.DataFrame", index: int, value: dt.datetime
     ) -> None:
         """Writes to the Start Time After Pause"""
         # df.loc[index, "E"] = value
@@ -30,42 +34,42 @@ class Util:
 
     @staticmethod
     def write_pm_end_timedelta_str(
-        df: pd.DataFrame, index: int, value: dt.datetime
+        df: "pd.DataFrame", index: int, value: dt.datetime
     ) -> None:
         """Writes to the End Time After Pause"""
         # df.loc[index, "F"] = value
         return
 
     @staticmethod
-    def get_booked_time_for_index(df: pd.DataFrame, index: int):
+    def get_booked_time_for_index(df: "pd.DataFrame", index: int):
         """
         Get the booked time for a specific index in the DataFrame.
         """
         return df.loc[index, "H"]
 
     @staticmethod
-    def get_day_for_index(df: pd.DataFrame, index: int):
+    def get_day_for_index(df: "pd.DataFrame", index: int):
         """
         Get the day for a specific index in the DataFrame.
         """
         return df.loc[index, "B"]
 
     @staticmethod
-    def get_date_for_sheet(df: pd.DataFrame):
+    def get_date_for_sheet(df: "pd.DataFrame"):
         """
         Get the date for a specific index in the DataFrame.
         """
         return df.loc[0, "K"]
 
     @staticmethod
-    def get_holiday_amount_for_index(df: pd.DataFrame, index: int):
+    def get_holiday_amount_for_index(df: "pd.DataFrame", index: int):
         """
         Get the date for a specific index in the DataFrame.
         """
         return df.loc[index, "L"]
 
     @staticmethod
-    def get_required_hours_for_index(df: pd.DataFrame, index: int):
+    def get_required_hours_for_index(df: "pd.DataFrame", index: int):
         """
         Get the required hours for a specific index in the DataFrame.
         """
@@ -85,22 +89,21 @@ class Util:
         Get the rounded up time in hours, minutes, and seconds.
         Automatically rounds up the minutes if the seconds are 59.
         """
-        hours_only = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        if seconds == 59:
-            minutes += 1
-            seconds = 0
+        hours_only, rest = divmod(Seconds.round_up(int(total_seconds)), 3600)
+        minutes, seconds = divmod(rest, 60)
         return (hours_only, minutes, seconds)
 
+    @staticmethod
+    def seconds_to_time(seconds: int) -> dt.time:
+        """
+        Convert seconds since midnight to a time of day.
+        """
+        return Seconds.to_time(int(seconds))
+
     @staticmethod
     def strfdelta(tdelta, fmt):
         d = {"D": tdelta.days}
-        hours, rem = divmod(tdelta.seconds, 3600)
-        minutes, seconds = divmod(rem, 60)
-        if seconds == 59:
-            minutes += 1
-            seconds = 0
+        hours, minutes, seconds = Util.get_round_up_time(tdelta.seconds)
         d["H"] = "{:02d}".format(hours)
         d["M"] = "{:02d}".format(minutes)
         d["S"] = "{:02d}".format(seconds)
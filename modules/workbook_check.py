@@ -0,0 +1,426 @@
+import datetime as dt
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from modules.booking_checker import BookingChecker
+from modules.change_sink import ChangeSink
+from modules.day_table import DayTable
+from modules.excel_changes import ExcelChangesTracker
+from modules.fingerprint_store import FingerprintStore, Fingerprints
+from modules.metrics import Metrics
+from modules.rate_governor import RateGovernor
+from modules.sheet_layout import LayoutCache
+from modules.workbook_loader import WorkbookData, WorkbookLoader
+from modules.workbook_sidecar import WorkbookSidecar
+from modules.worklog_batch import WorklogBatch
+from modules.worklog_store import WorklogStore
+
+TOKEN_HELP = "https://meteoserve.atlassian.net/plugins/servlet/ac/io.tempo.jira/tempo-app#!/configuration/api-integration"
+
+
+@dataclass
+class CheckResult:
+    excel_file: str
+    sheets: int = 0
+    days: int = 0
+    changes: int = 0
+    reused_days: int = 0
+    uncached_days: int = 0  # offline: days skipped, not in the worklog cache
+    output_file: str = ""
+    changes_file: str = ""
+    wall_seconds: float = 0.0
+    error: Optional[str] = None
+    tempo_status: int = 0  # HTTP status of the token check
+
+
+class WorkbookCheck:
+    """
+    The full check of one DSL workbook: load it, fetch the worklogs,
+    reconcile every past day and save the diff workbook.
+    Used by main.py for a single workbook and by the batch runner per workbook.
+    Every phase is timed in `metrics`, which is written to metrics_file
+    (JSON, plus the Prometheus text format next to it as .prom) if set.
+    """
+
+    def __init__(
+        self,
+        excel_file: str,
+        bearer_token: str,
+        logger: logging.Logger,
+        worklog_store: Optional[WorklogStore] = None,
+        batch_reconcile: bool = True,
+        output_dir: str = "",
+        fingerprint_store: Optional[FingerprintStore] = None,
+        metrics_file: str = "",
+        output_name: str = "",
+        save_output: bool = True,
+        changes_file: str = "",
+        changes_labels: Optional[Dict[str, str]] = None,
+        stream_file: str = "",
+        layout_cache: Optional[LayoutCache] = None,
+        sidecar: bool = False,
+        worklogs: Optional[WorklogBatch] = None,
+        worklog_days: Iterable[date] = (),
+        stream_only: bool = False,
+    ):
+        self.excel_file = excel_file
+        self.bearer_token = bearer_token
+        self.logger = logger
+        self.worklog_store = worklog_store
+        self.batch_reconcile = batch_reconcile
+        self.output_dir = output_dir
+        self.fingerprint_store = fingerprint_store
+        self.metrics_file = metrics_file
+        self.output_name = output_name  # default: timesheet_changes_<timestamp>.xlsx
+        self.save_output = (
+            save_output  # False keeps the changes in excel_changes_tracker only
+        )
+        # Also export all conflicts for analytics (.csv or .parquet), labels
+        # are added as columns to every row (e.g. the employee)
+        self.changes_file = changes_file
+        self.changes_labels = changes_labels or {}
+        # Write every conflict there as soon as it is found (.jsonl, .csv or "-")
+        self.stream_file = stream_file
+        # Sheet layouts detected in earlier runs, by workbook hash and sheet
+        self.layout_cache = layout_cache
+        # Keep the loaded workbook in <excel_file>.dslcache for unchanged re-runs
+        self.sidecar = sidecar
+        # Worklogs fetched beforehand (fleet mode), complete for worklog_days:
+        # those days are not fetched and the token is not checked then
+        self.worklogs = worklogs
+        self.worklog_days = set(worklog_days)
+        # Only write the conflicts to stream_file, keep none of them in memory:
+        # no diff workbook, changes_file or fingerprints (see --rebuild)
+        self.stream_only = stream_only
+        if stream_only:
+            if not stream_file:
+                raise ValueError("Streaming only needs a stream_file")
+            self.save_output = False
+            self.changes_file = ""
+            self.fingerprint_store = None
+        self.excel_changes_tracker: Optional[ExcelChangesTracker] = None
+        self.metrics = Metrics()
+        # Kept between runs (watch mode): HTTP session, fetched worklogs and
+        # the DSL values of every row of the previous run
+        self.checker: Optional[BookingChecker] = None
+        self.dsl_rows: Dict[Tuple[str, int], tuple] = {}
+
+    def run(
+        self,
+        refresh_worklogs: bool = False,
+        workbook: Optional[WorkbookData] = None,
+        revalidate_worklogs: bool = False,
+    ) -> CheckResult:
+        """
+        Check the workbook, or the already loaded workbook data if given.
+        Repeated runs reuse the worklogs fetched before and only fetch days
+        that are new or whose DSL row changed, refresh_worklogs fetches all
+        of them again in full and revalidate_worklogs brings all of them up
+        to date through the worklog store (see BookingChecker.prefetch).
+        """
+        started = time.perf_counter()
+        result = CheckResult(self.excel_file)
+        self.metrics = Metrics()
+        sinks = [ChangeSink.open(self.stream_file)] if self.stream_file else []
+        try:
+            with self.metrics.phase("total"):
+                self._run(
+                    result, refresh_worklogs, workbook, sinks, revalidate_worklogs
+                )
+        finally:
+            for sink in sinks:
+                sink.close()
+            result.wall_seconds = time.perf_counter() - started
+            if self.metrics_file:
+                self.metrics.write(self.metrics_file)
+        return result
+
+    def load_workbook(self) -> WorkbookData:
+        """The workbook up to the current month, from its sidecar while unchanged"""
+        if self.sidecar:
+            workbook = WorkbookSidecar.load(self.excel_file, dt.datetime.now())
+            if workbook is not None:
+                return workbook
+        workbook = WorkbookLoader(self.excel_file, self.layout_cache).load()
+        if self.sidecar:
+            try:
+                WorkbookSidecar.save(workbook)
+            except OSError as e:
+                self.logger.warning(f"Cannot write the workbook sidecar: {e}")
+        return workbook
+
+    def _run(
+        self,
+        result: CheckResult,
+        refresh_worklogs: bool,
+        workbook: Optional[WorkbookData],
+        sinks: List[ChangeSink],
+        revalidate_worklogs: bool = False,
+    ) -> None:
+        metrics = self.metrics
+        offline = self.worklog_store is not None and self.worklog_store.offline
+
+        # Load the Excel file once, up to the current month
+        if workbook is None:
+            with metrics.phase("load_workbook"):
+                workbook = self.load_workbook()
+
+        # Initialize Excel changes tracker
+        excel_changes_tracker = ExcelChangesTracker(
+            self.excel_file, workbook, sinks, keep_changes=not self.stream_only
+        )
+        self.excel_changes_tracker = excel_changes_tracker
+        checker = self.checker
+        if checker is None:
+            checker = BookingChecker(
+                excel_changes_tracker,
+                bearer_token=self.bearer_token,
+                worklog_store=self.worklog_store,
+                metrics=metrics,
+            )
+            if self.worklogs is not None:
+                checker.worklogs = self.worklogs
+                checker.prefetched_days.update(self.worklog_days)
+
+            if not offline and self.worklogs is None:
+                with metrics.phase("check_token"):
+                    result.tempo_status = checker.check_request()
+                if result.tempo_status in RateGovernor.THROTTLED:
+                    self.logger.error(
+                        "Tempo is still limiting the requests after several retries, try again later!"
+                    )
+                    result.error = "Tempo rate limit reached"
+                    return
+                if result.tempo_status in (401, 403):
+                    self.logger.error(
+                        f"Incorrect API token, get it from from Jira Tempo: '{TOKEN_HELP}'!"
+                    )
+                    result.error = "Incorrect API token"
+                    return
+                if result.tempo_status != 200:
+                    self.logger.error(
+                        f"Tempo answered the token check with HTTP {result.tempo_status}!"
+                    )
+                    result.error = f"Tempo error (HTTP {result.tempo_status})"
+                    return
+            self.checker = checker
+        else:
+            checker.excel_changes_tracker = excel_changes_tracker
+            checker.metrics = checker.client.metrics = metrics
+
+        # Turn every sheet up to the current month into a typed day table
+        with metrics.phase("day_tables"):
+            day_tables = [DayTable.from_sheet(sheet) for sheet in workbook.sheets]
+        result.sheets = len(day_tables)
+        result.days = sum(len(day_table) for day_table in day_tables)
+        metrics.increment("sheets", result.sheets)
+        metrics.increment("days", result.days)
+
+        if workbook.skipped_month is not None:
+            self.logger.info(
+                f"Skipping {workbook.skipped_month.strftime('%b')}, not yet reached!"
+            )
+
+        # Fetch the worklogs of many days at once instead of one request per day.
+        # With sinks a wave of sheets (as many months as are fetched at once)
+        # is fetched and reconciled at a time, so the conflicts of the first
+        # sheets are written while later months are still being fetched
+        changed_days = set(self.changed_days(day_tables))
+        wave = checker.concurrency if sinks else max(1, len(day_tables))
+        fingerprints: Fingerprints = {}
+        checked_tables: List[DayTable] = []
+        for start in range(0, len(day_tables), wave):
+            checked_tables += self.check_wave(
+                day_tables[start : start + wave],
+                checker,
+                excel_changes_tracker,
+                refresh_worklogs,
+                changed_days,
+                fingerprints,
+                result,
+                revalidate_worklogs,
+            )
+        metrics.increment("worklogs", len(checker.worklogs))
+        if result.uncached_days:
+            self.report_uncached(result)
+            if result.error:
+                return
+        day_tables = checked_tables
+        if self.fingerprint_store is not None:
+            metrics.increment("rows_reused", result.reused_days)
+            self.logger.info(
+                f"Reusing the results of {result.reused_days} unchanged days"
+            )
+
+        excel_changes_tracker.sort_changes(
+            [day_table.sheet_name for day_table in day_tables]
+        )
+        if self.fingerprint_store is not None:
+            with metrics.phase("fingerprints"):
+                self.fingerprint_store.update(fingerprints, excel_changes_tracker)
+                self.fingerprint_store.save()
+
+        result.changes = excel_changes_tracker.change_count()
+        metrics.increment("changes", result.changes)
+        if self.changes_file:
+            with metrics.phase("export_changes"):
+                result.changes_file = excel_changes_tracker.log.write(
+                    self.changes_file, **self.changes_labels
+                )
+
+        # Save changes to Excel if any were found
+        if not self.save_output:
+            if self.stream_only:
+                self.logger.info(
+                    f"{result.changes} changes have been written to {self.stream_file}"
+                )
+            return
+        if excel_changes_tracker.has_changes():
+            with metrics.phase("save_workbook"):
+                result.output_file = excel_changes_tracker.save_to_excel(
+                    self.output_dir, self.output_name
+                )
+            self.logger.info(f"Changes have been saved to {result.output_file}")
+        else:
+            self.logger.info("No changes were found in the timesheet")
+
+    def check_wave(
+        self,
+        day_tables: List[DayTable],
+        checker: BookingChecker,
+        excel_changes_tracker: ExcelChangesTracker,
+        refresh_worklogs: bool,
+        changed_days: Set[date],
+        fingerprints: Fingerprints,
+        result: CheckResult,
+        revalidate_worklogs: bool = False,
+    ) -> List[DayTable]:
+        """
+        Fetch, fingerprint and reconcile some of the sheets, returns their day
+        tables (offline only the cached days)
+        """
+        metrics = self.metrics
+        days = [day for day_table in day_tables for day in day_table.dates()]
+        with metrics.phase("fetch_worklogs"):
+            if refresh_worklogs:
+                checker.prefetch(days, refresh=True)
+            elif revalidate_worklogs:
+                checker.prefetch(days, revalidate=True)
+            else:
+                # Edited rows usually mean edited worklogs, fetch those days again
+                checker.prefetch(
+                    [
+                        day
+                        for day in days
+                        if day in changed_days and day in checker.prefetched_days
+                    ],
+                    refresh=True,
+                )
+                checker.prefetch(
+                    [day for day in days if day not in checker.prefetched_days]
+                )
+        if self.worklog_store is not None and self.worklog_store.offline:
+            day_tables = self.cached_tables(day_tables, checker, result)
+
+        # Only reconcile the days whose DSL cells or worklogs changed since the last run
+        check_tables = day_tables
+        if self.fingerprint_store is not None:
+            with metrics.phase("fingerprints"):
+                wave_fingerprints = FingerprintStore.fingerprint(
+                    day_tables, checker.worklogs
+                )
+                check_tables = self.fingerprint_store.changed_tables(
+                    day_tables, wave_fingerprints
+                )
+                result.reused_days += self.fingerprint_store.reuse(
+                    wave_fingerprints, excel_changes_tracker
+                )
+            fingerprints.update(wave_fingerprints)
+
+        metrics.increment(
+            "rows_reconciled", sum(len(day_table) for day_table in check_tables)
+        )
+        with metrics.phase("reconcile"):
+            if self.batch_reconcile:
+                # Loads pandas, the day by day check below runs without it
+                from modules.reconciliation import Reconciler
+
+                reconciler = Reconciler(excel_changes_tracker)
+                reconciler.apply(
+                    reconciler.reconcile(check_tables, checker.worklogs), self.logger
+                )
+            else:
+                for day_table in check_tables:
+                    for row in day_table.rows():
+                        checker.check_line(
+                            day=row.day,
+                            month_year=day_table.month_year,
+                            required_hours=dt.timedelta(seconds=row.required_seconds),
+                            holiday_amount=dt.timedelta(seconds=row.holiday_seconds),
+                            booked_time_dsl=(
+                                DayTable.PAUSE_MARKER
+                                if row.pause
+                                else dt.timedelta(seconds=row.booked_seconds)
+                            ),
+                            sheet_name=day_table.sheet_name,
+                            logger=self.logger,
+                            index=row.index,
+                        )
+        return day_tables
+
+    @staticmethod
+    def cached_tables(
+        day_tables: List[DayTable], checker: BookingChecker, result: CheckResult
+    ) -> List[DayTable]:
+        """
+        Offline the days the worklog cache never synced are skipped: without
+        their worklogs every booked day would look like a conflict
+        """
+        tables = []
+        for day_table in day_tables:
+            cached = np.array(
+                [day in checker.prefetched_days for day in day_table.dates()],
+                dtype=bool,
+            )
+            result.uncached_days += int(len(day_table) - cached.sum())
+            tables.append(day_table if cached.all() else day_table.take(cached))
+        return tables
+
+    def report_uncached(self, result: CheckResult) -> None:
+        self.metrics.increment("days_uncached", result.uncached_days)
+        if result.uncached_days == result.days:
+            self.logger.error(
+                "No day of the workbook is in the worklog cache, run once online first!"
+            )
+            result.error = "Worklogs not cached"
+        else:
+            self.logger.warning(
+                f"Skipping {result.uncached_days} days that are not in the worklog "
+                "cache, run once online to check them"
+            )
+
+    def changed_days(self, day_tables: List[DayTable]) -> List[date]:
+        """Days whose DSL row differs from the previous run (none on the first run)"""
+        rows = {
+            (day_table.sheet_name, row.index): (
+                day,
+                row.required_seconds,
+                row.booked_seconds,
+                row.pause,
+                row.holiday_seconds,
+            )
+            for day_table in day_tables
+            for row, day in zip(day_table.rows(), day_table.dates())
+        }
+        changed = []
+        if self.dsl_rows:
+            changed = [
+                values[0]
+                for key, values in rows.items()
+                if self.dsl_rows.get(key) != values
+            ]
+        self.dsl_rows = rows
+        return changed
@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Sequence, Union
+import openpyxl
+from modules.sheet_layout import (
+    DEFAULT_LAYOUT,
+    LayoutCache,
+    LayoutDetector,
+    SheetLayout,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from modules.day_table import DayTable
+
+
+@dataclass
+class SheetData:
+    sheet_name: str
+    month_year: datetime  # K1 in the template
+    header_rows: Dict[int, tuple]  # zero-based row -> cell values (rows 5, 6, 7)
+    day_cells: Dict[
+        str, List[Any]
+    ]  # role -> values of the day rows (index 0 is the first)
+    column_count: int
+    layout: SheetLayout = DEFAULT_LAYOUT
+    day_table: Optional["DayTable"] = None  # built once, see DayTable.from_sheet
+
+    @property
+    def first_day_index(self) -> int:
+        """Zero-based row index of the first day row (row 8 in the template)"""
+        return self.layout.first_day_row
+
+    def cell(self, index: int, role: str) -> Any:
+        """Value of a day cell by zero-based row index and role (see SheetLayout)"""
+        return self.day_cells[role][index - self.first_day_index]
+
+    @staticmethod
+    def from_rows(
+        sheet_name: str, rows: Sequence[Sequence[Any]], layout: SheetLayout
+    ) -> "SheetData":
+        """The cells of the layout from the first rows of a sheet"""
+
+        def value(row: int, column: int) -> Any:
+            if row < len(rows) and column < len(rows[row]):
+                return rows[row][column]
+            return None
+
+        month_year = value(layout.month_row, layout.month_column)
+        return SheetData(
+            sheet_name=sheet_name,
+            month_year=month_year if isinstance(month_year, datetime) else None,
+            header_rows={
+                row: tuple(rows[row]) for row in layout.header_rows if row < len(rows)
+            },
+            # Sheets may end before the last day row, missing day rows are empty
+            day_cells={
+                role: [
+                    value(row, layout.column(role))
+                    for row in range(layout.first_day_row, layout.last_row)
+                ]
+                for role in SheetLayout.READ_ROLES
+            },
+            column_count=max([len(row) for row in rows] + [layout.holiday_column + 1]),
+            layout=layout,
+        )
+
+    def to_frame(self) -> "pd.DataFrame":
+        """
+        The loaded cells as a DataFrame laid out like pd.read_excel(header=None)
+        with letter columns, so the Util getters work on it. Cells that were not
+        loaded are NaN.
+        """
+        import pandas as pd
+
+        columns = [chr(i) for i in range(ord("A"), ord("A") + self.column_count)]
+        df = pd.DataFrame(
+            float("nan"),
+            index=range(self.layout.last_row),
+            columns=columns,
+            dtype=object,
+        )
+        df.loc[self.layout.month_row, columns[self.layout.month_column]] = (
+            self.month_year
+        )
+        for row, values in self.header_rows.items():
+            for column, value in zip(columns, values):
+                if value is not None:
+                    df.loc[row, column] = value
+        for role, values in self.day_cells.items():
+            column = columns[self.layout.column(role)]
+            for offset, value in enumerate(values):
+                if value is not None:
+                    df.loc[self.first_day_index + offset, column] = value
+        return df
+
+
+@dataclass
+class WorkbookData:
+    path: str
+    sheets: List[SheetData] = field(default_factory=list)  # past months, in order
+    skipped_month: Optional[datetime] = None  # first month not yet reached
+
+    def get_sheet(self, sheet_name: str) -> Optional[SheetData]:
+        for sheet in self.sheets:
+            if sheet.sheet_name == sheet_name:
+                return sheet
+        return None
+
+
+class WorkbookLoader:
+    """
+    Opens the DSL workbook once (openpyxl read_only) and streams only the
+    rows the checker and the change tracker use: the month cell, the header
+    rows and the day rows. Where these are comes from the layout cache (by
+    sheet name, checked against the sheet) or, on a miss, is detected from
+    the first rows of the sheet (LayoutDetector). Stops at the first sheet
+    whose month lies in the future.
+    """
+
+    def __init__(
+        self,
+        excel_file_path: Union[str, BinaryIO],
+        layout_cache: Optional[LayoutCache] = None,
+    ):
+        self.excel_file_path = excel_file_path
+        self.layout_cache = layout_cache
+
+    def load(self, now: Optional[datetime] = None) -> WorkbookData:
+        now = now or datetime.now()
+        workbook_data = WorkbookData(self.excel_file_path)
+        workbook = openpyxl.load_workbook(
+            self.excel_file_path, read_only=True, data_only=True
+        )
+        try:
+            # The first sheet holds common values, months start at the second
+            for sheet_name in workbook.sheetnames[1:]:
+                layout = (
+                    self.layout_cache.get(sheet_name)
+                    if self.layout_cache is not None
+                    else None
+                )
+                sheet = self._load_sheet(workbook[sheet_name], sheet_name, now, layout)
+                if sheet.month_year is not None and sheet.month_year > now:
+                    workbook_data.skipped_month = sheet.month_year
+                    break
+                workbook_data.sheets.append(sheet)
+        finally:
+            workbook.close()
+        if self.layout_cache is not None:
+            self.layout_cache.save()
+        return workbook_data
+
+    def _load_sheet(
+        self, worksheet, sheet_name: str, now: datetime, layout: Optional[SheetLayout]
+    ) -> SheetData:
+        """
+        A cached layout reads up to the row after its last day row, otherwise (or
+        when the sheet no longer fits it) the first LayoutDetector.scan_rows
+        rows are read and the layout detected
+        """
+        # One row past a cached layout shows whether the sheet gained a day row
+        max_row = (
+            layout.last_row + 1 if layout is not None else LayoutDetector.scan_rows
+        )
+        month_row = (layout or DEFAULT_LAYOUT).month_row
+        month_column = (layout or DEFAULT_LAYOUT).month_column
+        rows = []
+        for index, row in enumerate(
+            worksheet.iter_rows(max_row=max_row, values_only=True)
+        ):
+            rows.append(row)
+            if index == month_row:
+                month_year = row[month_column] if len(row) > month_column else None
+                if isinstance(month_year, datetime) and month_year > now:
+                    # Future month, no need to read the rest of the sheet
+                    return SheetData(sheet_name, month_year, {}, {}, len(row))
+
+        if layout is not None and not self.layout_cache.fits(sheet_name, rows, layout):
+            # The table moved since its layout was cached
+            return self._load_sheet(worksheet, sheet_name, now, None)
+        if layout is None:
+            layout = LayoutDetector.detect(rows)
+            if self.layout_cache is not None:
+                self.layout_cache.put(sheet_name, rows, layout)
+        return SheetData.from_rows(sheet_name, rows, layout)
@@ -0,0 +1,242 @@
+import json
+import mmap
+import os
+import struct
+from dataclasses import asdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, List, Optional
+import numpy as np
+from modules.day_table import DayTable
+from modules.sheet_layout import SheetLayout
+from modules.workbook_loader import SheetData, WorkbookData
+
+
+class WorkbookSidecar:
+    """
+    The loaded workbook in a binary file next to it (<workbook>.dslcache),
+    so an unchanged workbook is not unzipped and parsed again. The file
+    holds a JSON header (path, mtime and size of the workbook, per sheet its
+    month, layout and the cells copied into the diff workbook) and the day
+    tables of all sheets as fixed-width NumPy columns, which are memory
+    mapped on load. Any change of the workbook, or a new month reaching a
+    sheet that was skipped, makes the file stale; it is rewritten then.
+
+    Layout: b"DSLSIDE1", header length (uint64), JSON header, zero padding
+    to 8 bytes, then the columns back to back (offsets in the header).
+    """
+
+    MAGIC = b"DSLSIDE1"
+    SUFFIX = ".dslcache"
+
+    # DayTable columns and their fixed-width types
+    COLUMNS = {
+        "index": "<i8",
+        "day": "<i8",
+        "required_seconds": "<i8",
+        "booked_seconds": "<i8",
+        "pause": "|b1",
+        "holiday_seconds": "<i8",
+    }
+
+    @staticmethod
+    def path_for(excel_file: str) -> str:
+        return excel_file + WorkbookSidecar.SUFFIX
+
+    @staticmethod
+    def key(excel_file: str) -> dict:
+        stat = os.stat(excel_file)
+        return {
+            "path": os.path.abspath(excel_file),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+        }
+
+    @staticmethod
+    def load(excel_file: str, now: datetime) -> Optional[WorkbookData]:
+        """The workbook as loaded before, None if there is no fresh sidecar"""
+        path = WorkbookSidecar.path_for(excel_file)
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        workbook_data = WorkbookSidecar.read(buffer, excel_file, now)
+        if workbook_data is None:
+            # Nothing maps the file any more, the day tables of a hit keep it open
+            buffer.close()
+        return workbook_data
+
+    @staticmethod
+    def read(
+        buffer: mmap.mmap, excel_file: str, now: datetime
+    ) -> Optional[WorkbookData]:
+        """The workbook of a mapped sidecar, None if it is stale, truncated or garbage"""
+        if buffer[: len(WorkbookSidecar.MAGIC)] != WorkbookSidecar.MAGIC:
+            return None
+        try:
+            (header_length,) = struct.unpack_from(
+                "<Q", buffer, len(WorkbookSidecar.MAGIC)
+            )
+            header_start = len(WorkbookSidecar.MAGIC) + 8
+            header = json.loads(buffer[header_start : header_start + header_length])
+            if header["key"] != WorkbookSidecar.key(excel_file):
+                return None
+            skipped_month = WorkbookSidecar.decode(header["skipped_month"])
+        except (struct.error, ValueError, KeyError, TypeError, OSError):
+            return None
+        if skipped_month is not None and skipped_month <= now:
+            return None  # A skipped month was reached, its sheet is needed now
+
+        # Views on the mapped file, nothing is copied
+        try:
+            columns = {
+                name: np.frombuffer(
+                    buffer, dtype=np.dtype(dtype), count=header["rows"], offset=offset
+                )
+                for name, (dtype, offset) in header["columns"].items()
+            }
+            workbook_data = WorkbookData(excel_file, skipped_month=skipped_month)
+            for stored in header["sheets"]:
+                rows = slice(stored["start"], stored["start"] + stored["length"])
+                day_table = DayTable(
+                    sheet_name=stored["name"],
+                    month_year=WorkbookSidecar.decode(stored["month"]),
+                    **{name: column[rows] for name, column in columns.items()},
+                )
+                workbook_data.sheets.append(
+                    WorkbookSidecar.sheet_data(stored, day_table)
+                )
+        except (ValueError, KeyError, TypeError):
+            return None  # Truncated file or incomplete header
+        return workbook_data
+
+    @staticmethod
+    def sheet_data(stored: dict, day_table: DayTable) -> SheetData:
+        """The sheet of a sidecar, day cells rebuilt from its day table"""
+        layout = SheetLayout(**stored["layout"])
+        padding = [None] * (layout.day_count - len(day_table))
+
+        def durations(seconds: np.ndarray) -> List[Any]:
+            return [timedelta(seconds=int(value)) for value in seconds] + padding
+
+        booked = durations(day_table.booked_seconds)
+        for position in np.flatnonzero(day_table.pause):
+            booked[position] = DayTable.PAUSE_MARKER
+        return SheetData(
+            sheet_name=stored["name"],
+            month_year=day_table.month_year,
+            header_rows={
+                int(row): tuple(WorkbookSidecar.decode(value) for value in values)
+                for row, values in stored["header_rows"].items()
+            },
+            day_cells={
+                "weekday": [WorkbookSidecar.decode(v) for v in stored["weekday"]],
+                "day": [WorkbookSidecar.decode(v) for v in stored["day"]],
+                "required": durations(day_table.required_seconds),
+                "booked": booked,
+                "holiday": durations(day_table.holiday_seconds),
+            },
+            column_count=stored["column_count"],
+            layout=layout,
+            day_table=day_table,
+        )
+
+    @staticmethod
+    def save(workbook_data: WorkbookData) -> str:
+        """Write the sidecar of a freshly loaded workbook, returns its path"""
+        excel_file = workbook_data.path
+        day_tables = [DayTable.from_sheet(sheet) for sheet in workbook_data.sheets]
+        sheets = []
+        start = 0
+        for sheet, day_table in zip(workbook_data.sheets, day_tables):
+            sheet.day_table = day_table  # the check needs it anyway
+            sheets.append(
+                {
+                    "name": sheet.sheet_name,
+                    "month": WorkbookSidecar.encode(sheet.month_year),
+                    "layout": asdict(sheet.layout),
+                    "column_count": sheet.column_count,
+                    "header_rows": {
+                        row: [WorkbookSidecar.encode(value) for value in values]
+                        for row, values in sheet.header_rows.items()
+                    },
+                    "weekday": [
+                        WorkbookSidecar.encode(v) for v in sheet.day_cells["weekday"]
+                    ],
+                    "day": [WorkbookSidecar.encode(v) for v in sheet.day_cells["day"]],
+                    "start": start,
+                    "length": len(day_table),
+                }
+            )
+            start += len(day_table)
+
+        data = {
+            name: np.concatenate(
+                [getattr(table, name) for table in day_tables]
+                or [np.empty(0, dtype=dtype)]
+            ).astype(dtype)
+            for name, dtype in WorkbookSidecar.COLUMNS.items()
+        }
+        header = {
+            "key": WorkbookSidecar.key(excel_file),
+            "skipped_month": WorkbookSidecar.encode(workbook_data.skipped_month),
+            "rows": start,
+            "sheets": sheets,
+            "columns": {},
+        }
+        # The offsets are part of the header: place the columns after the
+        # header with the offsets filled in, plus room for longer numbers
+        for _ in range(2):
+            header_bytes = json.dumps(header).encode()
+            offset = WorkbookSidecar.aligned(
+                len(WorkbookSidecar.MAGIC) + 8 + len(header_bytes) + 64
+            )
+            for name, column in data.items():
+                header["columns"][name] = [WorkbookSidecar.COLUMNS[name], offset]
+                offset = WorkbookSidecar.aligned(offset + column.nbytes)
+        header_bytes = json.dumps(header).encode()
+
+        path = WorkbookSidecar.path_for(excel_file)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(WorkbookSidecar.MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            for name, column in data.items():
+                f.write(b"\0" * (header["columns"][name][1] - f.tell()))
+                f.write(column.tobytes())
+        # Readers see either the old or the new file, never a partial one
+        os.replace(temporary, path)
+        return path
+
+    @staticmethod
+    def aligned(offset: int) -> int:
+        return (offset + 7) // 8 * 8
+
+    @staticmethod
+    def encode(value: Any) -> Any:
+        """A cell value as JSON, dates and durations tagged with their type"""
+        if isinstance(value, datetime):
+            return {"datetime": value.isoformat()}
+        if isinstance(value, date):
+            return {"date": value.isoformat()}
+        if isinstance(value, time):
+            return {"time": value.isoformat()}
+        if isinstance(value, timedelta):
+            return {"timedelta": value.total_seconds()}
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def decode(value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        ((kind, stored),) = value.items()
+        if kind == "datetime":
+            return datetime.fromisoformat(stored)
+        if kind == "date":
+            return date.fromisoformat(stored)
+        if kind == "time":
+            return time.fromisoformat(stored)
+        return timedelta(seconds=stored)
@@ -0,0 +1,97 @@
+import logging
+import os
+import time
+import zipfile
+from typing import Optional, Tuple
+from modules.fingerprint_store import FingerprintStore
+from modules.workbook_check import CheckResult, WorkbookCheck
+
+
+class WorkbookWatcher:
+    """
+    Keeps one warm WorkbookCheck (HTTP session, token check, fetched worklogs
+    and per-day results) and re-checks the workbook whenever it is saved.
+    Only the days whose DSL row or worklogs changed are fetched and reconciled
+    again, the conflict report is rewritten in place.
+
+    The file is polled (modification time and size), a save counts once the
+    file stopped changing between two polls, since Excel writes it in steps.
+    """
+
+    report_name = "timesheet_changes_watch.xlsx"
+
+    def __init__(
+        self,
+        check: WorkbookCheck,
+        logger: logging.Logger,
+        interval: float = 0.25,
+        refresh_minutes: float = 10,
+    ):
+        """refresh_minutes: fetch all worklogs again this often (0 never) for Tempo-side edits"""
+        self.check = check
+        self.logger = logger
+        self.interval = interval
+        self.refresh_minutes = refresh_minutes
+        if check.fingerprint_store is None:
+            check.fingerprint_store = FingerprintStore()  # in memory only
+        check.output_name = check.output_name or self.report_name
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.check.excel_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def watch(self, max_checks: Optional[int] = None) -> int:
+        """Check now and on every save until interrupted, returns the number of checks"""
+        self.logger.info(f"Watching '{self.check.excel_file}', stop with Ctrl+C")
+        checks = 0
+        checked = self.signature()
+        last_refresh = time.monotonic()
+        if self.check_once() is not None:
+            checks += 1
+        previous = checked
+        try:
+            while max_checks is None or checks < max_checks:
+                time.sleep(self.interval)
+                current = self.signature()
+                refresh = (
+                    self.refresh_minutes > 0
+                    and time.monotonic() - last_refresh >= self.refresh_minutes * 60
+                )
+                stable = current is not None and current == previous
+                previous = current
+                if not refresh and (not stable or current == checked):
+                    continue
+
+                result = self.check_once(refresh)
+                if result is None:
+                    continue  # Not readable yet, try again on the next poll
+                checks += 1
+                checked = current
+                if refresh:
+                    last_refresh = time.monotonic()
+        except KeyboardInterrupt:
+            self.logger.info("Stopped watching")
+        return checks
+
+    def check_once(self, refresh_worklogs: bool = False) -> Optional[CheckResult]:
+        """One check, None if the workbook could not be read (e.g. while being saved)"""
+        try:
+            result = self.check.run(refresh_worklogs=refresh_worklogs)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            self.logger.warning(f"Cannot read '{self.check.excel_file}' yet: {e!r}")
+            return None
+        if result.error:
+            return result
+
+        # The report always shows the current state, drop it once all is fixed
+        report = os.path.join(self.check.output_dir, self.check.output_name)
+        if not result.output_file and os.path.isfile(report):
+            os.remove(report)
+        self.logger.info(
+            f"{result.changes} conflicts, {result.days - result.reused_days} of "
+            f"{result.days} days re-checked in {result.wall_seconds:.2f}s"
+        )
+        return result
@@ -0,0 +1,271 @@
+import json
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+import requests
+from modules.seconds import Seconds
+from modules.worklog_rules import WorklogRules
+
+try:
+    import ijson  # Optional, parses responses as a stream instead of in one piece
+except ImportError:
+    ijson = None
+
+
+class WorklogRecord:
+    """One worklog reduced to the fields the checks read"""
+
+    __slots__ = (
+        "worklog_id",
+        "date",
+        "seconds",
+        "issue_id",
+        "start_second",
+        "homeoffice",
+        "category",
+    )
+
+    def __init__(
+        self,
+        worklog_id: int,
+        date: str,
+        seconds: int,
+        issue_id: int,
+        start_second: int,
+        homeoffice: bool,
+        category: int = 0,
+    ):
+        self.worklog_id = worklog_id
+        self.date = date  # "YYYY-MM-DD"
+        self.seconds = seconds
+        self.issue_id = issue_id
+        self.start_second = start_second  # seconds since midnight
+        self.homeoffice = homeoffice
+        self.category = category  # WorklogRules code, 0 is productive time
+
+    @staticmethod
+    def from_worklog(
+        item: dict, rules: Optional[WorklogRules] = None
+    ) -> "WorklogRecord":
+        """Reduce a Tempo worklog (response dict or cached payload)"""
+        rules = rules or WorklogRules.active()
+        issue = item.get("issue", {})
+        issue_id = WorklogRecord.parse_issue_id(issue)
+        attributes = [
+            (attr.get("key"), attr.get("value"))
+            for attr in item.get("attributes", {}).get("values", [])
+        ]
+        return WorklogRecord(
+            worklog_id=int(item.get("tempoWorklogId", 0)),
+            date=item["startDate"],
+            seconds=int(item["timeSpentSeconds"]),
+            issue_id=issue_id,
+            start_second=WorklogRecord.parse_start_time(item.get("startTime")),
+            homeoffice=any(rules.is_homeoffice(*attr) for attr in attributes),
+            category=rules.category(issue_id, attributes, issue.get("key")),
+        )
+
+    @staticmethod
+    def parse_issue_id(issue: dict) -> int:
+        """Issue id, taken from the issue URL (".../issue/16804") if not given"""
+        if issue.get("id") is not None:
+            return int(issue["id"])
+        issue_url = issue.get("self", "")
+        issue_id = issue_url.rsplit("/", 1)[-1]
+        return int(issue_id) if issue_id.isdigit() else -1
+
+    @staticmethod
+    def parse_start_time(start_time: Optional[str]) -> int:
+        """Start time "HH:MM:SS" as seconds since midnight (cached lookup)"""
+        return Seconds.parse(start_time)
+
+
+class WorklogBatch:
+    """
+    Worklogs as NumPy columns, sorted by date and worklog id without
+    duplicate ids. Per-day views are cheap slices (see for_date).
+    """
+
+    __slots__ = (
+        "worklog_id",
+        "date",
+        "seconds",
+        "issue_id",
+        "start_second",
+        "homeoffice",
+        "category",
+    )
+
+    def __init__(
+        self,
+        worklog_id: np.ndarray,
+        date: np.ndarray,
+        seconds: np.ndarray,
+        issue_id: np.ndarray,
+        start_second: np.ndarray,
+        homeoffice: np.ndarray,
+        category: np.ndarray,
+    ):
+        self.worklog_id = worklog_id  # int64
+        self.date = date  # datetime64[D]
+        self.seconds = seconds  # int64
+        self.issue_id = issue_id  # int64
+        self.start_second = start_second  # int32
+        self.homeoffice = homeoffice  # bool
+        self.category = category  # int8, WorklogRules code
+
+    def __len__(self) -> int:
+        return len(self.worklog_id)
+
+    def nlz_mask(self) -> np.ndarray:
+        """Worklogs of any non-productive category"""
+        return self.category > 0
+
+    def for_date(self, day: date | str) -> "WorklogBatch":
+        """The worklogs of one day as a view on this batch"""
+        day = np.datetime64(day, "D")
+        start, end = np.searchsorted(self.date, [day, day + 1])
+        return self[start:end]
+
+    def __getitem__(self, selection) -> "WorklogBatch":
+        return WorklogBatch(
+            *(getattr(self, column)[selection] for column in self.__slots__)
+        )
+
+    @staticmethod
+    def empty() -> "WorklogBatch":
+        return WorklogBatch.from_records([])
+
+    @staticmethod
+    def from_records(records: Iterable[WorklogRecord]) -> "WorklogBatch":
+        records = list(records)
+        return WorklogBatch(
+            np.fromiter((r.worklog_id for r in records), np.int64, len(records)),
+            np.array([r.date for r in records], dtype="datetime64[D]"),
+            np.fromiter((r.seconds for r in records), np.int64, len(records)),
+            np.fromiter((r.issue_id for r in records), np.int64, len(records)),
+            np.fromiter((r.start_second for r in records), np.int32, len(records)),
+            np.fromiter((r.homeoffice for r in records), bool, len(records)),
+            np.fromiter((r.category for r in records), np.int8, len(records)),
+        ).normalized()
+
+    @staticmethod
+    def from_worklogs(items: Iterable[dict]) -> "WorklogBatch":
+        return WorklogBatch.from_records(
+            WorklogRecord.from_worklog(item) for item in items
+        )
+
+    @staticmethod
+    def concat(batches: List["WorklogBatch"]) -> "WorklogBatch":
+        """Merge batches, later batches win for duplicate worklog ids"""
+        if not batches:
+            return WorklogBatch.empty()
+        return WorklogBatch(
+            *(
+                np.concatenate([getattr(batch, column) for batch in batches])
+                for column in WorklogBatch.__slots__
+            )
+        ).normalized()
+
+    def normalized(self) -> "WorklogBatch":
+        """Drop duplicate ids (keeping the last one) and sort by date and id"""
+        reversed_ids = self.worklog_id[::-1]
+        _, last_positions = np.unique(reversed_ids, return_index=True)
+        keep = len(self) - 1 - last_positions
+        unique = self[keep]
+        return unique[np.lexsort((unique.worklog_id, unique.date))]
+
+
+class WorklogStreamParser:
+    """
+    Parses Tempo search responses straight into WorklogRecords, keeping only
+    the fields a WorklogRecord holds. With ijson installed the body is parsed
+    as a stream, otherwise the stdlib parser reduces every worklog as soon as
+    it is decoded.
+    """
+
+    # The ijson path reads response.raw, so responses must be requested with stream=True
+    streaming = ijson is not None
+
+    @staticmethod
+    def parse(response: requests.Response) -> Tuple[List[WorklogRecord], Optional[str]]:
+        """The records of one page and the metadata.next URL (None on the last page)"""
+        if WorklogStreamParser.streaming:
+            return WorklogStreamParser._parse_stream(response)
+        return WorklogStreamParser._parse_json(response.content)
+
+    @staticmethod
+    def _parse_json(content: bytes) -> Tuple[List[WorklogRecord], Optional[str]]:
+        def reduce_worklog(item: dict):
+            if "timeSpentSeconds" in item and "startDate" in item:
+                return WorklogRecord.from_worklog(item)
+            return item
+
+        response_json = json.loads(content, object_hook=reduce_worklog)
+        return (
+            response_json.get("results", []),
+            response_json.get("metadata", {}).get("next"),
+        )
+
+    @staticmethod
+    def _parse_stream(
+        response: requests.Response,
+    ) -> Tuple[List[WorklogRecord], Optional[str]]:
+        response.raw.decode_content = True
+        rules = WorklogRules.active()
+        records: List[WorklogRecord] = []
+        next_url = None
+        item: dict = {}
+        attribute: dict = {}
+        for prefix, event, value in ijson.parse(response.raw):
+            if prefix == "metadata.next":
+                next_url = value
+            elif not prefix.startswith("results.item"):
+                continue
+            elif prefix == "results.item" and event == "start_map":
+                item = {"attributes": []}
+            elif prefix == "results.item" and event == "end_map":
+                issue_id = WorklogRecord.parse_issue_id(
+                    {"id": item.get("issue.id"), "self": item.get("issue.self", "")}
+                )
+                attributes = item["attributes"]
+                records.append(
+                    WorklogRecord(
+                        worklog_id=int(item.get("tempoWorklogId", 0)),
+                        date=item["startDate"],
+                        seconds=int(item["timeSpentSeconds"]),
+                        issue_id=issue_id,
+                        start_second=WorklogRecord.parse_start_time(
+                            item.get("startTime")
+                        ),
+                        homeoffice=any(
+                            rules.is_homeoffice(*attr) for attr in attributes
+                        ),
+                        category=rules.category(
+                            issue_id, attributes, item.get("issue.key")
+                        ),
+                    )
+                )
+            elif prefix == "results.item.attributes.values.item":
+                if event == "start_map":
+                    attribute = {}
+                elif event == "end_map":
+                    item["attributes"].append(
+                        (attribute.get("key"), attribute.get("value"))
+                    )
+            elif prefix.startswith("results.item.attributes.values.item."):
+                attribute[prefix.rsplit(".", 1)[-1]] = value
+            elif prefix in (
+                "results.item.tempoWorklogId",
+                "results.item.startDate",
+                "results.item.startTime",
+                "results.item.timeSpentSeconds",
+            ):
+                item[prefix.rsplit(".", 1)[-1]] = value
+            elif prefix in (
+                "results.item.issue.id",
+                "results.item.issue.self",
+                "results.item.issue.key",
+            ):
+                item[prefix[len("results.item.") :]] = value
+        return records, next_url
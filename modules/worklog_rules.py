@@ -0,0 +1,99 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+# Worklogs on this Jira issue are NLZ (non-productive time) by default
+NLZ_ISSUE_ID = 16804
+
+# Tempo keeps the account of a worklog as this work attribute
+ACCOUNT_ATTRIBUTE = "_Account_"
+
+
+class WorklogRules:
+    """
+    Compiled classification of worklogs. Every non-productive category
+    (counted as NLZ) is given by issue ids, work attributes (key, value),
+    Tempo account keys and Jira project keys; home office by work
+    attributes. Compiling turns them into one dict per kind of key, so
+    classifying a worklog costs a few lookups however many categories
+    there are. Worklogs get the category code (0 productive, 1.. the
+    categories in the given order) when they are parsed, later steps only
+    compare codes (see WorklogBatch.nlz_mask). A worklog matching rules of
+    several categories gets the first of them, whatever kinds of rules
+    matched. Attribute values compare as strings, so numbers from JSON
+    match too.
+
+    Rules as written in main.py:
+        {"nlz": {"issues": [16804], "accounts": ["ABSENCE"]},
+         "training": {"projects": ["TRAIN"], "attributes": {"_Type_": "Training"}}}
+    """
+
+    _active: Optional["WorklogRules"] = None
+
+    def __init__(
+        self,
+        categories: Mapping[str, Mapping[str, Iterable]],
+        homeoffice_attributes: Mapping[str, str] = None,
+    ):
+        self.categories: List[str] = list(categories)
+        self.issue_codes: Dict[int, int] = {}
+        self.attribute_codes: Dict[Tuple[str, str], int] = {}
+        self.project_codes: Dict[str, int] = {}
+        # Earlier categories win where rules of the same kind overlap
+        for code, rules in reversed(list(enumerate(categories.values(), start=1))):
+            unknown = set(rules) - {"issues", "attributes", "accounts", "projects"}
+            if unknown:
+                raise ValueError(f"Unknown worklog rule(s): {', '.join(unknown)}")
+            for issue_id in rules.get("issues", ()):
+                self.issue_codes[int(issue_id)] = code
+            for key, value in dict(rules.get("attributes", {})).items():
+                self.attribute_codes[(key, str(value))] = code
+            for account in rules.get("accounts", ()):
+                self.attribute_codes[(ACCOUNT_ATTRIBUTE, str(account))] = code
+            for project in rules.get("projects", ()):
+                self.project_codes[project] = code
+        if len(self.categories) > 127:
+            raise ValueError("At most 127 worklog categories are supported")
+        self.homeoffice_attributes: FrozenSet[Tuple[str, str]] = frozenset(
+            (key, str(value))
+            for key, value in (homeoffice_attributes or {"_TestBox_": "JA"}).items()
+        )
+
+    @classmethod
+    def active(cls) -> "WorklogRules":
+        """The rules worklogs of this process are classified with"""
+        if cls._active is None:
+            cls._active = cls({"nlz": {"issues": [NLZ_ISSUE_ID]}})
+        return cls._active
+
+    @classmethod
+    def use(cls, rules: Optional["WorklogRules"]) -> None:
+        """Classify with rules from now on (None restores the defaults)"""
+        cls._active = rules
+
+    def is_homeoffice(self, key: Optional[str], value: Any) -> bool:
+        return (key, str(value)) in self.homeoffice_attributes
+
+    def category(
+        self,
+        issue_id: int,
+        attributes: Iterable[Tuple[Optional[str], Any]] = (),
+        issue_key: Optional[str] = None,
+    ) -> int:
+        """Category code of a worklog, the lowest of its issue, attributes and project"""
+        best = self.issue_codes.get(issue_id, 0)
+        if best == 1:
+            return best  # Nothing comes before the first category
+        codes = []
+        if self.attribute_codes:
+            codes += [
+                self.attribute_codes.get((key, str(value)), 0)
+                for key, value in attributes
+            ]
+        if issue_key and self.project_codes:
+            codes.append(self.project_codes.get(issue_key.split("-", 1)[0], 0))
+        for code in codes:
+            if code and (not best or code < best):
+                best = code
+        return best
+
+    def category_name(self, code: int) -> str:
+        return self.categories[code - 1] if code > 0 else ""
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from modules.query_planner import DateRange
+
+
+class WorklogStore:
+    """
+    On-disk (SQLite) worklog cache keyed by date and worklog id.
+
+    Every synced date range is recorded with the time the sync started. The next
+    sync of a covered range only asks Tempo for worklogs updated since then
+    (updatedFrom) and merges them in. Tempo does not report deletions through
+    updatedFrom, so a worklog deleted after its range was cached stays in the
+    store until the range is fetched in full again: with refresh=True, or
+    once its last full fetch is older than full_sync_minutes.
+
+    The store remembers whose worklogs it holds (identity, see identity_for):
+    opened for anyone else, it is emptied first, so switching the token never
+    hands out the previous user's worklogs through a delta sync.
+    """
+
+    # Re-request a little more than strictly needed to absorb clock skew
+    sync_overlap = timedelta(minutes=5)
+
+    def __init__(
+        self,
+        path: str = "worklog_cache.sqlite3",
+        offline: bool = False,
+        refresh: bool = False,
+        max_age_days: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        identity: str = "",
+        full_sync_minutes: Optional[float] = None,
+    ):
+        """
+        offline: never contact Tempo, answer from the cache only
+        refresh: ignore the sync state and fetch every range in full
+        max_age_days / max_rows: eviction policy applied on open
+        identity: owner of the worklogs, a different one empties the store
+        ("" opens it for whoever filled it, e.g. offline without a token)
+        full_sync_minutes: fetch a range in full again once its last full
+        fetch is this old, so deleted worklogs disappear (None never)
+        """
+        self.path = path
+        self.offline = offline
+        self.refresh = refresh
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.full_sync_minutes = full_sync_minutes
+        # Usable from other threads (service mode), but only by one at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS worklogs (
+                worklog_id INTEGER PRIMARY KEY,
+                start_date TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS worklogs_start_date ON worklogs (start_date);
+            CREATE TABLE IF NOT EXISTS synced_ranges (
+                range_from TEXT NOT NULL,
+                range_to TEXT NOT NULL,
+                synced_at TEXT NOT NULL,
+                full_synced_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS store_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """)
+        columns = [
+            row[1]
+            for row in self.connection.execute("PRAGMA table_info(synced_ranges)")
+        ]
+        if "full_synced_at" not in columns:
+            # Caches written before full syncs were tracked: due for one now
+            self.connection.execute(
+                "ALTER TABLE synced_ranges ADD COLUMN full_synced_at TEXT"
+            )
+        if identity:
+            self.claim(identity)
+        self.evict()
+
+    @staticmethod
+    def identity_for(bearer_token: str) -> str:
+        """The identity of a Tempo token, a hash so the token is not stored"""
+        return hashlib.blake2b(bearer_token.encode(), digest_size=16).hexdigest()
+
+    def claim(self, identity: str) -> None:
+        """Empty the store if it holds the worklogs of someone else (or of nobody known)"""
+        row = self.connection.execute(
+            "SELECT value FROM store_info WHERE key = 'identity'"
+        ).fetchone()
+        if row is not None and row[0] == identity:
+            return
+        with self.connection:
+            self.connection.execute("DELETE FROM worklogs")
+            self.connection.execute("DELETE FROM synced_ranges")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO store_info (key, value) VALUES ('identity', ?)",
+                (identity,),
+            )
+
+    def updated_from(self, date_range: DateRange) -> Optional[str]:
+        """
+        The updatedFrom value for a delta sync of the range,
+        None if the range is not fully cached yet and must be fetched in full.
+        """
+        if self.refresh:
+            return None
+        synced_at = self.synced_at(date_range)
+        if synced_at is None:
+            return None
+        if self.full_sync_minutes is not None:
+            full_synced_at = self.synced_at(date_range, full=True)
+            due = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+                minutes=self.full_sync_minutes
+            )
+            if full_synced_at is None or full_synced_at <= due:
+                return None
+        return (synced_at - self.sync_overlap).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def synced_at(
+        self, date_range: DateRange, full: bool = False
+    ) -> Optional[datetime]:
+        """When a sync (a full fetch with full) last covered the whole range, None if none did"""
+        column = "full_synced_at" if full else "synced_at"
+        row = self.connection.execute(
+            f"SELECT MAX({column}) FROM synced_ranges WHERE range_from <= ? AND range_to >= ?",
+            (date_range.from_str, date_range.to_str),
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return datetime.strptime(row[0], "%Y-%m-%dT%H:%M:%SZ")
+
+    def is_cached(self, date_range: DateRange) -> bool:
+        """Whether the whole range was synced, so missing worklogs mean none exist"""
+        return self.synced_at(date_range) is not None
+
+    def cached_ranges(self, ranges: List[DateRange]) -> List[DateRange]:
+        """
+        The parts of the ranges the store can answer: fully synced ranges as
+        they are, of the others only the single days some sync covered
+        """
+        cached = []
+        for date_range in ranges:
+            if self.is_cached(date_range):
+                cached.append(date_range)
+                continue
+            for day in date_range.days():
+                if self.is_cached(DateRange(day, day)):
+                    cached.append(DateRange(day, day))
+        return cached
+
+    def merge(
+        self,
+        date_range: DateRange,
+        worklogs: List[dict],
+        synced_at: datetime,
+        full: bool,
+    ) -> None:
+        """
+        Merge fetched worklogs into the store and record the range as synced at
+        `synced_at` (the time the fetch started). A full fetch replaces the range.
+        """
+        synced_at_str = synced_at.astimezone(timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        full_synced_at = self.synced_at(date_range, full=True)
+        if full:
+            full_synced_at_str = synced_at_str
+        elif full_synced_at is not None:
+            full_synced_at_str = full_synced_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        else:
+            full_synced_at_str = None
+        with self.connection:
+            if full:
+                self.connection.execute(
+                    "DELETE FROM worklogs WHERE start_date BETWEEN ? AND ?",
+                    (date_range.from_str, date_range.to_str),
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO worklogs (worklog_id, start_date, payload) VALUES (?, ?, ?)",
+                [
+                    (item["tempoWorklogId"], item["startDate"], json.dumps(item))
+                    for item in worklogs
+                ],
+            )
+            # Older records inside the new range are superseded
+            self.connection.execute(
+                "DELETE FROM synced_ranges WHERE range_from >= ? AND range_to <= ?",
+                (date_range.from_str, date_range.to_str),
+            )
+            # A delta keeps the time of the last full fetch, deletions since are unknown
+            self.connection.execute(
+                "INSERT INTO synced_ranges (range_from, range_to, synced_at, full_synced_at) VALUES (?, ?, ?, ?)",
+                (
+                    date_range.from_str,
+                    date_range.to_str,
+                    synced_at_str,
+                    full_synced_at_str,
+                ),
+            )
+
+    def load(self, date_range: DateRange) -> List[dict]:
+        """All cached worklogs of the range, ordered by date and id"""
+        rows = self.connection.execute(
+            "SELECT payload FROM worklogs WHERE start_date BETWEEN ? AND ? ORDER BY start_date, worklog_id",
+            (date_range.from_str, date_range.to_str),
+        )
+        return [json.loads(payload) for (payload,) in rows]
+
+    def evict(self) -> None:
+        """Drop old days by age (max_age_days) and/or to stay within max_rows"""
+        cutoff: Optional[date] = None
+        if self.max_age_days is not None:
+            cutoff = date.today() - timedelta(days=self.max_age_days)
+        if self.max_rows is not None:
+            row = self.connection.execute(
+                "SELECT start_date FROM worklogs ORDER BY start_date DESC LIMIT 1 OFFSET ?",
+                (self.max_rows,),
+            ).fetchone()
+            if row is not None:
+                # Evict whole days so no day is left half cached
+                size_cutoff = date.fromisoformat(row[0]) + timedelta(days=1)
+                cutoff = max(cutoff, size_cutoff) if cutoff else size_cutoff
+        if cutoff is not None:
+            self._evict_before(cutoff)
+
+    def _evict_before(self, cutoff: date) -> None:
+        cutoff_str = cutoff.strftime("%Y-%m-%d")
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM worklogs WHERE start_date < ?", (cutoff_str,)
+            )
+            self.connection.execute(
+                "DELETE FROM synced_ranges WHERE range_to < ?", (cutoff_str,)
+            )
+            self.connection.execute(
+                "UPDATE synced_ranges SET range_from = ? WHERE range_from < ?",
+                (cutoff_str, cutoff_str),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.tempo_stub import TempoStub
+from modules.booking_checker import BookingChecker
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = TempoStub().start()
+    monkeypatch.setattr(BookingChecker, "base_url", stub.base_url)
+    monkeypatch.setattr(BookingChecker, "http_adapter", None)
+    yield stub
+    stub.stop()
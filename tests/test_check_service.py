@@ -0,0 +1,62 @@
+import json
+import logging
+from datetime import date, datetime
+
+from benchmarks.workbook_generator import WorkbookGenerator
+from modules.check_service import CheckService
+from modules.tempo_client import TempoClient
+from modules.workbook_loader import SheetData, WorkbookData
+
+
+def conflicts(service: CheckService, token: str, body: bytes = b"") -> list:
+    status, _, payload = service.check(token, body, {})
+    assert status == 200, payload
+    return json.loads(payload)["conflicts"]
+
+
+def test_warm_session_sees_worklogs_changed_in_tempo(stub, tmp_path):
+    excel_file = WorkbookGenerator(months=2).save(str(tmp_path / "dsl.xlsx"))
+    with open(excel_file, "rb") as f:
+        body = f.read()
+    service = CheckService(logging.getLogger("test"))
+
+    before = conflicts(service, "warm", body)
+    stub.edit_worklogs(seed=1)
+    stub.reset_counters()
+    after = conflicts(service, "warm")
+
+    assert stub.requests > 0
+    assert after != before
+    # A warm session answers like a fresh one on the same Tempo data
+    assert after == conflicts(service, "fresh", body)
+
+
+def test_throttled_token_check_is_not_reported_as_bad_token(
+    stub, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(TempoClient, "max_retries", 0)
+    stub.rate_limit_every, stub.retry_after = 1, 0
+    excel_file = WorkbookGenerator(months=1).save(str(tmp_path / "dsl.xlsx"))
+    with open(excel_file, "rb") as f:
+        body = f.read()
+    service = CheckService(logging.getLogger("test"))
+
+    status, _, payload = service.check("throttled", body, {})
+
+    assert status == 429
+    assert json.loads(payload)["error"] == "Tempo rate limit reached"
+
+
+def test_month_range_skips_sheets_without_a_month():
+    workbook = WorkbookData(
+        "dsl.xlsx",
+        [
+            SheetData("Notes", None, {}, {}, 0),
+            SheetData("Mar", datetime(2026, 3, 1), {}, {}, 0),
+            SheetData("Apr", datetime(2026, 4, 1), {}, {}, 0),
+        ],
+    )
+
+    selected = CheckService.select_months(workbook, date(2026, 4, 1), None)
+
+    assert [sheet.sheet_name for sheet in selected.sheets] == ["Apr"]
@@ -0,0 +1,34 @@
+import logging
+
+import pytest
+
+from benchmarks.workbook_generator import WorkbookGenerator
+from modules.workbook_check import WorkbookCheck
+from modules.worklog_store import WorklogStore
+
+
+def conflicts(excel_file: str, store=None, refresh_worklogs: bool = False) -> list:
+    check = WorkbookCheck(
+        excel_file, "token", logging.getLogger("test"), store, save_output=False
+    )
+    result = check.run(refresh_worklogs=refresh_worklogs)
+    assert result.error is None
+    return check.excel_changes_tracker.log.to_dicts()
+
+
+@pytest.mark.parametrize(
+    "full_sync_minutes, refresh_worklogs", [(0, False), (None, True)]
+)
+def test_worklogs_deleted_in_tempo_leave_the_cache(
+    stub, tmp_path, full_sync_minutes, refresh_worklogs
+):
+    excel_file = WorkbookGenerator(months=2).save(str(tmp_path / "dsl.xlsx"))
+    cache_file = str(tmp_path / "worklog_cache.sqlite3")
+    before = conflicts(excel_file, WorklogStore(cache_file))
+
+    stub.delete_worklogs(per_day=1)
+    store = WorklogStore(cache_file, full_sync_minutes=full_sync_minutes)
+    after = conflicts(excel_file, store, refresh_worklogs)
+
+    assert after != before
+    assert after == conflicts(excel_file)